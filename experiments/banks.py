@@ -0,0 +1,333 @@
+"""Simulation banks for the variant runner.
+
+`build_simulator` turns a Variant into the simulator every arm samples from.
+`VirtualBank` puts a Variant's bank behind an index instead of in memory: with
+the simulator's counter-based RNG, simulation i of a seed is a function of
+(seed, i) alone, so any slice of an arbitrarily large bank can be simulated on
+demand and comes out identical to the same rows of one materialised
+`sample(size)` call. Storage is traded for compute; recently used chunks are
+kept in a small LRU cache so sequential and chunk-local access pay once.
+
+    bank = VirtualBank(variant, seed=variant.seed, size=1_000_000)
+    bank[17]            # one dataset, row axis dropped
+    bank[5000:5300]     # a batch, exactly what sample() would have produced
+
+`save_bank` / `load_bank` hand a simulated bank between processes through
+disk, keyed by `bank_fingerprint` so a bank is only ever read back by the arm
+configuration that produced it.
+"""
+
+import os
+
+os.environ.setdefault("KERAS_BACKEND", "jax")
+
+import dataclasses
+import hashlib
+import json
+import pathlib
+import shutil
+from collections import OrderedDict
+
+import numpy as np
+import bayesflow as bf
+from bayesflow.datasets.helpers import apply_augmentations
+
+from togetherflow import TogetherFlowSimulator
+from togetherflow.codec import decode_bank
+from togetherflow.simulator import (
+    make_logit_random_walk_expander,
+    make_ou_salience_process,
+)
+
+
+def build_simulator(variant, seed, rng=None, output_mode="flat"):
+    """The simulator for one arm. `rng` overrides the variant's own setting."""
+    if variant.expander == "static":
+        expander = None                      # the simulator's default broadcast
+    elif variant.expander == "random_walk_w":
+        # tau lives in the last slot and nothing in the kernel reads it; it acts
+        # only here, shaping the w path. That is why it must not be called
+        # "alpha" or "kappa", which the kernel does read.
+        expander = make_logit_random_walk_expander(
+            w_col=variant.param_names.index("w0"),
+            tau_col=variant.param_names.index("tau"),
+            dt=variant.dt,
+        )
+    else:
+        raise ValueError(f"unknown expander '{variant.expander}'")
+
+    # Time-varying beacon salience. The paths are emitted whenever the process
+    # is on, but only reach the network if the variant lists "salience" among
+    # its channels — that difference is exactly the v8 observed/hidden pair.
+    if variant.salience_sigma is None:
+        salience_process = None
+    else:
+        salience_process = make_ou_salience_process(
+            num_beacons=variant.num_beacons,
+            dt=variant.dt,
+            sigma_s=variant.salience_sigma,
+            tau_s=variant.salience_tau,
+        )
+
+    return TogetherFlowSimulator(
+        expander=expander,
+        salience_process=salience_process,
+        include_salience_paths=salience_process is not None,
+        salience_sensitivity=variant.salience_sensitivity,
+        switch_margin=variant.switch_margin,
+        num_agents=variant.num_agents,
+        num_beacons=variant.num_beacons,
+        dt=variant.dt,
+        time_horizon=variant.time_horizon,
+        output_mode=output_mode,
+        prior=variant.prior,
+        param_names=variant.param_names,
+        reference_radii=variant.reference_radii,
+        beacon_strengths=variant.beacon_strengths,
+        beacon_spread=variant.beacon_spread,
+        relative_heading=variant.relative_heading,
+        diffusive_heading=variant.diffusive_heading,
+        repulsion_radius=variant.repulsion_radius,
+        repulsion_gain=variant.repulsion_gain,
+        seed=seed,
+        rng=rng or variant.rng,
+        summary_channels=variant.channels if output_mode == "concatenated" else None,
+    )
+
+
+class VirtualBank:
+    """An indexable bank of `size` simulations that exist only when read.
+
+    Parameters
+    ----------
+    variant      : Variant — the arm whose generative model fills the bank
+    seed         : int — the bank's identity; same (variant, seed) → same rows
+    size         : int — number of simulations addressable
+    chunk_size   : int — simulations generated per kernel call; the unit of
+                   caching. Large enough to keep every core busy.
+    cache_chunks : int — chunks held in memory, least recently used evicted
+    output_mode  : str — the simulator's, "flat" or "concatenated"
+
+    Rows are float32, as run_variant casts its in-memory bank, so a slice of a
+    VirtualBank is interchangeable with a slice of the materialised one.
+    """
+
+    def __init__(self, variant, seed, size, chunk_size=256, cache_chunks=8,
+                 output_mode="flat"):
+        if size < 0:
+            raise ValueError(f"size must be >= 0, got {size}")
+        if chunk_size < 1 or cache_chunks < 1:
+            raise ValueError("chunk_size and cache_chunks must be >= 1")
+        self.variant = variant
+        self.seed = seed
+        self.size = int(size)
+        self.chunk_size = int(chunk_size)
+        self.cache_chunks = int(cache_chunks)
+        # Philox regardless of the variant's setting: per-index regeneration is
+        # the whole point, and the legacy RNG cannot address a row alone.
+        self.sim = build_simulator(variant, seed=seed, rng="philox", output_mode=output_mode)
+        self._cache = OrderedDict()
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            i = int(key)
+            if i < 0:
+                i += self.size
+            batch = self.take(np.array([i]))
+            return {k: v[0] for k, v in batch.items()}
+        if isinstance(key, slice):
+            return self.take(np.arange(*key.indices(self.size)))
+        return self.take(key)
+
+    def take(self, indices):
+        """Rows at `indices` (any order, repeats allowed) as one batch dict."""
+        indices = np.asarray(indices, dtype=np.int64).reshape(-1)
+        indices = np.where(indices < 0, indices + self.size, indices)
+        if indices.size and (indices.min() < 0 or indices.max() >= self.size):
+            raise IndexError(f"index out of range for bank of size {self.size}")
+        if indices.size == 0:
+            return {k: v[:0] for k, v in self._chunk(0).items()}
+
+        chunk_ids = indices // self.chunk_size
+        out = None
+        for c in np.unique(chunk_ids):
+            chunk = self._chunk(int(c))
+            rows = chunk_ids == c
+            local = indices[rows] - c * self.chunk_size
+            if out is None:
+                out = {k: np.empty((indices.size,) + v.shape[1:], dtype=v.dtype)
+                       for k, v in chunk.items()}
+            for k, v in chunk.items():
+                out[k][rows] = v[local]
+        return out
+
+    def _chunk(self, c):
+        if c in self._cache:
+            self._cache.move_to_end(c)
+            return self._cache[c]
+        start = c * self.chunk_size
+        stop = min(start + self.chunk_size, self.size)
+        data = self.sim.sample_indices(np.arange(start, stop))
+        data = {k: np.asarray(v, dtype=np.float32) for k, v in data.items()}
+        self._cache[c] = data
+        if len(self._cache) > self.cache_chunks:
+            self._cache.popitem(last=False)
+        return data
+
+    def dataset(self, batch_size, adapter, start=0, stop=None, shuffle=True, **kwargs):
+        """A keras PyDataset over rows [start, stop) for offline training."""
+        return VirtualBankDataset(self, batch_size, adapter, start, stop,
+                                  shuffle=shuffle, **kwargs)
+
+
+class VirtualBankDataset(bf.datasets.OfflineDataset):
+    """OfflineDataset whose rows come from a VirtualBank rather than memory.
+
+    Shuffling is two-level — chunk order, then rows within each chunk — rather
+    than a full permutation. A full permutation would touch a different chunk
+    for almost every row of a batch and regenerate each chunk once per batch
+    instead of once per epoch; within an epoch every row is still seen exactly
+    once, in an order that changes every epoch.
+    """
+
+    def __init__(self, bank, batch_size, adapter, start=0, stop=None, **kwargs):
+        self.bank = bank
+        self.start = int(start)
+        self.stop = len(bank) if stop is None else int(stop)
+        super().__init__(data={}, batch_size=batch_size, adapter=adapter,
+                         num_samples=self.stop - self.start, **kwargs)
+
+    def get_batch_by_sample_indices(self, indices):
+        batch = self.bank.take(self.start + np.asarray(indices))
+        batch = apply_augmentations(batch, self.augmentations)
+        if self.adapter is not None:
+            batch = self.adapter(batch)
+        return batch
+
+    def shuffle(self):
+        size = self.bank.chunk_size
+        # Chunk boundaries are absolute bank positions, so a window that starts
+        # mid-chunk still groups rows by the chunk that generates them.
+        absolute = self.start + np.arange(self.num_samples, dtype="int64")
+        groups = [absolute[absolute // size == c] - self.start
+                  for c in np.unique(absolute // size)]
+        np.random.shuffle(groups)
+        for g in groups:
+            np.random.shuffle(g)
+        self.indices = np.concatenate(groups) if groups else self.indices
+
+
+def bank_expander(sim, variant):
+    """Stored batch -> what the adapter expects, or None if stored as simulated.
+
+    A bank may be compact (trajectories only), quantised (fixed-point
+    trajectories), or both; decoding comes first, so derived channels are
+    rebuilt from the decoded trajectory.
+    """
+    if not (variant.compact_bank or variant.quantize_bank):
+        return None
+
+    def expand(batch):
+        if variant.quantize_bank:
+            batch = decode_bank(batch, sim.room_size)
+        if variant.compact_bank:
+            batch = sim.expand_compact(batch)
+        return batch
+
+    return expand
+
+
+class CompactDataset(bf.datasets.OfflineDataset):
+    """OfflineDataset over a stored bank, expanded one batch at a time.
+
+    `expand` is a `bank_expander`: each batch is decoded and rebuilt into the
+    full channel set just before augmentation and the adapter, so memory holds
+    only the stored form and the adapter sees what a flat bank would give.
+    """
+
+    def __init__(self, data, batch_size, adapter, expand, **kwargs):
+        self.expand = expand
+        super().__init__(data=data, batch_size=batch_size, adapter=adapter, **kwargs)
+
+    def get_batch_by_sample_indices(self, indices):
+        batch = {k: np.take(v, indices, axis=0) for k, v in self.data.items()}
+        batch = {k: np.asarray(v, dtype=np.float32) for k, v in self.expand(batch).items()}
+        batch = apply_augmentations(batch, self.augmentations)
+        if self.adapter is not None:
+            batch = self.adapter(batch)
+        return batch
+
+
+def fit_dataset(workflow, dataset, epochs, validation_data=None, **kwargs):
+    """`BasicWorkflow.fit_offline` for a prepared PyDataset.
+
+    fit_offline only accepts in-memory dicts; its dataset-agnostic core, _fit,
+    takes any PyDataset, which is the same route fit_online and fit_disk use.
+    """
+    return workflow._fit(
+        dataset,
+        epochs,
+        strategy="offline",
+        keep_optimizer=False,
+        validation_data=validation_data,
+        **kwargs,
+    )
+
+
+def fit_virtual(workflow, bank, epochs, batch_size, start=0, stop=None,
+                validation_data=None, **kwargs):
+    """`fit_offline`, with the training rows read from a VirtualBank."""
+    dataset = bank.dataset(batch_size, workflow.adapter, start, stop)
+    return fit_dataset(workflow, dataset, epochs, validation_data, **kwargs)
+
+
+def bank_fingerprint(variant, output_mode):
+    """A digest of everything that decides a variant's bank.
+
+    Every field of the Variant goes in, so any edit to an arm — even one that
+    would not change its bank — invalidates a bank stored for it. Callables
+    (priors) are identified by name.
+    """
+    fields = dataclasses.asdict(variant) | {"output_mode": output_mode}
+    text = json.dumps(fields, sort_keys=True,
+                      default=lambda o: getattr(o, "__qualname__", type(o).__name__))
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def save_bank(data, path, fingerprint):
+    """Write a bank dict as one .npy per key under the directory `path`.
+
+    The directory is built under a temporary name and renamed into place, so
+    a reader never sees a partly written bank.
+    """
+    path = pathlib.Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    for k, v in data.items():
+        np.save(tmp / f"{k}.npy", v)
+    (tmp / "fingerprint").write_text(fingerprint)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+
+
+def load_bank(path, fingerprint, consume=True, mmap_mode=None):
+    """The bank saved at `path`, or None if absent or saved for something else.
+
+    With `consume`, the directory is removed once read: a handed-over bank is
+    used once, and a rerun simulates its own. `mmap_mode` is np.load's; with
+    "r" the arrays stay on disk and only the rows read are paged in.
+    """
+    path = pathlib.Path(path)
+    try:
+        if (path / "fingerprint").read_text() != fingerprint:
+            return None
+    except OSError:
+        return None
+    data = {f.stem: np.load(f, mmap_mode=mmap_mode) for f in sorted(path.glob("*.npy"))}
+    if consume:
+        shutil.rmtree(path, ignore_errors=True)
+    return data
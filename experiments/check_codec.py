@@ -0,0 +1,159 @@
+"""Check that the quantised bank codec leaves posterior diagnostics unchanged.
+
+    uv run python experiments/check_codec.py v0-reference
+    uv run python experiments/check_codec.py v0-reference --n 300
+
+Takes an arm that has already been trained by run_variant.py, simulates a
+fresh compact test set, and runs the default diagnostics twice on it: once on
+the exact trajectories and once after an int16/uint16 round trip through
+`togetherflow.codec`, with every derived channel rebuilt from the decoded
+trajectory — the worst case, since neighbour counts can flip at the radius.
+The same data is also diagnosed under a second sampling seed, which gives the
+scale of Monte Carlo noise the codec's effect has to stay inside.
+
+Writes outputs/variants/<slug>/codec_check.md.
+"""
+
+import os
+
+os.environ.setdefault("KERAS_BACKEND", "jax")
+
+import argparse
+import logging
+import pathlib
+import sys
+
+import numpy as np
+import keras
+import bayesflow as bf
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent))
+
+from togetherflow.codec import (
+    decode_bank, encode_bank, position_step, DEFAULT_MARGIN,
+)
+from banks import build_simulator
+from diagnostics import sample_adaptive, summary_embeddings
+from run_variant import (
+    OUT_ROOT, build_adapter, build_networks, load_trained, match_adapter,
+    normalize_metric_index,
+)
+from variants import ALL_VARIANTS, BY_SLUG
+
+# A seed the arm never trained or was tested on.
+CHECK_SEED_OFFSET = 7919
+SAMPLING_SEEDS = (0, 1)
+# Differences below this are reported as agreement regardless of noise scale;
+# diagnostics are printed to three decimals.
+ABS_FLOOR = 1e-3
+
+
+def _float32(data):
+    return {k: np.asarray(v, dtype=np.float32) for k, v in data.items()}
+
+
+def channel_report(exact, quant):
+    """Largest round-trip error per stored channel and flip rate per derived one."""
+    rows = []
+    for k in ("positions", "rotations"):
+        err = np.abs(exact[k].astype(np.float64) - quant[k].astype(np.float64))
+        if k == "rotations":
+            err = np.minimum(err, 2.0 * np.pi - err)
+        rows.append((k, "max abs error", float(err.max())))
+    for k in ("neighbors", "radii_counts"):
+        if k in exact:
+            rows.append((k, "fraction changed", float(np.mean(exact[k] != quant[k]))))
+    return rows
+
+
+def metric_table(df):
+    params = list(df.columns)
+    lines = ["| Metric | " + " | ".join(params) + " |",
+             "|--------|" + "|".join(["-----"] * len(params)) + "|"]
+    for row in df.index:
+        lines.append(f"| {row} | " + " | ".join(f"{df.loc[row, p]:.3f}" for p in params) + " |")
+    return lines
+
+
+def diagnose(workflow, test_data, seed, variant, embeddings=None):
+    keras.utils.set_random_seed(seed)
+    samples = sample_adaptive(workflow, test_data, results_dir=OUT_ROOT / variant.slug,
+                              inference_net=variant.inference_net, embeddings=embeddings)
+    return normalize_metric_index(workflow.compute_default_diagnostics(
+        test_data=test_data, samples=samples, as_data_frame=True
+    ))
+
+
+def check(variant, n):
+    results_dir = OUT_ROOT / variant.slug
+    sim = build_simulator(variant, seed=variant.seed + CHECK_SEED_OFFSET,
+                          output_mode="compact")
+    compact = sim.sample(n)
+    decoded = decode_bank(encode_bank(compact, sim.room_size), sim.room_size)
+    exact = _float32(sim.expand_compact(compact))
+    quant = _float32(sim.expand_compact(decoded))
+    round_trip = channel_report(exact, quant)
+
+    summary_net, inference_net, _ = build_networks(variant)
+    workflow = bf.workflows.BasicWorkflow(
+        simulator=sim,
+        adapter=build_adapter(variant),
+        summary_network=summary_net,
+        inference_network=inference_net,
+        standardize="all",
+    )
+    workflow = load_trained(workflow, results_dir)
+    # Expanded data is per-channel; the checkpoint may read one summary tensor.
+    exact = match_adapter(exact, workflow, variant, sim)
+    quant = match_adapter(quant, workflow, variant, sim)
+
+    # The exact set is sampled twice; its summary pass only needs to run once.
+    exact_embeddings = summary_embeddings(workflow, exact)
+    base = diagnose(workflow, exact, SAMPLING_SEEDS[0], variant, exact_embeddings)
+    noise = (diagnose(workflow, exact, SAMPLING_SEEDS[1], variant, exact_embeddings) - base).abs()
+    codec = (diagnose(workflow, quant, SAMPLING_SEEDS[0], variant) - base).abs()
+    tolerance = np.maximum(2.0 * noise, ABS_FLOOR)
+    passed = bool((codec <= tolerance).all().all())
+
+    step = position_step(sim.room_size, DEFAULT_MARGIN)
+    lines = [
+        f"# Codec check — {variant.slug}",
+        "",
+        f"{n} fresh test datasets (seed {variant.seed + CHECK_SEED_OFFSET}); positions "
+        f"int16 at {step[0] * 1e3:.2f} x {step[1] * 1e3:.2f} mm, headings uint16; "
+        "derived channels rebuilt from the decoded trajectory.",
+        "",
+        f"**Verdict: {'unchanged' if passed else 'CHANGED'}** — every |codec - exact| "
+        f"within max(2 x seed-to-seed difference, {ABS_FLOOR}).",
+        "",
+        "## Round trip",
+        "",
+        "| Channel | Measure | Value |",
+        "|---|---|---|",
+    ]
+    lines += [f"| {k} | {m} | {v:.3g} |" for k, m, v in round_trip]
+    for title, table in (("Exact", base), ("|codec - exact|", codec),
+                         ("|seed 1 - seed 0| (sampling noise)", noise)):
+        lines += ["", f"## {title}", ""] + metric_table(table)
+    (results_dir / "codec_check.md").write_text("\n".join(lines) + "\n")
+    logging.info("[%s] codec %s -> %s", variant.slug,
+                 "unchanged" if passed else "CHANGED", results_dir / "codec_check.md")
+    return passed
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("slug", help="a trained variant")
+    ap.add_argument("--n", type=int, default=300, help="test datasets")
+    args = ap.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s  %(message)s",
+                        datefmt="%H:%M:%S")
+    if args.slug not in BY_SLUG:
+        ap.error(f"unknown variant '{args.slug}'. Choose from: "
+                 + ", ".join(v.slug for v in ALL_VARIANTS))
+    sys.exit(0 if check(BY_SLUG[args.slug], args.n) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""Posterior draws for diagnostics, taken once per trained model and test set.
+
+`compute_default_diagnostics` and `plot_default_diagnostics` each draw their
+own posterior samples for the whole test set unless handed `samples=`, so a
+run that computes metrics and then plots them integrates the flow (or the
+diffusion SDE) over 300 datasets x 1000 draws twice. Here the draws are taken
+once, written to the results folder, and passed to both. The file is keyed by
+a digest of the network weights, the test data and the draw count, so a
+diagnostics-only rerun of an unchanged model reads it back instead of
+sampling, and anything that changes the posterior invalidates it.
+
+The summary network's pass over the test set is cached the same way. Its
+output depends only on the weights and the data, so every later sampling of
+the same datasets runs only the conditional flow.
+
+    samples = posterior_samples(workflow, test_data, results_dir)
+    metrics = workflow.compute_default_diagnostics(test_data=test_data, samples=samples)
+    figures = workflow.plot_default_diagnostics(test_data=test_data, samples=samples)
+"""
+
+import hashlib
+import json
+import logging
+import time
+
+import numpy as np
+
+SAMPLES_FILE = "posterior_samples.npz"
+EMBEDDINGS_FILE = "summary_embeddings.npz"
+BATCH_FILE = "sampling_batch.json"
+# Datasets per summary-network forward pass when embedding a test set.
+EMBED_BATCH_SIZE = 32
+NUM_SAMPLES = 1000          # compute_/plot_default_diagnostics' own default
+_KEY = "__cache_key__"
+
+# Sampling memory per posterior draw, beyond the summary network's pass over
+# the dataset. Anchored on the one hard data point: v0-diffusion asked for
+# 4.47 GiB for 300 x 1000 draws in one batch, ~16 KB a draw, where the ODE of
+# flow matching keeps a fraction of the SDE solver's state.
+DRAW_BYTES = {"flow_matching": 4 * 1024, "diffusion": 16 * 1024}
+# Activations of the summary network per input value.
+SUMMARY_ACTIVATION_FACTOR = 8
+# Share of free memory the first batch is sized to; probing finds the rest.
+MEMORY_FRACTION = 0.5
+
+
+def weights_digest(approximator):
+    """Digest of a model's weights.
+
+    RNG state variables are left out: sampling advances them, and the digest
+    must name the same model before and after it draws.
+    """
+    h = hashlib.sha1()
+    for v in approximator.weights:
+        if "seed_generator" in v.path:
+            continue
+        h.update(v.path.encode())
+        h.update(np.ascontiguousarray(np.asarray(v)).tobytes())
+    return h.hexdigest()
+
+
+def data_digest(data):
+    h = hashlib.sha1()
+    for k in sorted(data):
+        v = np.ascontiguousarray(data[k])
+        h.update(f"{k}{v.dtype}{v.shape}".encode())
+        h.update(v.tobytes())
+    return h.hexdigest()
+
+
+def summary_embeddings(workflow, data, results_dir=None):
+    """The summary network's output for every dataset in `data`, row for row.
+
+    For fixed data and weights the embeddings never change, so they are
+    computed once and, with `results_dir`, kept in summary_embeddings.npz
+    under a digest of both. Anything that samples the posterior of these
+    datasets — metrics, figures, SBC, predictive checks — can then pass the
+    rows it needs to `sample_from_embeddings` and run only the inference
+    network.
+
+    Returns
+    -------
+    np.ndarray of shape (N, summary_dim), or None without a summary network
+    """
+    if getattr(workflow.approximator, "summary_network", None) is None:
+        return None
+    key = f"{weights_digest(workflow.approximator)}:{data_digest(data)}"
+    path = None if results_dir is None else results_dir / EMBEDDINGS_FILE
+    if path is not None and path.exists():
+        with np.load(path) as cached:
+            if str(cached[_KEY]) == key:
+                return cached["embeddings"]
+    embeddings = np.asarray(workflow.approximator.summarize(data, batch_size=EMBED_BATCH_SIZE))
+    if path is not None:
+        np.savez(path, embeddings=embeddings, **{_KEY: np.array(key)})
+    return embeddings
+
+
+def sample_from_embeddings(workflow, conditions, embeddings, num_samples):
+    """`workflow.sample` with the summary network's output supplied.
+
+    `embeddings` must be the `summary_embeddings` rows of `conditions`. The
+    approximator's sample() has no argument for them, but the condition
+    preparation it calls does — the route ancestral sampling takes — so they
+    are passed through there for the duration of the call.
+    """
+    approximator = workflow.approximator
+    prepare = approximator._prepare_conditions
+
+    def prepare_with_embeddings(data, **kwargs):
+        return prepare(data, summary_outputs=embeddings, **kwargs)
+
+    approximator._prepare_conditions = prepare_with_embeddings
+    try:
+        return workflow.sample(num_samples=num_samples, conditions=conditions)
+    finally:
+        del approximator._prepare_conditions
+
+
+def free_memory_bytes():
+    """Free memory on the device jax samples on, or None if unknown."""
+    try:
+        import jax
+
+        stats = jax.devices()[0].memory_stats() or {}
+        if "bytes_limit" in stats:
+            return stats["bytes_limit"] - stats.get("bytes_in_use", 0)
+    except Exception:                                       # noqa: BLE001
+        pass
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def estimate_batch_size(test_data, num_samples, inference_net):
+    """Datasets per sampling batch that should fit in MEMORY_FRACTION of free memory."""
+    n = len(next(iter(test_data.values())))
+    input_bytes = sum(np.asarray(v[:1]).nbytes for v in test_data.values())
+    per_dataset = (SUMMARY_ACTIVATION_FACTOR * input_bytes
+                   + num_samples * DRAW_BYTES.get(inference_net, DRAW_BYTES["diffusion"]))
+    free = free_memory_bytes()
+    if free is None:
+        return min(n, 25)
+    return int(max(1, min(n, MEMORY_FRACTION * free // per_dataset)))
+
+
+def _is_oom(e):
+    text = f"{type(e).__name__} {e}".lower()
+    return any(s in text for s in ("resource_exhausted", "resourceexhausted", "out of memory",
+                                   "outofmemory"))
+
+
+def sample_adaptive(workflow, test_data, num_samples=NUM_SAMPLES, results_dir=None,
+                    inference_net="flow_matching", embeddings=None):
+    """`workflow.sample` over the test set in the largest batches that fit.
+
+    The first batch is sized from `estimate_batch_size`, or from the last
+    size that worked for this arm when `results_dir` holds one. Each batch
+    that succeeds doubles the next; one that runs out of memory becomes a
+    ceiling, and later batches bisect between it and the largest size that
+    fitted. Every batch that
+    succeeds is real output, so probing costs no extra sampling, and batching
+    costs nothing numerically: each batch is an independent draw from the same
+    posterior. The largest size that worked is saved to
+    `results_dir`/sampling_batch.json.
+
+    With `embeddings` (see `summary_embeddings`), each batch runs only the
+    inference network.
+    """
+    n = len(next(iter(test_data.values())))
+    cache = None if results_dir is None else results_dir / BATCH_FILE
+    size, ceiling = estimate_batch_size(test_data, num_samples, inference_net), n + 1
+    if cache is not None and cache.exists():
+        cached = json.loads(cache.read_text())
+        size, ceiling = cached["batch_size"], cached["ceiling"] or n + 1
+
+    parts, start, best = [], 0, 0
+    while start < n:
+        size = max(1, min(size, ceiling - 1, n - start))
+        rows = slice(start, start + size)
+        conditions = {k: v[rows] for k, v in test_data.items()}
+        try:
+            if embeddings is None:
+                out = workflow.sample(num_samples=num_samples, conditions=conditions)
+            else:
+                out = sample_from_embeddings(workflow, conditions, embeddings[rows], num_samples)
+        except Exception as e:                              # noqa: BLE001
+            if not _is_oom(e) or size == 1:
+                raise
+            # Retry between the largest size known to fit and the one that
+            # did not; a failure at or below that size resets it.
+            ceiling = size
+            best = min(best, size - 1)
+            size = (best + size) // 2 if best else size // 2
+            logging.info("sampling batch of %d ran out of memory; retrying at %d", ceiling, size)
+            continue
+        parts.append({k: np.asarray(v) for k, v in out.items()})
+        start += size
+        best = max(best, size)
+        # Double until something fails, then bisect towards the ceiling.
+        size = 2 * size if ceiling > n else (best + ceiling) // 2
+
+    if cache is not None:
+        cache.write_text(json.dumps({"batch_size": best,
+                                     "ceiling": ceiling if ceiling <= n else None}))
+    logging.info("posterior sampling batch: %d datasets%s", best,
+                 f" (ceiling {ceiling})" if ceiling <= n else "")
+    return {k: np.concatenate([p[k] for p in parts], axis=0) for k in parts[0]}
+
+
+def posterior_samples(workflow, test_data, results_dir, num_samples=NUM_SAMPLES,
+                      inference_net="flow_matching"):
+    """Posterior draws for every test dataset, from the cache when it matches.
+
+    Parameters
+    ----------
+    workflow            : BasicWorkflow — trained or restored
+    test_data           : dict of np.ndarray — as passed to the diagnostics
+    results_dir         : pathlib.Path — where the cache file lives
+    num_samples         : int — draws per dataset
+    inference_net       : str — the variant's, for sizing sampling batches
+
+    Returns
+    -------
+    dict[str, np.ndarray] — what `workflow.sample` returns, (N, num_samples, ...)
+    """
+    path = results_dir / SAMPLES_FILE
+    key = f"{weights_digest(workflow.approximator)}:{data_digest(test_data)}:{num_samples}"
+    try:
+        with np.load(path) as cached:
+            if str(cached[_KEY]) == key:
+                logging.info("[%s] posterior samples from %s", results_dir.name, path)
+                return {k: cached[k] for k in cached.files if k != _KEY}
+    except (OSError, KeyError, ValueError):
+        pass
+
+    t0 = time.time()
+    embeddings = summary_embeddings(workflow, test_data, results_dir)
+    samples = sample_adaptive(workflow, test_data, num_samples, results_dir, inference_net,
+                              embeddings=embeddings)
+    logging.info("[%s] drew %d posterior samples for %d datasets in %.1fs",
+                 results_dir.name, num_samples, len(next(iter(test_data.values()))),
+                 time.time() - t0)
+    np.savez(path, **samples, **{_KEY: np.array(key)})
+    return samples
@@ -30,7 +30,7 @@ sys.path.insert(0, str(pathlib.Path(__file__).parent))
 
 from togetherflow.simulator import TogetherFlowSimulator, _seed_numba_rng
 from togetherflow.initialization import initialize_beacons
-from scenarios import make_fixed_prior, ROOM, HALF_X, HALF_Y, REPULSION_RADIUS, REPULSION_GAIN
+from scenarios import ROOM, HALF_X, HALF_Y, REPULSION_RADIUS, REPULSION_GAIN
 
 OUT = pathlib.Path(__file__).parent.parent / "outputs" / "scenarios" / "figures"
 
@@ -169,7 +169,6 @@ def main():
             dt=0.1,
             time_horizon=SNAPSHOT_S,
             output_mode="raw",
-            prior=make_fixed_prior(0.75, 2.0, 1.0, NOISE),
             relative_heading=True,
             seed=rng_seed,
             fixed_beacons=beacons,
@@ -179,7 +178,7 @@ def main():
             repulsion_gain=REPULSION_GAIN,
             diffusive_heading=True,
         )
-        out = sim.sample(1)
+        out = sim.simulate([0.75, 2.0, 1.0, NOISE])
         counts = draw(ax, title, out["positions"][0], out["rotations"][0],
                       beacons, strengths, alpha)
         print(f"{title:<40} beacons attended: {int((counts > 0).sum())}/{NUM_BEACONS}  "
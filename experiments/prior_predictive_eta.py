@@ -38,7 +38,8 @@ import numpy as np
 sys.path.insert(0, str(pathlib.Path(__file__).parent))
 
 from togetherflow.simulator import TogetherFlowSimulator
-from scenarios import make_fixed_prior, ROOM, REPULSION_RADIUS, REPULSION_GAIN
+from togetherflow.statistics import DIAGNOSTIC_NAMES
+from scenarios import ROOM, REPULSION_RADIUS, REPULSION_GAIN
 
 OUT = pathlib.Path(__file__).parent.parent / "outputs" / "scenarios"
 
@@ -56,31 +57,49 @@ EARLY_WINDOW_S = 10.0    # tortuosity window, before agents reach the walls
 W_REF, R_REF, V_REF = 0.5, 1.0, 1.0
 
 
-def trajectory_stats(positions, rotations):
-    """Per-simulation (mean |turn|, tortuosity), averaged over agents."""
-    dtheta = np.abs((np.diff(rotations, axis=1) + np.pi) % (2 * np.pi) - np.pi)
-    mean_turn = dtheta.mean(axis=(1, 2))
+MEAN_TURN = DIAGNOSTIC_NAMES.index("mean_turn")
+TORTUOSITY = DIAGNOSTIC_NAMES.index("tortuosity")
 
-    # Restricted to the pre-saturation window; see the module docstring.
-    k = int(EARLY_WINDOW_S / DT)
-    early = positions[:, :k]
-    step = np.linalg.norm(np.diff(early, axis=1), axis=-1)
-    path = step.sum(axis=1)                                   # (B, A)
-    net = np.linalg.norm(early[:, -1] - early[:, 0], axis=-1)
-    tort = (path / np.maximum(net, 1e-6)).mean(axis=1)
-    return mean_turn, tort
 
+def trajectory_stats(out):
+    """Per-simulation (mean |turn|, tortuosity), averaged over agents.
 
-def simulate(prior, batch, seed=SEED):
-    sim = TogetherFlowSimulator(
+    Both are reduced inside the kernel ("diagnostics" output), so no batch of
+    trajectories is ever held and the prior predictive can run at any size.
+    Tortuosity is over the pre-saturation window; see the module docstring.
+    """
+    diag = out["diagnostics"]
+    return diag[:, MEAN_TURN], diag[:, TORTUOSITY]
+
+
+def make_simulator(prior=None, seed=SEED, rng="legacy"):
+    return TogetherFlowSimulator(
         num_agents=NUM_AGENTS, num_beacons=NUM_BEACONS, room_size=ROOM,
-        dt=DT, time_horizon=TIME_HORIZON, output_mode="raw", prior=prior,
+        dt=DT, time_horizon=TIME_HORIZON, output_mode="diagnostics", prior=prior,
+        diagnostic_window=EARLY_WINDOW_S,
         relative_heading=True, diffusive_heading=True,
-        beacon_spread=BEACON_SPREAD, seed=seed,
+        beacon_spread=BEACON_SPREAD, seed=seed, rng=rng,
         repulsion_radius=REPULSION_RADIUS, repulsion_gain=REPULSION_GAIN,
     )
-    out = sim.sample(batch)
-    return trajectory_stats(out["positions"], out["rotations"])
+
+
+def simulate(prior, batch, seed=SEED):
+    return trajectory_stats(make_simulator(prior, seed).sample(batch))
+
+
+def sweep_eta(grid, batch, seed=SEED):
+    """(mean |turn|, tortuosity) of `batch` simulations per eta, shape (len(grid), batch).
+
+    One kernel call for the whole grid. Every eta reuses the same `batch`
+    positions of the seed's sequence, so the layouts and noise are common to
+    all of them and the differences down the grid are eta's alone.
+    """
+    thetas = np.array([[W_REF, R_REF, V_REF, eta] for eta in grid for _ in range(batch)])
+    out = make_simulator(seed=seed, rng="philox").simulate(
+        thetas, indices=np.tile(np.arange(batch), len(grid))
+    )
+    mt, tt = trajectory_stats(out)
+    return mt.reshape(len(grid), batch), tt.reshape(len(grid), batch)
 
 
 # ── Candidate priors ─────────────────────────────────────────────────────────
@@ -133,8 +152,7 @@ def main():
           f"({NUM_AGENTS} agents, {TIME_HORIZON:g}s, 8 sims each)\n")
     print(f"{'eta':>6}  {'mean |turn|':>12}  {'tortuosity(10s)':>16}")
     sweep = []
-    for eta in grid:
-        mt, tt = simulate(make_fixed_prior(W_REF, R_REF, V_REF, eta), 8)
+    for eta, mt, tt in zip(grid, *sweep_eta(grid, 8)):
         sweep.append((eta, mt.mean(), tt.mean()))
         print(f"{eta:6.2f}  {mt.mean():12.4f}  {tt.mean():16.2f}")
 
@@ -69,8 +69,19 @@ def _assess_group(diag, key, good, bad_word):
     return ("; ".join(bits) + ".") if bits else "No per-parameter ratings were available."
 
 
+def _telemetry_table(telemetry):
+    L = ["| Phase | Wall-clock | CPU util | Peak RSS | Sims/s | Steps/s |",
+         "|-------|-----------|----------|----------|--------|---------|"]
+    for name, r in telemetry["phases"].items():
+        sims = f"{r['sims_per_s']:.1f}" if r.get("sims_per_s") else "—"
+        steps = f"{r['steps_per_s']:.2f}" if r.get("steps_per_s") else "—"
+        L.append(f"| {name} | {r['seconds'] / 60:.1f} min | {r['cpu_util']:.0%} of "
+                 f"{telemetry['cores']} cores | {r['peak_rss_gb']:.2f} GB | {sims} | {steps} |")
+    return L
+
+
 def write_report(results_dir, variant, metrics, training_report, diag_report,
-                 next_steps, summary_dim, elapsed_s):
+                 next_steps, summary_dim, elapsed_s, threads=None, telemetry=None):
     params = list(metrics.columns)
     rows = list(metrics.index)
 
@@ -111,7 +122,9 @@ def write_report(results_dir, variant, metrics, training_report, diag_report,
         ("Batch size", str(variant.batch_size)),
         ("Validation data", f"{variant.n_val} simulations"),
         ("Test data", f"{variant.n_test} simulations"),
-        ("Training mode", "online" if getattr(variant, "online", False) else "offline"),
+        ("Training mode", "online" if getattr(variant, "online", False)
+                          else "offline, virtual bank" if getattr(variant, "virtual_bank", False)
+                          else "offline"),
         ("Early stopping", f"patience {variant.early_stopping_patience}, best weights restored"
                            if getattr(variant, "early_stopping_patience", 0) else "off"),
         ("Simulation budget",
@@ -120,6 +133,8 @@ def write_report(results_dir, variant, metrics, training_report, diag_report,
          else f"{variant.n_train} training simulations"),
         ("Wall-clock", f"{elapsed_s / 60:.1f} min"),
     ]
+    if threads:
+        train_cfg.append(("Simulator threads", threads))
 
     L = []
     L.append(f"# {variant.title}")
@@ -148,6 +163,17 @@ def write_report(results_dir, variant, metrics, training_report, diag_report,
         L.append(f"| {k} | {v} |")
     L.append("")
 
+    if telemetry:
+        L.append("## Resources")
+        L.append("")
+        L.append(f"Peak RSS {telemetry['peak_rss_gb']:.2f} GB; "
+                 f"**{telemetry['bound'] or 'undetermined'}-bound**. Sims/s is measured "
+                 "over the simulator's own time, which in an online arm's train phase "
+                 "runs inside training.")
+        L.append("")
+        L += _telemetry_table(telemetry)
+        L.append("")
+
     L.append("## Convergence")
     L.append("")
     L.append("![Training loss](loss.png)")
@@ -4,6 +4,7 @@
     uv run python experiments/run_pipeline.py --force      # rerun everything
     uv run python experiments/run_pipeline.py --dry-run    # show the plan and exit
     uv run python experiments/run_pipeline.py --only v0-reference v2-salience-spread10
+    uv run python experiments/run_pipeline.py --jobs 4     # CPU node: 4 arms at once
 
 Design notes for a multi-hour unattended run:
 
@@ -16,16 +17,35 @@ Design notes for a multi-hour unattended run:
 * **Isolated failures.** A crashing arm is recorded and the pipeline moves on.
 * **Per-arm timeout**, so one hung arm cannot consume the whole night.
 * **Live status** in `outputs/variants/STATUS.md`, rewritten after every arm, so
-  progress is visible without reading logs.
+  progress is visible without reading logs; `status.json` holds the same plus
+  each arm's resource telemetry (phase times, peak RSS, CPU use, throughput).
+* **Optional warm worker** (`--pool`). A fresh process pays for the Python,
+  JAX and bayesflow imports, numba JIT and XLA compilation before each arm does
+  any work. Pool mode instead runs the arms, one after another, on a single
+  long-lived worker that imports once and keeps its compiled kernels, clearing
+  only Keras model state between arms. The fresh process per arm stays the
+  default, and is what a failed pool arm is retried in.
+* **Optional bank prefetch** (`--prefetch`). Simulation is CPU-bound and
+  training accelerator-bound, so while one arm trains the next arm's bank is
+  simulated in a background CPU-only process and handed over on disk
+  (`<slug>/prefetched_bank/`); the arm loads it instead of simulating.
+* **Concurrent arms on CPU-only nodes** (`--jobs N`). One arm leaves most of a
+  64-core node idle. With N > 1 the cores are split into N disjoint slots, each
+  arm is pinned to one, and an arm is only started when its memory estimate
+  (from its bank size) fits beside the arms already running. Status, skipping,
+  timeout and the single retry behave as in the sequential loop.
 """
 
 import argparse
 import datetime as dt
+import json
+import multiprocessing as mp
 import os
 import pathlib
 import subprocess
 import sys
 import time
+import traceback
 
 # CRITICAL: this driver imports `variants`, which reaches togetherflow -> bayesflow
 # -> keras -> jax. On import JAX preallocates ~75% of the GPU (9 GB of 12 GB here)
@@ -41,12 +61,18 @@ os.environ["JAX_PLATFORMS"] = "cpu"
 
 sys.path.insert(0, str(pathlib.Path(__file__).parent))
 
+from telemetry import load as load_telemetry
+
 ROOT = pathlib.Path(__file__).parent.parent
 OUT_ROOT = ROOT / "outputs" / "variants"
 LOG_DIR = OUT_ROOT / "logs"
 
 # Generous: the slowest arm so far took ~13 min. This is a hang guard, not a budget.
 PER_ARM_TIMEOUT_S = 90 * 60
+# Concurrent mode (--jobs): per-arm overhead beyond the bank — Python, JAX,
+# the networks and diagnostics — and the share of MemAvailable arms may claim.
+ARM_BASE_BYTES = 3 * 1024 ** 3
+MEMORY_FRACTION = 0.8
 
 
 def _now():
@@ -54,6 +80,11 @@ def _now():
 
 
 def write_status(results, planned, started_at):
+    """Rewrite STATUS.md, for reading, and status.json, for tooling.
+
+    status.json carries each finished arm's telemetry (phase times, peak RSS,
+    CPU use, throughput) as the arm left it in <slug>/telemetry.json.
+    """
     LOG_DIR.mkdir(parents=True, exist_ok=True)
     done = sum(1 for v in results.values() if v["status"] in ("ok", "skipped"))
     lines = [
@@ -62,21 +93,34 @@ def write_status(results, planned, started_at):
         f"Started {started_at}  ·  updated {_now()}",
         f"**{done} / {len(planned)} arms complete**",
         "",
-        "| Arm | Status | Wall-clock | Log |",
-        "|-----|--------|-----------|-----|",
+        "| Arm | Status | Wall-clock | Bound | Peak RSS | Log |",
+        "|-----|--------|-----------|-------|----------|-----|",
     ]
+    arms = {}
     for slug in planned:
         r = results.get(slug)
         if r is None:
-            lines.append(f"| `{slug}` | pending | — | — |")
-        else:
-            mins = f"{r['seconds'] / 60:.1f} min" if r["seconds"] else "—"
-            lines.append(
-                f"| `{slug}` | {r['status']} | {mins} | [log](logs/{slug}.log) |"
-            )
+            lines.append(f"| `{slug}` | pending | — | — | — | — |")
+            arms[slug] = {"status": "pending"}
+            continue
+        tel = load_telemetry(OUT_ROOT / slug) if r["status"] in ("ok", "skipped") else None
+        mins = f"{r['seconds'] / 60:.1f} min" if r["seconds"] else "—"
+        bound = (tel or {}).get("bound") or "—"
+        rss = f"{tel['peak_rss_gb']:.1f} GB" if tel else "—"
+        lines.append(
+            f"| `{slug}` | {r['status']} | {mins} | {bound} | {rss} | [log](logs/{slug}.log) |"
+        )
+        arms[slug] = {"status": r["status"], "seconds": r["seconds"], "telemetry": tel}
     lines += ["", "Per-arm reports: `outputs/variants/<slug>/report.md`",
               "Cross-arm comparison: `outputs/variants/SUMMARY.md`", ""]
     (OUT_ROOT / "STATUS.md").write_text("\n".join(lines))
+    (OUT_ROOT / "status.json").write_text(json.dumps({
+        "started": started_at,
+        "updated": _now(),
+        "complete": done,
+        "planned": len(planned),
+        "arms": arms,
+    }, indent=2))
 
 
 def gpu_used_mib():
@@ -111,8 +155,13 @@ def wait_for_free_gpu(threshold_mib=1000, timeout_s=180):
     return gpu_used_mib()
 
 
-def run_arm(slug, force):
-    """Run one arm in a fresh subprocess. Returns (status, seconds)."""
+def _start_arm(slug, force, cores=None):
+    """Launch one arm's subprocess, logging to logs/<slug>.log.
+
+    `cores`, if given, pins the arm to those CPUs; threads.available_cores()
+    reads the affinity mask and XLA sizes its pool from it, so both stay inside them.
+    Returns (process, open log file).
+    """
     LOG_DIR.mkdir(parents=True, exist_ok=True)
     log_path = LOG_DIR / f"{slug}.log"
 
@@ -131,27 +180,300 @@ def run_arm(slug, force):
     # were GPU memory pressure from a previous arm, which wait_for_free_gpu below
     # handles at the source.
 
+    preexec_fn = None
+    if cores is not None:
+        # numba sizes its pool from the machine, not the affinity mask.
+        env["NUMBA_NUM_THREADS"] = str(len(cores))
+        preexec_fn = lambda: os.sched_setaffinity(0, cores)     # noqa: E731
+
+    log = open(log_path, "w")
+    log.write(f"# {slug} — started {_now()}\n")
+    log.flush()
+    proc = subprocess.Popen(
+        cmd, stdout=log, stderr=subprocess.STDOUT,
+        env=env, cwd=str(ROOT), preexec_fn=preexec_fn,
+    )
+    return proc, log
+
+
+def run_arm(slug, force):
+    """Run one arm in a fresh subprocess. Returns (status, seconds)."""
     t0 = time.time()
-    with open(log_path, "w") as log:
-        log.write(f"# {slug} — started {_now()}\n")
-        log.flush()
+    proc, log = _start_arm(slug, force)
+    with log:
         try:
-            proc = subprocess.run(
-                cmd, stdout=log, stderr=subprocess.STDOUT,
-                env=env, cwd=str(ROOT), timeout=PER_ARM_TIMEOUT_S,
-            )
+            proc.wait(timeout=PER_ARM_TIMEOUT_S)
             status = "ok" if proc.returncode == 0 else f"failed (rc={proc.returncode})"
         except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
             status = f"timeout (>{PER_ARM_TIMEOUT_S // 60}min)"
     return status, time.time() - t0
 
 
+def start_prefetch(slug):
+    """Simulate `slug`'s bank in the background, for its arm to pick up.
+
+    The child keeps the driver's JAX_PLATFORMS=cpu: it only simulates, and
+    must not take GPU memory from the arm that is training.
+    """
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+    cmd = [sys.executable, str(ROOT / "experiments" / "run_variant.py"), slug, "--bank-only"]
+    env = dict(os.environ)
+    env.setdefault("KERAS_BACKEND", "jax")
+    with open(LOG_DIR / f"{slug}.prefetch.log", "w") as log:
+        return subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT,
+                                env=env, cwd=str(ROOT))
+
+
+def await_prefetch(proc, slug):
+    """Wait for a prefetch to land. A failed one only costs the arm its head
+    start: run_variant simulates the bank itself when none is waiting."""
+    try:
+        proc.wait(timeout=PER_ARM_TIMEOUT_S)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+    if proc.returncode != 0:
+        print(f"  {slug}: prefetch failed (rc={proc.returncode}); the arm will "
+              f"simulate its own bank — see logs/{slug}.prefetch.log", flush=True)
+
+
+def available_memory_bytes():
+    """MemAvailable from /proc/meminfo, or None off Linux."""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def estimate_arm_bytes(variant):
+    """Peak resident memory of one arm, from the size of its bank.
+
+    The bank is sized the way run_variant stores it: one float32 summary
+    tensor, a float32 compact trajectory, or int16/uint16 trajectories. While
+    it is simulated the kernel's float64 output exists alongside it, hence the
+    factor of two; ARM_BASE_BYTES covers the runtime, networks and diagnostics.
+    """
+    from banks import build_simulator
+    from togetherflow.channels import AGENT_CHANNELS
+
+    sim = build_simulator(variant, seed=variant.seed)
+    steps = int(variant.time_horizon / variant.dt)
+    if sim.downsample:
+        steps = -(-steps // sim.downsample_factor)
+    A = variant.num_agents
+    if variant.compact_bank:
+        per_step = (3 * A + 1) * (2 if variant.quantize_bank else 4)
+    elif variant.quantize_bank:
+        # Stored flat: every agent channel, not only the ones the net reads.
+        channels = list(dict.fromkeys(AGENT_CHANNELS + tuple(variant.channels)))
+        _, width = list(sim.channel_offsets(channels).values())[-1]
+        per_step = 4 * width - 6 * A
+    else:
+        _, width = list(sim.channel_offsets(variant.channels).values())[-1]
+        per_step = 4 * width
+    held = not (variant.online or variant.virtual_bank)
+    total = variant.n_val + variant.n_test + (variant.n_train if held else 0)
+    return ARM_BASE_BYTES + 2 * total * steps * per_step
+
+
+def run_concurrent(slugs, by_slug, force, jobs, on_done):
+    """Run `slugs` as concurrent fresh subprocesses on a CPU-only node.
+
+    The node's cores are split into `jobs` disjoint slots and each arm is
+    pinned to one. An arm starts when a slot is free and its memory estimate
+    fits in what the running arms leave of MemAvailable; the first arm in the
+    queue always starts on an idle node, so an oversized arm still runs,
+    alone. Arms start in plan order, and one that does not fit waits rather
+    than being overtaken. A failed arm is retried once, from the front of the
+    queue, as in the sequential loop. `on_done(slug, status, seconds)` is called as
+    each arm finishes.
+    """
+    cores = sorted(os.sched_getaffinity(0))
+    jobs = min(jobs, len(cores))
+    per_arm = max(1, len(cores) // jobs)
+    free_slots = [cores[i * per_arm:(i + 1) * per_arm] for i in range(jobs)]
+    memory = available_memory_bytes()
+    budget = None if memory is None else MEMORY_FRACTION * memory
+
+    # Each queue entry: (slug, attempt, previous status, previous seconds).
+    waiting = [(slug, 1, None, 0.0) for slug in slugs]
+    estimates = {slug: estimate_arm_bytes(by_slug[slug]) for slug in slugs}
+    running = {}        # slug -> (proc, log, slot, started, attempt, prev status, prev secs)
+
+    while waiting or running:
+        while waiting and free_slots:
+            slug, attempt, prev, prev_secs = waiting[0]
+            need = estimates[slug]
+            held = sum(estimates[s] for s in running)
+            if running and budget is not None and held + need > budget:
+                break
+            if not running and budget is not None and need > budget:
+                print(f"  {slug}: estimated {need / 1e9:.1f} GB exceeds the "
+                      f"{budget / 1e9:.1f} GB budget; running it alone", flush=True)
+            waiting.pop(0)
+            slot = free_slots.pop(0)
+            proc, log = _start_arm(slug, force or attempt > 1, cores=slot)
+            running[slug] = (proc, log, slot, time.time(), attempt, prev, prev_secs)
+            print(f"  {slug}: started on cores {slot[0]}-{slot[-1]} "
+                  f"(~{need / 1e9:.1f} GB){' — retry' if attempt > 1 else ''}", flush=True)
+
+        time.sleep(5)
+        for slug in list(running):
+            proc, log, slot, started, attempt, prev, prev_secs = running[slug]
+            secs = time.time() - started
+            if proc.poll() is None:
+                if secs < PER_ARM_TIMEOUT_S:
+                    continue
+                proc.kill()
+                proc.wait()
+                status = f"timeout (>{PER_ARM_TIMEOUT_S // 60}min)"
+            else:
+                status = "ok" if proc.returncode == 0 else f"failed (rc={proc.returncode})"
+            log.close()
+            del running[slug]
+            free_slots.append(slot)
+
+            if attempt == 1 and status != "ok":
+                print(f"  {slug}: {status} — retrying once", flush=True)
+                waiting.insert(0, (slug, 2, status, secs))
+                continue
+            if attempt > 1:
+                status = status if status == "ok" else f"{prev} (retry: {status})"
+                secs += prev_secs
+            on_done(slug, status, secs)
+
+
+def _redirect_fds(path):
+    """Point this process's stdout/stderr file descriptors at `path`, so the
+    log also captures output written below Python (XLA, CUDA)."""
+    sys.stdout.flush()
+    sys.stderr.flush()
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND)
+    os.dup2(fd, 1)
+    os.dup2(fd, 2)
+    os.close(fd)
+
+
+def _pool_worker(conn, force):
+    """Serve arms until told to stop. Runs in a spawned child process."""
+    # Undo the driver's CPU pin before anything here reaches jax, exactly as
+    # run_arm() does for its children.
+    os.environ.pop("JAX_PLATFORMS", None)
+    os.environ.setdefault("KERAS_BACKEND", "jax")
+    # Warm workers sit on the GPU between arms; preallocating 75% each would
+    # leave a retry in a fresh process nothing to start with.
+    os.environ.setdefault("XLA_PYTHON_CLIENT_PREALLOCATE", "false")
+
+    import gc
+    import logging
+
+    import keras
+    import run_variant
+    from variants import BY_SLUG
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s  %(message)s",
+                        datefmt="%H:%M:%S")
+    while True:
+        slug = conn.recv()
+        if slug is None:
+            return
+        _redirect_fds(LOG_DIR / f"{slug}.log")
+        print(f"# {slug} — started {_now()} (warm worker pid {os.getpid()})", flush=True)
+        t0 = time.time()
+        try:
+            run_variant.run(BY_SLUG[slug], force=force)
+            status = "ok"
+        except Exception:                                   # noqa: BLE001
+            traceback.print_exc()
+            status = "failed (in pool)"
+        # Model, optimizer and dataset objects go; imports, numba's compiled
+        # kernels and XLA's compilation cache stay warm for the next arm.
+        keras.backend.clear_session()
+        gc.collect()
+        # So does this arm's thread budget and any autotuning it did: the next
+        # arm starts from the process default, as a fresh process would, and
+        # run() plans its own from the cache.
+        run_variant.THREAD_BUDGET = run_variant.plan_budget()
+        run_variant.set_sim_threads(run_variant.THREAD_BUDGET.sim_threads)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        conn.send((status, time.time() - t0))
+
+
+class WarmPool:
+    """One long-lived arm worker, reused by the sequential loop arm after arm."""
+
+    def __init__(self, force):
+        self.force = force
+        self._ctx = mp.get_context("spawn")     # fork would copy the driver's state
+        self._worker = self._spawn()
+
+    def _spawn(self):
+        parent, child = self._ctx.Pipe()
+        proc = self._ctx.Process(target=_pool_worker, args=(child, self.force), daemon=True)
+        proc.start()
+        return proc, parent
+
+    def run(self, slug):
+        """Run one arm on a warm worker. Returns (status, seconds)."""
+        LOG_DIR.mkdir(parents=True, exist_ok=True)
+        (LOG_DIR / f"{slug}.log").write_text("")
+        proc, conn = self._worker
+        t0 = time.time()
+        try:
+            conn.send(slug)
+            if conn.poll(PER_ARM_TIMEOUT_S):
+                status, secs = conn.recv()
+            else:
+                status, secs = f"timeout (>{PER_ARM_TIMEOUT_S // 60}min)", time.time() - t0
+        except (EOFError, OSError):
+            status, secs = "failed (worker died)", time.time() - t0
+        # A worker whose arm did not finish cleanly may hold half-built state
+        # or a wedged device; replace it rather than trust it with the next arm.
+        if status != "ok":
+            proc.kill()
+            proc.join()
+            self._worker = self._spawn()
+        return status, secs
+
+    def close(self):
+        proc, conn = self._worker
+        try:
+            conn.send(None)
+        except OSError:
+            pass
+        proc.join(timeout=30)
+        if proc.is_alive():
+            proc.kill()
+
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--force", action="store_true", help="rerun arms that already have a report")
     ap.add_argument("--dry-run", action="store_true", help="print the plan and exit")
     ap.add_argument("--only", nargs="+", metavar="SLUG", help="run only these arms")
+    ap.add_argument("--pool", action="store_true",
+                    help="run the arms one after another on a single warm worker "
+                         "process instead of a fresh subprocess each")
+    ap.add_argument("--jobs", type=int, default=1, metavar="N",
+                    help="CPU-only nodes: run up to N arms at once, each pinned to "
+                         "1/N of the cores and admitted against a memory estimate")
+    ap.add_argument("--prefetch", action="store_true",
+                    help="simulate the next arm's bank in the background while the "
+                         "current arm trains")
     args = ap.parse_args()
+    if args.jobs > 1 and args.pool:
+        ap.error("--jobs and --pool are alternatives")
+    if args.jobs > 1 and args.prefetch:
+        ap.error("--prefetch applies to the sequential loop; --jobs already overlaps arms")
+    if args.jobs > 1 and gpu_used_mib() is not None:
+        ap.error("--jobs is for CPU-only nodes; concurrent arms would share the GPU")
 
     os.environ.setdefault("KERAS_BACKEND", "jax")
     from variants import ALL_VARIANTS, BY_SLUG
@@ -177,36 +499,81 @@ def main():
     started_at = _now()
     results, t_start = {}, time.time()
     write_status(results, planned, started_at)
+    pool = WarmPool(args.force) if args.pool else None
+
+    if args.jobs > 1:
+        todo = []
+        for slug in planned:
+            if (OUT_ROOT / slug / "report.md").exists() and not args.force:
+                print(f"{slug}: already complete, skipping")
+                results[slug] = {"status": "skipped", "seconds": 0.0}
+            else:
+                todo.append(slug)
+        write_status(results, planned, started_at)
 
-    for i, slug in enumerate(planned, 1):
-        if (OUT_ROOT / slug / "report.md").exists() and not args.force:
-            print(f"[{i}/{len(planned)}] {slug}: already complete, skipping")
-            results[slug] = {"status": "skipped", "seconds": 0.0}
+        def on_done(slug, status, secs):
+            results[slug] = {"status": status, "seconds": secs}
+            print(f"[{len(results)}/{len(planned)}] {slug}: {status} in {secs / 60:.1f} min",
+                  flush=True)
             write_status(results, planned, started_at)
-            continue
 
-        used = wait_for_free_gpu()
-        if used is not None and used >= 1000:
-            print(f"[{i}/{len(planned)}] warning: GPU still holds {used} MiB "
-                  f"after waiting; starting anyway", flush=True)
-        print(f"[{i}/{len(planned)}] {slug}: running ... (GPU {used} MiB free-check)",
-              flush=True)
-        status, secs = run_arm(slug, args.force)
-
-        # One retry: the failures seen so far were transient GPU-initialisation
-        # problems, which a fresh process after a settle usually clears. A
-        # genuine bug fails identically twice and costs only the extra attempt.
-        if status != "ok":
-            print(f"[{i}/{len(planned)}] {slug}: {status} — retrying once", flush=True)
-            wait_for_free_gpu()
-            time.sleep(15)
-            status2, secs2 = run_arm(slug, force=True)
-            status = status2 if status2 == "ok" else f"{status} (retry: {status2})"
-            secs += secs2
-
-        results[slug] = {"status": status, "seconds": secs}
-        print(f"[{i}/{len(planned)}] {slug}: {status} in {secs / 60:.1f} min", flush=True)
-        write_status(results, planned, started_at)
+        print(f"Running {len(todo)} arm(s), up to {args.jobs} at a time", flush=True)
+        run_concurrent(todo, BY_SLUG, args.force, args.jobs, on_done)
+    else:
+        to_run = [s for s in planned
+                  if args.force or not (OUT_ROOT / s / "report.md").exists()]
+        prefetching = {}
+        for i, slug in enumerate(planned, 1):
+            if slug not in to_run:
+                print(f"[{i}/{len(planned)}] {slug}: already complete, skipping")
+                results[slug] = {"status": "skipped", "seconds": 0.0}
+                write_status(results, planned, started_at)
+                continue
+
+            if args.prefetch:
+                # This arm's bank was started while the previous arm trained;
+                # the next arm's starts now, and runs while this one trains.
+                if slug in prefetching:
+                    await_prefetch(prefetching.pop(slug), slug)
+                following = to_run[to_run.index(slug) + 1:]
+                if following:
+                    print(f"[{i}/{len(planned)}] prefetching the bank of {following[0]}",
+                          flush=True)
+                    prefetching[following[0]] = start_prefetch(following[0])
+
+            if pool is not None:
+                # Warm workers keep their device memory between arms by design,
+                # so there is no free-GPU state to wait for.
+                print(f"[{i}/{len(planned)}] {slug}: running on a warm worker ...", flush=True)
+                status, secs = pool.run(slug)
+            else:
+                used = wait_for_free_gpu()
+                if used is not None and used >= 1000:
+                    print(f"[{i}/{len(planned)}] warning: GPU still holds {used} MiB "
+                          f"after waiting; starting anyway", flush=True)
+                print(f"[{i}/{len(planned)}] {slug}: running ... (GPU {used} MiB free-check)",
+                      flush=True)
+                status, secs = run_arm(slug, args.force)
+
+            # One retry: the failures seen so far were transient GPU-initialisation
+            # problems, which a fresh process after a settle usually clears. A
+            # genuine bug fails identically twice and costs only the extra attempt.
+            # The retry is always a fresh process, so a pool arm that failed gets
+            # the isolated path as its second chance.
+            if status != "ok":
+                print(f"[{i}/{len(planned)}] {slug}: {status} — retrying once", flush=True)
+                wait_for_free_gpu()
+                time.sleep(15)
+                status2, secs2 = run_arm(slug, force=True)
+                status = status2 if status2 == "ok" else f"{status} (retry: {status2})"
+                secs += secs2
+
+            results[slug] = {"status": status, "seconds": secs}
+            print(f"[{i}/{len(planned)}] {slug}: {status} in {secs / 60:.1f} min", flush=True)
+            write_status(results, planned, started_at)
+
+    if pool is not None:
+        pool.close()
 
     # Refresh the cross-arm comparison from whatever completed.
     try:
@@ -0,0 +1,315 @@
+"""Simulation-based calibration of a trained arm on thousands of datasets.
+
+    uv run python experiments/run_sbc.py v0-reference                 # 10,000 fresh datasets
+    uv run python experiments/run_sbc.py v0-reference --n 50000 --chunk 500
+    uv run python experiments/run_sbc.py v0-reference --bank outputs/variants/v0-reference/prefetched_bank
+
+The arms are diagnosed on n_test = 300 datasets, which leaves ECE and coverage
+noisy, and `compute_default_diagnostics` needs every dataset's draws in memory
+at once. Here test datasets arrive in chunks — simulated on demand from a
+VirtualBank under a seed the arm never saw, or read from a saved bank — and
+each chunk's draws are reduced and dropped before the next is sampled. What
+is kept is what the metrics need and no more:
+
+    Log Gamma            a rank histogram, (num_samples + 1) x P counts
+    Calibration Error    inlier counts per credible level, 20 x P
+    NRMSE, Contraction   one RMSE and one posterior variance per dataset and
+                         parameter, and the dataset's true parameters
+
+so memory grows with datasets x parameters, never with draws or data. The
+four rows come out under the names and in the arithmetic of BayesFlow's own
+metrics, and agree with `compute_default_diagnostics` on the same draws up to
+the resampling in the NRMSE normaliser and the Log Gamma null.
+
+Writes outputs/variants/<slug>/sbc.csv, sbc.md and sbc_state.npz (the rank
+histograms and coverage counts, for plotting without resampling).
+"""
+
+import os
+
+os.environ.setdefault("KERAS_BACKEND", "jax")
+
+import argparse
+import logging
+import pathlib
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import keras
+import bayesflow as bf
+from scipy.stats import binom
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent))
+
+from banks import VirtualBank, bank_expander, bank_fingerprint, build_simulator, load_bank
+from check_codec import metric_table
+from diagnostics import NUM_SAMPLES, sample_adaptive, summary_embeddings
+from run_variant import (
+    OUT_ROOT, bank_layout, build_adapter, build_networks, load_trained, match_adapter,
+    normalize_metric_index,
+)
+from telemetry import peak_rss_gb
+from variants import ALL_VARIANTS, BY_SLUG
+
+# A seed the arm never trained or was tested on (check_codec uses 7919).
+SBC_SEED_OFFSET = 104729
+CHUNK_SIZE = 500
+# calibration_error's and calibration_log_gamma's defaults.
+RESOLUTION = 20
+MIN_QUANTILE, MAX_QUANTILE = 0.005, 0.995
+NUM_NULL_DRAWS = 1000
+GAMMA_QUANTILE = 0.05
+# Rows of the NRMSE prior bootstrap resampled at a time.
+BOOTSTRAP_ROWS = 1024
+
+
+def _split(x, name, batch_axes):
+    """`bayesflow.utils.split_arrays` for one key: a column per trailing entry."""
+    x = np.asarray(x, dtype=np.float64)
+    if x.ndim == batch_axes:
+        return [name], x[..., None]
+    if x.shape[-1] == 1:
+        return [name], x
+    return [f"{name}_{i}" for i in range(x.shape[-1])], x
+
+
+class StreamingSBC:
+    """Running state of the default diagnostics over chunks of datasets.
+
+    `update` takes one chunk's posterior draws and true parameters and folds
+    them in; `metrics` turns what has been seen so far into the DataFrame
+    `compute_default_diagnostics(..., as_data_frame=True)` returns.
+    """
+
+    def __init__(self, num_samples, resolution=RESOLUTION):
+        self.num_samples = num_samples
+        self.alphas = np.linspace(MIN_QUANTILE, MAX_QUANTILE, resolution)
+        lowers = (1.0 - self.alphas) / 2.0
+        self.levels = np.concatenate([lowers, 1.0 - lowers])
+        self.names = None
+        self.n = 0
+        self.rank_counts = None     # (num_samples + 1, P)
+        self.inliers = None         # (resolution, P)
+        self._rmse, self._post_var, self._targets = [], [], []
+
+    def update(self, samples, data):
+        """Fold in one chunk: `samples` from workflow.sample, `data` its conditions."""
+        names, draws, truth = [], [], []
+        for k, v in samples.items():
+            cols, est = _split(v, k, batch_axes=2)
+            _, tgt = _split(data[k], k, batch_axes=1)
+            names += cols
+            draws.append(est)
+            truth.append(tgt.reshape(len(est), -1))
+        draws = np.concatenate(draws, axis=-1)              # (n, S, P)
+        truth = np.concatenate(truth, axis=-1)              # (n, P)
+        if draws.shape[1] != self.num_samples:
+            raise ValueError(f"expected {self.num_samples} draws per dataset, "
+                             f"got {draws.shape[1]}")
+        if self.names is None:
+            self.names = names
+            self.rank_counts = np.zeros((self.num_samples + 1, len(names)), dtype=np.int64)
+            self.inliers = np.zeros((len(self.alphas), len(names)), dtype=np.int64)
+        elif names != self.names:
+            raise ValueError(f"chunk has variables {names}, expected {self.names}")
+
+        ranks = np.sum(draws < truth[:, None], axis=1)
+        for p in range(ranks.shape[1]):
+            self.rank_counts[:, p] += np.bincount(ranks[:, p], minlength=self.num_samples + 1)
+
+        bounds = np.quantile(draws, self.levels, axis=1)    # (2 * resolution, n, P)
+        lower, upper = np.split(bounds, 2)
+        self.inliers += np.sum((lower <= truth) & (upper >= truth), axis=1)
+
+        self._rmse.append(np.sqrt(np.mean((draws - truth[:, None]) ** 2, axis=1)))
+        self._post_var.append(draws.var(axis=1, ddof=1))
+        self._targets.append(truth)
+        self.n += len(truth)
+
+    def _prior_rmse(self, targets):
+        """Per-dataset RMSE of prior draws bootstrapped from `targets`, as the
+        "prior" normaliser of root_mean_squared_error, a block of rows at a time."""
+        out = np.empty_like(targets)
+        for start in range(0, self.n, BOOTSTRAP_ROWS):
+            rows = slice(start, min(start + BOOTSTRAP_ROWS, self.n))
+            idx = np.random.randint(0, self.n, size=(rows.stop - rows.start, self.num_samples))
+            err = targets[idx] - targets[rows, None, :]
+            out[rows] = np.sqrt(np.mean(err ** 2, axis=1))
+        return out
+
+    def _gamma_null(self):
+        """calibration_log_gamma's null distribution, via sorted uniforms.
+
+        Counts below each z are taken as integers; the original's n * mean()
+        can land a hair under one and floor a count short in binom.cdf.
+        """
+        z = np.arange(1, self.num_samples + 2) / (self.num_samples + 1)
+        gamma = np.empty(NUM_NULL_DRAWS)
+        for i in range(NUM_NULL_DRAWS):
+            u = np.sort(np.random.uniform(size=self.n))
+            counts = np.searchsorted(u, z, side="left")
+            gamma[i] = 2 * np.min(np.minimum(binom.cdf(counts, self.n, z),
+                                             1 - binom.cdf(counts - 1, self.n, z)))
+        return gamma
+
+    def log_gamma(self):
+        z = np.arange(1, self.num_samples + 2) / (self.num_samples + 1)
+        threshold = np.quantile(self._gamma_null(), GAMMA_QUANTILE)
+        # Ranks below i, for i = 1 .. S + 1, read off the histogram.
+        below = np.cumsum(self.rank_counts, axis=0)
+        gamma = 2 * np.min(np.minimum(binom.cdf(below, self.n, z[:, None]),
+                                      1 - binom.cdf(below - 1, self.n, z[:, None])), axis=0)
+        return np.log(gamma / threshold)
+
+    def metrics(self):
+        if not self.n:
+            raise ValueError("no datasets seen")
+        targets = np.concatenate(self._targets)
+        rmse = np.concatenate(self._rmse)
+        post_var = np.concatenate(self._post_var)
+        nrmse = np.median(rmse / np.median(self._prior_rmse(targets), axis=0), axis=0)
+        ece = np.median(np.abs(self.inliers / self.n - self.alphas[:, None]), axis=0)
+        prior_var = targets.var(axis=0, keepdims=True, ddof=1)
+        contraction = np.median(np.clip(1 - post_var / prior_var, 0, 1), axis=0)
+        return pd.DataFrame(
+            {
+                "NRMSE": nrmse,
+                "Log Gamma": self.log_gamma(),
+                "Calibration Error": ece,
+                "Posterior Contraction": contraction,
+            },
+            index=self.names,
+        ).T
+
+    def coverage(self):
+        """(credible level, per-variable empirical coverage) so far."""
+        return self.alphas, self.inliers / max(self.n, 1)
+
+    def save(self, path):
+        np.savez(path, names=np.array(self.names), n=self.n, alphas=self.alphas,
+                 rank_counts=self.rank_counts, inliers=self.inliers)
+
+
+def virtual_chunks(variant, seed, n, chunk_size=CHUNK_SIZE):
+    """`n` fresh datasets, simulated a chunk at a time."""
+    bank = VirtualBank(variant, seed=seed, size=n, chunk_size=chunk_size, cache_chunks=1)
+    for start in range(0, n, chunk_size):
+        yield bank[start:start + chunk_size]
+
+
+def bank_chunks(variant, path, start, n=None, chunk_size=CHUNK_SIZE):
+    """Rows [start, start + n) of a bank saved by run_variant --bank-only,
+    memory-mapped and expanded a chunk at a time."""
+    output_mode, _ = bank_layout(variant)
+    data = load_bank(path, bank_fingerprint(variant, output_mode), consume=False,
+                     mmap_mode="r")
+    if data is None:
+        raise FileNotFoundError(f"no bank for {variant.slug} at {path}")
+    sim = build_simulator(variant, seed=variant.seed, output_mode=output_mode)
+    expand = bank_expander(sim, variant)
+    stop = len(next(iter(data.values())))
+    stop = stop if n is None else min(stop, start + n)
+    for i in range(start, stop, chunk_size):
+        chunk = {k: np.asarray(v[i:min(i + chunk_size, stop)]) for k, v in data.items()}
+        if expand is not None:
+            chunk = expand(chunk)
+        yield {k: np.asarray(v, dtype=np.float32) for k, v in chunk.items()}
+
+
+def stream_sbc(workflow, chunks, variant, num_samples=NUM_SAMPLES):
+    """Sample and reduce each chunk in turn; returns the StreamingSBC.
+
+    Chunks may be per-channel (a VirtualBank, an expanded bank) or
+    pre-concatenated; each is put in the layout the checkpoint's adapter reads.
+    """
+    sbc = StreamingSBC(num_samples)
+    results_dir = OUT_ROOT / variant.slug
+    sim = build_simulator(variant, seed=variant.seed)
+    t0 = time.time()
+    for chunk in chunks:
+        chunk = match_adapter(chunk, workflow, variant, sim)
+        embeddings = summary_embeddings(workflow, chunk)
+        samples = sample_adaptive(workflow, chunk, num_samples, results_dir,
+                                  variant.inference_net, embeddings=embeddings)
+        sbc.update(samples, chunk)
+        del samples
+        logging.info("[%s] SBC: %d datasets (%.0f/s, peak RSS %.1f GB)", variant.slug, sbc.n,
+                     sbc.n / (time.time() - t0), peak_rss_gb())
+    return sbc
+
+
+def run(variant, n, chunk_size, num_samples, bank=None):
+    results_dir = OUT_ROOT / variant.slug
+    if bank is None:
+        seed = variant.seed + SBC_SEED_OFFSET
+        chunks = virtual_chunks(variant, seed, n, chunk_size)
+        source = f"{n} fresh datasets (seed {seed})"
+    else:
+        # The rows run_variant diagnoses onward: a bank's test split.
+        start = variant.n_val if variant.online else variant.n_train + variant.n_val
+        chunks = bank_chunks(variant, bank, start, n, chunk_size)
+        source = f"bank {bank}, rows from {start}"
+
+    summary_net, inference_net, _ = build_networks(variant)
+    # load_trained swaps in the checkpoint's own adapter; stream_sbc matches it.
+    workflow = bf.workflows.BasicWorkflow(
+        adapter=build_adapter(variant, preconcatenated=bank_layout(variant)[1]),
+        summary_network=summary_net,
+        inference_network=inference_net,
+        standardize="all",
+    )
+    workflow = load_trained(workflow, results_dir)
+
+    keras.utils.set_random_seed(0)
+    t0 = time.time()
+    sbc = stream_sbc(workflow, chunks, variant, num_samples)
+    metrics = normalize_metric_index(sbc.metrics())
+    metrics.to_csv(results_dir / "sbc.csv")
+    sbc.save(results_dir / "sbc_state.npz")
+
+    alphas, coverage = sbc.coverage()
+    lines = [
+        f"# Simulation-based calibration — {variant.slug}",
+        "",
+        f"{sbc.n} datasets x {num_samples} posterior draws from {source}, "
+        f"in chunks of {chunk_size}; {time.time() - t0:.0f}s, peak RSS {peak_rss_gb():.1f} GB.",
+        "",
+        "## Metrics",
+        "",
+    ] + metric_table(metrics) + [
+        "",
+        "## Coverage",
+        "",
+        "| Credible level | " + " | ".join(sbc.names) + " |",
+        "|---|" + "|".join(["---"] * len(sbc.names)) + "|",
+    ]
+    for a, row in zip(alphas, coverage):
+        lines.append(f"| {a:.3f} | " + " | ".join(f"{c:.3f}" for c in row) + " |")
+    (results_dir / "sbc.md").write_text("\n".join(lines) + "\n")
+    logging.info("[%s] SBC on %d datasets -> %s", variant.slug, sbc.n, results_dir / "sbc.md")
+    return metrics
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("slug", help="a trained variant")
+    ap.add_argument("--n", type=int, default=10_000,
+                    help="datasets (with --bank, at most this many)")
+    ap.add_argument("--chunk", type=int, default=CHUNK_SIZE, help="datasets held at once")
+    ap.add_argument("--samples", type=int, default=NUM_SAMPLES, help="draws per dataset")
+    ap.add_argument("--bank", type=pathlib.Path,
+                    help="read the test split of a bank saved by run_variant --bank-only")
+    args = ap.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s  %(message)s",
+                        datefmt="%H:%M:%S")
+    if args.slug not in BY_SLUG:
+        ap.error(f"unknown variant '{args.slug}'. Choose from: "
+                 + ", ".join(v.slug for v in ALL_VARIANTS))
+    run(BY_SLUG[args.slug], args.n, args.chunk, args.samples, bank=args.bank)
+
+
+if __name__ == "__main__":
+    main()
@@ -31,19 +31,28 @@ import bayesflow as bf
 sys.path.insert(0, str(pathlib.Path(__file__).parent))
 sys.path.insert(0, str(pathlib.Path(__file__).parent.parent / ".claude" / "skills" / "amortized-workflow"))
 
-from togetherflow import TogetherFlowSimulator
-from togetherflow.simulator import (
-    make_logit_random_walk_expander,
-    make_ou_salience_process,
-)
 from togetherflow.networks import SummaryNet, TransformerSummaryNet
 from variants import ALL_VARIANTS, BY_SLUG, PARAM_BOUNDS
+from banks import (
+    CompactDataset, VirtualBank, bank_expander, bank_fingerprint, build_simulator,
+    fit_dataset, fit_virtual, load_bank, save_bank,
+)
+from togetherflow.codec import encode_bank
 from scripts.inspect_training import inspect_history
 from scripts.check_diagnostics import check_diagnostics, suggest_next_steps
 from report import write_report
+from diagnostics import posterior_samples
+from telemetry import FILENAME as TELEMETRY_FILE, Telemetry
+from threads import autotune_callback, plan_budget, set_sim_threads
+
+# The process default until an arm plans its own with plan_threads.
+THREAD_BUDGET = plan_budget()
+set_sim_threads(THREAD_BUDGET.sim_threads)
 
 ROOT = pathlib.Path(__file__).parent.parent
 OUT_ROOT = ROOT / "outputs" / "variants"
+# Where run_pipeline --prefetch leaves an arm's bank, under its results folder.
+PREFETCH_DIR = "prefetched_bank"
 
 FIGURE_NAMES = {
     "losses": "loss.png",
@@ -60,15 +69,6 @@ LATEX_NAMES = {
     "mu_w": r"$\mu_w$", "sigma_w": r"$\sigma_w$",
 }
 
-# Posterior sampling for diagnostics defaults to one batch of
-# (num_test_datasets * num_samples) rows — 300 x 1000 = 300,000 here. FlowMatching
-# absorbs that; DiffusionModel does not, because adaptive stochastic integration
-# keeps far more intermediate state per row, and v0-diffusion died requesting
-# 4.47 GiB on a 12 GB card *after* training had completed. Chunking costs nothing
-# numerically: each batch is an independent draw from the same posterior.
-DIAGNOSTIC_BATCH_SIZE = 25
-DIAGNOSTIC_KWARGS = {"approximator_kwargs": {"batch_size": DIAGNOSTIC_BATCH_SIZE}}
-
 # BayesFlow 2.0.12 labels diagnostic rows differently from the names the skill's
 # check_diagnostics() looks up. Without this mapping the lookups miss silently
 # and every report loses its calibration and contraction ratings.
@@ -91,64 +91,15 @@ def normalize_metric_index(metrics):
     return renamed
 
 
-def build_simulator(variant, seed):
-    if variant.expander == "static":
-        expander = None                      # the simulator's default broadcast
-    elif variant.expander == "random_walk_w":
-        # tau lives in the last slot and nothing in the kernel reads it; it acts
-        # only here, shaping the w path. That is why it must not be called
-        # "alpha" or "kappa", which the kernel does read.
-        expander = make_logit_random_walk_expander(
-            w_col=variant.param_names.index("w0"),
-            tau_col=variant.param_names.index("tau"),
-            dt=variant.dt,
-        )
-    else:
-        raise ValueError(f"unknown expander '{variant.expander}'")
-
-    # Time-varying beacon salience. The paths are emitted whenever the process
-    # is on, but only reach the network if the variant lists "salience" among
-    # its channels — that difference is exactly the v8 observed/hidden pair.
-    if variant.salience_sigma is None:
-        salience_process = None
-    else:
-        salience_process = make_ou_salience_process(
-            num_beacons=variant.num_beacons,
-            dt=variant.dt,
-            sigma_s=variant.salience_sigma,
-            tau_s=variant.salience_tau,
-        )
-
-    return TogetherFlowSimulator(
-        expander=expander,
-        salience_process=salience_process,
-        include_salience_paths=salience_process is not None,
-        salience_sensitivity=variant.salience_sensitivity,
-        switch_margin=variant.switch_margin,
-        num_agents=variant.num_agents,
-        num_beacons=variant.num_beacons,
-        dt=variant.dt,
-        time_horizon=variant.time_horizon,
-        output_mode="flat",
-        prior=variant.prior,
-        param_names=variant.param_names,
-        reference_radii=variant.reference_radii,
-        beacon_strengths=variant.beacon_strengths,
-        beacon_spread=variant.beacon_spread,
-        relative_heading=variant.relative_heading,
-        diffusive_heading=variant.diffusive_heading,
-        repulsion_radius=variant.repulsion_radius,
-        repulsion_gain=variant.repulsion_gain,
-        seed=seed,
-    )
-
-
-def build_adapter(variant):
+def build_adapter(variant, preconcatenated=False):
     """Explicit adapter — constraints first, then routing.
 
     .constrain() maps bounded parameters to an unconstrained space so the flow
     never has to place mass outside the support. This matters most for w and
     noise, which live on [0, 1].
+
+    `preconcatenated` is for data whose channels already arrive as one
+    `summary_variables` tensor in channel order; routing them is then a no-op.
     """
     adapter = bf.adapters.Adapter()
     # An arm whose prior leaves the default support declares its own bounds;
@@ -160,20 +111,142 @@ def build_adapter(variant):
             bounds = bounds_table.get(name)
             if bounds:
                 adapter = adapter.constrain(name, **bounds)
-    return (
+    adapter = (
         adapter
         .convert_dtype("float64", "float32")
         .concatenate(list(variant.infer), into="inference_variables")
-        .concatenate(list(variant.channels), into="summary_variables", axis=-1)
     )
+    if not preconcatenated:
+        adapter = adapter.concatenate(list(variant.channels), into="summary_variables", axis=-1)
+    return adapter
+
+
+def build_networks(variant):
+    """(summary_net, inference_net, summary_dim) for one arm."""
+    # summary_dim follows the 3x-parameters heuristic; the inference net uses the
+    # workflow's Base sizing rather than the smaller net used in earlier runs.
+    n_params = len(variant.infer)
+    summary_dim = 3 * n_params
+    if variant.summary_net == "bdlstm":
+        summary_net = SummaryNet(summary_dim=summary_dim)
+    elif variant.summary_net == "transformer":
+        summary_net = TransformerSummaryNet(summary_dim=summary_dim)
+    else:
+        raise ValueError(f"unknown summary_net '{variant.summary_net}'")
+    # Matched subnet across both estimators, so v0-diffusion differs from
+    # v0-reference in the generative process and nothing else that we control.
+    subnet_kwargs = {"widths": (256,) * 4, "time_embedding_dim": 32}
+    if variant.inference_net == "flow_matching":
+        inference_net = bf.networks.FlowMatching(subnet_kwargs=subnet_kwargs)
+    elif variant.inference_net == "diffusion":
+        # Required by CompositionalWorkflow, which the partial-pooling work needs.
+        inference_net = bf.networks.DiffusionModel(subnet_kwargs=subnet_kwargs)
+    else:
+        raise ValueError(f"unknown inference_net '{variant.inference_net}'")
+    return summary_net, inference_net, summary_dim
+
 
+class TrainingCursor(keras.callbacks.Callback):
+    """The training state keras.callbacks.BackupAndRestore does not keep.
 
-def _train(workflow, variant, train_data, val_data, results_dir):
-    """Fit the workflow and persist the history. Returns the Keras History."""
-    callbacks = []
+    BackupAndRestore saves weights, optimizer state — and with it the step
+    count the learning-rate schedule reads — and the epoch counter. This adds,
+    in the same backup directory, the simulator's seed cursor (so a resumed
+    online arm continues the batch sequence rather than repeating it), numpy's
+    global RNG (the offline shuffle), and the history of the epochs already
+    run, so history.json and loss.png still cover the whole fit.
+
+    The two are separate writes, so a kill can land between them. The cursor
+    goes first (it precedes BackupAndRestore in the callback list) and keeps
+    the previous epoch's state beside the current one; on resume the state
+    whose epoch matches the backup's is the one restored.
+    """
+
+    # Where BackupAndRestore records the epoch it resumes from.
+    BACKUP_METADATA = "training_metadata.json"
+
+    def __init__(self, simulator, backup_dir):
+        super().__init__()
+        self.simulator = simulator
+        self.path = pathlib.Path(backup_dir) / "cursor.json"
+        self.history = {}
+        self._last = None
+
+    def _backup_epoch(self):
+        try:
+            metadata = json.loads((self.path.parent / self.BACKUP_METADATA).read_text())
+        except (OSError, ValueError):
+            return 0
+        return int(metadata.get("epoch", 0))
+
+    def on_train_begin(self, logs=None):
+        # Runs after the approximator is built on its first batch, which
+        # draws from the simulator; restoring here undoes that draw too.
+        if not self.path.exists():
+            return
+        saved = json.loads(self.path.read_text())
+        resumed = self._backup_epoch()
+        state = next((s for s in (saved, saved.get("previous"))
+                      if s is not None and s["epoch"] == resumed), None)
+        if state is None:
+            logging.warning("training cursor at epoch %d does not match the backup's epoch "
+                            "%d; not restoring the seed cursor, RNG or history",
+                            saved["epoch"], resumed)
+            return
+        self._last = {k: v for k, v in state.items() if k != "previous"}
+        self.simulator._call_count = state["call_count"]
+        name, keys, pos, has_gauss, cached = state["numpy_rng"]
+        np.random.set_state((name, np.asarray(keys, dtype=np.uint32), pos, has_gauss, cached))
+        self.history = {k: list(v) for k, v in state["history"].items()}
+        logging.info("resuming training after epoch %d", state["epoch"])
+
+    def on_epoch_end(self, epoch, logs=None):
+        for k, v in (logs or {}).items():
+            self.history.setdefault(k, []).append(float(v))
+        name, keys, pos, has_gauss, cached = np.random.get_state()
+        state = {
+            "epoch": epoch + 1,
+            "call_count": int(self.simulator._call_count),
+            "numpy_rng": [name, keys.tolist(), int(pos), int(has_gauss), float(cached)],
+            "history": {k: list(v) for k, v in self.history.items()},
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Replaced whole, so a kill mid-write leaves the old cursor intact.
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(state | {"previous": self._last}))
+        os.replace(tmp, self.path)
+        self._last = state
+
+
+def _train(workflow, variant, train_data, val_data, results_dir, expand=None,
+           extra_callbacks=()):
+    """Fit the workflow and persist the history. Returns the Keras History.
+
+    `expand` is set for a compact or quantised bank and decodes each training
+    batch, rebuilding its derived channels, on the way to the adapter. For a
+    virtual_bank arm `train_data` is the VirtualBank itself.
+
+    A run killed part-way — by the pipeline's per-arm timeout, say — leaves a
+    backup under checkpoints/resume/, and the next run of the arm resumes from
+    its last completed epoch instead of epoch 0. The backup is removed once
+    training completes.
+    """
+    # Saved every epoch: the networks are a few MB, which is nothing against
+    # an epoch's compute, and an epoch is all a kill can then lose.
+    backup_dir = results_dir / "checkpoints" / "resume"
+    cursor = TrainingCursor(workflow.simulator, backup_dir)
+    # The cursor before the backup: see TrainingCursor.
+    callbacks = [
+        cursor,
+        keras.callbacks.BackupAndRestore(str(backup_dir), save_freq="epoch",
+                                         delete_checkpoint=True),
+        *extra_callbacks,
+    ]
     if variant.early_stopping_patience:
         # restore_best_weights is the point: without it the diagnostics run on
-        # the final, over-trained weights rather than the best ones.
+        # the final, over-trained weights rather than the best ones. Its best
+        # epoch is not part of the backup, so a resumed run only compares the
+        # epochs it trains itself.
         callbacks.append(keras.callbacks.EarlyStopping(
             monitor="val_loss",
             patience=variant.early_stopping_patience,
@@ -182,6 +255,11 @@ def _train(workflow, variant, train_data, val_data, results_dir):
         ))
 
     if variant.online:
+        # Online batches are simulated while the previous train step runs, so
+        # this is where the simulator and XLA compete for cores. A count pinned
+        # by TOGETHERFLOW_SIM_THREADS is left alone.
+        if THREAD_BUDGET.source != "env":
+            callbacks.append(autotune_callback(THREAD_BUDGET))
         logging.info("[%s] ONLINE training %d epochs x %d batches...",
                      variant.slug, variant.epochs, variant.num_batches_per_epoch)
         history = workflow.fit_online(
@@ -192,6 +270,29 @@ def _train(workflow, variant, train_data, val_data, results_dir):
             callbacks=callbacks,
             verbose=2,
         )
+    elif variant.virtual_bank:
+        logging.info("[%s] training %d epochs on %d virtual sims...",
+                     variant.slug, variant.epochs, variant.n_train)
+        history = fit_virtual(
+            workflow,
+            train_data,
+            epochs=variant.epochs,
+            batch_size=variant.batch_size,
+            validation_data=val_data,
+            callbacks=callbacks,
+            verbose=2,
+        )
+    elif expand is not None:
+        logging.info("[%s] training %d epochs on %d stored sims...",
+                     variant.slug, variant.epochs, variant.n_train)
+        history = fit_dataset(
+            workflow,
+            CompactDataset(train_data, variant.batch_size, workflow.adapter, expand),
+            epochs=variant.epochs,
+            validation_data=val_data,
+            callbacks=callbacks,
+            verbose=2,
+        )
     else:
         logging.info("[%s] training %d epochs on %d sims...",
                      variant.slug, variant.epochs, variant.n_train)
@@ -204,6 +305,8 @@ def _train(workflow, variant, train_data, val_data, results_dir):
             verbose=2,
         )
 
+    # After a resume, History holds only this run's epochs; the cursor has all.
+    history.history = cursor.history
     with open(results_dir / "history.json", "w") as f:
         json.dump(history.history, f)
     return history
@@ -224,6 +327,128 @@ def load_trained(workflow, results_dir):
     return workflow
 
 
+def bank_layout(variant):
+    """(output_mode, preconcatenated) of the bank `variant` is trained from.
+
+    Arms stored as simulated get their channels pre-concatenated: the
+    simulator writes one float32 summary_variables tensor in channel order,
+    so the adapter's concatenate — a full copy of every batch, online or
+    off — becomes a no-op. The offline bank is written chunk by chunk into
+    that tensor, so peak memory is the bank itself rather than the kernel's
+    float64 output plus a float32 copy, and the splits in run() are views of it.
+    """
+    preconcatenated = not (variant.compact_bank or variant.quantize_bank)
+    if variant.compact_bank:
+        return "compact", preconcatenated
+    if preconcatenated:
+        return "concatenated", preconcatenated
+    return "flat", preconcatenated
+
+
+def adapter_concatenates(adapter):
+    """Whether `adapter` builds summary_variables from the per-channel keys.
+
+    True of `build_adapter(variant)` and of every checkpoint trained before
+    banks were pre-concatenated; false of a preconcatenated arm's adapter. A
+    restored approximator keeps the adapter it was trained with, so this, not
+    `bank_layout`, says what a loaded checkpoint reads.
+    """
+    return any(isinstance(t, bf.adapters.transforms.Concatenate) and t.into == "summary_variables"
+               for t in adapter.transforms)
+
+
+def match_adapter(data, workflow, variant, sim):
+    """`data`, flat per-channel or pre-concatenated, in the layout the
+    workflow's adapter reads. `sim` is any simulator of `variant`; only its
+    channel widths are used.
+    """
+    if adapter_concatenates(workflow.adapter):
+        if "summary_variables" not in data:
+            return data
+        data = dict(data)
+        summary = data.pop("summary_variables")
+        for c, (a, b) in sim.channel_offsets(variant.channels).items():
+            data[c] = summary[..., a:b]
+        return data
+    if "summary_variables" in data:
+        return data
+    # variant.channels order: the order sample_concatenated lays them out in.
+    summary = np.concatenate([np.asarray(data[c], dtype=np.float32) for c in variant.channels],
+                             axis=-1)
+    data = {k: v for k, v in data.items() if k not in variant.channels}
+    return data | {"summary_variables": summary}
+
+
+def bank_size(variant):
+    # Online training generates its own training batches, and a virtual bank
+    # reads them by index, so only the validation and test splits need to come
+    # from a bank.
+    return (variant.n_val + variant.n_test) if variant.online or variant.virtual_bank else \
+           (variant.n_train + variant.n_val + variant.n_test)
+
+
+def skip_virtual_rows(variant, sim):
+    """Move `sim` past the training rows a virtual_bank arm reads by index, so
+    its validation and test rows are the ones the materialised bank would hold."""
+    if variant.virtual_bank:
+        sim.advance(variant.n_train)
+
+
+def simulate_bank(variant, sim, preconcatenated, sim_threads=None):
+    """Simulate `variant`'s val/test bank (and offline training bank), in the
+    dtypes it is stored in. `sim_threads` defaults to every core."""
+    total = bank_size(variant)
+    logging.info("[%s] simulating %d datasets...", variant.slug, total)
+    t0 = time.time()
+    # Nothing trains while the bank is simulated, so the simulator may use
+    # every core; the split applies from training on.
+    set_sim_threads(THREAD_BUDGET.cores if sim_threads is None else sim_threads)
+    if preconcatenated:
+        data = sim.sample_concatenated(total, variant.channels)
+    else:
+        data = sim.sample(batch_size=total)
+    set_sim_threads(THREAD_BUDGET.sim_threads)
+    # The kernel emits float64, but the adapter casts to float32 before the
+    # networks ever see it. Casting the bank up front halves resident memory,
+    # which is what decides whether the night survives unattended.
+    # The compact trajectory is cast too, so a neighbour count rebuilt from it
+    # can flip where a distance meets the sensing radius, as it can after the
+    # codec's round trip; against the float32 flat bank that leaves
+    # (3A + 1) stored values per step instead of about (7 + R)A.
+    data = {k: np.asarray(v, dtype=np.float32) for k, v in data.items()}
+    if variant.quantize_bank:
+        data = encode_bank(data, sim.room_size)
+    gb = sum(v.nbytes for v in data.values()) / 1e9
+    logging.info("[%s] simulated in %.1fs — bank %.2f GB", variant.slug, time.time() - t0, gb)
+    return data
+
+
+def plan_threads(variant):
+    """Plan and apply `variant`'s thread budget. Arms share a tuned count only
+    with arms of the same summary and inference networks."""
+    global THREAD_BUDGET
+    THREAD_BUDGET = plan_budget(key=f"{variant.summary_net}/{variant.inference_net}",
+                                arm=variant.slug)
+    set_sim_threads(THREAD_BUDGET.sim_threads)
+    return THREAD_BUDGET
+
+
+def prefetch_bank(variant):
+    """Simulate `variant`'s bank and leave it where run() will pick it up.
+
+    Runs beside another arm's training (run_pipeline --prefetch), so the
+    simulator keeps to the simulator's share of the cores.
+    """
+    plan_threads(variant)
+    output_mode, preconcatenated = bank_layout(variant)
+    sim = build_simulator(variant, seed=variant.seed, output_mode=output_mode)
+    skip_virtual_rows(variant, sim)
+    data = simulate_bank(variant, sim, preconcatenated, sim_threads=THREAD_BUDGET.sim_threads)
+    path = OUT_ROOT / variant.slug / PREFETCH_DIR
+    save_bank(data, path, bank_fingerprint(variant, output_mode))
+    logging.info("[%s] bank prefetched -> %s", variant.slug, path)
+
+
 def run(variant, force=False, diagnostics_only=False):
     results_dir = OUT_ROOT / variant.slug
     if (results_dir / "report.md").exists() and not force and not diagnostics_only:
@@ -233,62 +458,71 @@ def run(variant, force=False, diagnostics_only=False):
 
     t_start = time.time()
     logging.info("[%s] %s", variant.slug, variant.title)
+    plan_threads(variant)
 
     # ── Simulate the offline bank ────────────────────────────────────────────
     # One bank, split into train/val/test. Offline rather than online: the
     # simulator is fast enough that regenerating every epoch costs ~8x more
     # wall-clock than training on a fixed bank.
-    sim = build_simulator(variant, seed=variant.seed)
-    # Online training generates its own training batches, so only the validation
-    # and test splits need to come from a bank.
-    total = (variant.n_val + variant.n_test) if variant.online else \
-            (variant.n_train + variant.n_val + variant.n_test)
-    logging.info("[%s] simulating %d datasets...", variant.slug, total)
-    t0 = time.time()
-    data = sim.sample(batch_size=total)
-    # The kernel emits float64, but the adapter casts to float32 before the
-    # networks ever see it. Casting the bank up front halves resident memory,
-    # which is what decides whether the night survives unattended.
-    data = {k: np.asarray(v, dtype=np.float32) for k, v in data.items()}
-    gb = sum(v.nbytes for v in data.values()) / 1e9
-    logging.info("[%s] simulated in %.1fs — bank %.2f GB", variant.slug, time.time() - t0, gb)
-
-    if variant.online:
+    # A compact bank holds trajectories only; the other channels are rebuilt
+    # per batch, as a quantised bank is decoded per batch. The online path
+    # never holds a training bank, so it has nothing to save.
+    if (variant.compact_bank or variant.quantize_bank) and variant.online:
+        raise ValueError(
+            f"[{variant.slug}] compact_bank and quantize_bank apply to offline training only"
+        )
+    if variant.virtual_bank and (variant.online or variant.compact_bank
+                                 or variant.quantize_bank or variant.rng != "philox"):
+        raise ValueError(
+            f"[{variant.slug}] virtual_bank needs offline training, rng='philox' and a "
+            "bank stored as simulated"
+        )
+    output_mode, preconcatenated = bank_layout(variant)
+    sim = build_simulator(variant, seed=variant.seed, output_mode=output_mode)
+    skip_virtual_rows(variant, sim)
+    telemetry = Telemetry()
+    telemetry.watch_simulator(sim)
+    expand = bank_expander(sim, variant)
+    with telemetry.phase("simulate"):
+        # A bank run_pipeline simulated in the background while the previous arm
+        # trained is identical to the one simulated here; take it if it is there.
+        data = load_bank(results_dir / PREFETCH_DIR, bank_fingerprint(variant, output_mode))
+        if data is None:
+            data = simulate_bank(variant, sim, preconcatenated)
+        else:
+            # Online batches continue the sequence after the bank, and the offline
+            # shuffle reads numpy's global RNG; both must start where they would have.
+            sim.advance(bank_size(variant))
+            logging.info("[%s] using the prefetched bank (%.2f GB)", variant.slug,
+                         sum(v.nbytes for v in data.values()) / 1e9)
+
+    if variant.online or variant.virtual_bank:
         train_data = None
         val_data  = {k: v[:variant.n_val] for k, v in data.items()}
         test_data = {k: v[variant.n_val:] for k, v in data.items()}
+        if variant.virtual_bank:
+            # The training rows precede the bank's in the seed's sequence.
+            train_data = VirtualBank(variant, seed=variant.seed, size=variant.n_train,
+                                     output_mode=output_mode)
+            telemetry.watch_simulator(train_data.sim)
     else:
         i, j = variant.n_train, variant.n_train + variant.n_val
         train_data = {k: v[:i] for k, v in data.items()}
         val_data   = {k: v[i:j] for k, v in data.items()}
         test_data  = {k: v[j:] for k, v in data.items()}
     del data
+    if expand is not None:
+        # Validation and test are small and read every epoch or by diagnostics,
+        # so they are expanded once; only the training split stays stored.
+        val_data  = {k: np.asarray(v, dtype=np.float32) for k, v in expand(val_data).items()}
+        test_data = {k: np.asarray(v, dtype=np.float32) for k, v in expand(test_data).items()}
 
     # ── Networks ─────────────────────────────────────────────────────────────
-    # summary_dim follows the 3x-parameters heuristic; the inference net uses the
-    # workflow's Base sizing rather than the smaller net used in earlier runs.
-    n_params = len(variant.infer)
-    summary_dim = 3 * n_params
-    if variant.summary_net == "bdlstm":
-        summary_net = SummaryNet(summary_dim=summary_dim)
-    elif variant.summary_net == "transformer":
-        summary_net = TransformerSummaryNet(summary_dim=summary_dim)
-    else:
-        raise ValueError(f"unknown summary_net '{variant.summary_net}'")
-    # Matched subnet across both estimators, so v0-diffusion differs from
-    # v0-reference in the generative process and nothing else that we control.
-    subnet_kwargs = {"widths": (256,) * 4, "time_embedding_dim": 32}
-    if variant.inference_net == "flow_matching":
-        inference_net = bf.networks.FlowMatching(subnet_kwargs=subnet_kwargs)
-    elif variant.inference_net == "diffusion":
-        # Required by CompositionalWorkflow, which the partial-pooling work needs.
-        inference_net = bf.networks.DiffusionModel(subnet_kwargs=subnet_kwargs)
-    else:
-        raise ValueError(f"unknown inference_net '{variant.inference_net}'")
+    summary_net, inference_net, summary_dim = build_networks(variant)
 
     workflow = bf.workflows.BasicWorkflow(
         simulator=sim,
-        adapter=build_adapter(variant),
+        adapter=build_adapter(variant, preconcatenated=preconcatenated),
         summary_network=summary_net,
         inference_network=inference_net,
         standardize="all",
@@ -314,34 +548,47 @@ def run(variant, force=False, diagnostics_only=False):
         training_report = inspect_history(history_dict)
         history = None
     else:
-        history = _train(workflow, variant, train_data, val_data, results_dir)
+        with telemetry.phase("train"):
+            history = _train(workflow, variant, train_data, val_data, results_dir,
+                             expand=expand, extra_callbacks=[telemetry.step_callback()])
         training_report = inspect_history(history.history)
+    # A restored checkpoint reads the layout it was trained on, which for one
+    # trained before banks were pre-concatenated is not this bank's.
+    test_data = match_adapter(test_data, workflow, variant, sim)
 
     # ── Diagnostics ──────────────────────────────────────────────────────────
     logging.info("[%s] computing diagnostics...", variant.slug)
-    metrics = normalize_metric_index(
-        workflow.compute_default_diagnostics(
-            test_data=test_data, as_data_frame=True, **DIAGNOSTIC_KWARGS
+    with telemetry.phase("diagnostics"):
+        # One set of draws serves the metrics and the figures, and is kept for
+        # a diagnostics-only rerun.
+        samples = posterior_samples(workflow, test_data, results_dir,
+                                    inference_net=variant.inference_net)
+        metrics = normalize_metric_index(
+            workflow.compute_default_diagnostics(
+                test_data=test_data, samples=samples, as_data_frame=True
+            )
         )
-    )
     # index=True: the row labels ARE the metric names and check_diagnostics
     # looks them up by name.
     metrics.to_csv(results_dir / "metrics.csv")
 
     var_names = [LATEX_NAMES.get(p, p) for p in variant.infer]
-    figures = workflow.plot_default_diagnostics(
-        test_data=test_data,
-        variable_names=var_names,
-        **DIAGNOSTIC_KWARGS,
-    )
-    for key, fig in figures.items():
-        fig.savefig(results_dir / FIGURE_NAMES[key], dpi=150, bbox_inches="tight")
-        plt.close(fig)
+    with telemetry.phase("plotting"):
+        figures = workflow.plot_default_diagnostics(
+            test_data=test_data,
+            samples=samples,
+            variable_names=var_names,
+        )
+        for key, fig in figures.items():
+            fig.savefig(results_dir / FIGURE_NAMES[key], dpi=150, bbox_inches="tight")
+            plt.close(fig)
 
     diag_report = check_diagnostics(metrics)
     next_steps = suggest_next_steps(training_report, diag_report)
 
     elapsed = time.time() - t_start
+    # run_pipeline folds this into status.json.
+    telemetry.save(results_dir / TELEMETRY_FILE)
     write_report(
         results_dir=results_dir,
         variant=variant,
@@ -351,6 +598,8 @@ def run(variant, force=False, diagnostics_only=False):
         next_steps=next_steps,
         summary_dim=summary_dim,
         elapsed_s=elapsed,
+        threads=THREAD_BUDGET.describe(),
+        telemetry=telemetry.to_dict(),
     )
     logging.info("[%s] done in %.1f min -> %s", variant.slug, elapsed / 60, results_dir)
     return "ok"
@@ -364,6 +613,8 @@ def main():
     ap.add_argument("--force", action="store_true", help="rerun even if report.md exists")
     ap.add_argument("--diagnostics-only", action="store_true",
                     help="skip training, restore checkpoints/model.keras and redo diagnostics")
+    ap.add_argument("--bank-only", action="store_true",
+                    help="only simulate the bank and save it for a later run to pick up")
     args = ap.parse_args()
 
     logging.basicConfig(
@@ -395,6 +646,9 @@ def main():
         ap.error("pass a slug, --all, or --list")
     if args.slug not in BY_SLUG:
         ap.error(f"unknown variant '{args.slug}'. Use --list.")
+    if args.bank_only:
+        prefetch_bank(BY_SLUG[args.slug])
+        return
     run(BY_SLUG[args.slug], force=args.force, diagnostics_only=args.diagnostics_only)
 
 
@@ -14,7 +14,6 @@ report is a paired comparison attributable to the collision term alone.
 from dataclasses import dataclass, field
 
 import numpy as np
-from numba import njit
 
 ROOM = (8., 10.)
 HALF_X, HALF_Y = ROOM[0] * 0.5, ROOM[1] * 0.5
@@ -38,19 +37,6 @@ STRONG_RADIUS = 0.6
 STRONG_GAIN = 1.5
 
 
-def make_fixed_prior(w, r, v, noise):
-    """A 'prior' that always returns the same parameter vector.
-
-    Scenarios demonstrate behaviour at a known operating point, so the generative
-    model is run at fixed theta. Keeping the simulator's prior interface means
-    the scenarios exercise exactly the same code path as the inference runs.
-    """
-    @njit
-    def _prior():
-        return np.array([w, r, v, noise], dtype=np.float32)
-    return _prior
-
-
 @dataclass
 class Scenario:
     slug: str
@@ -85,8 +71,13 @@ class Scenario:
     group_labels: np.ndarray | None = None
 
     @property
-    def prior(self):
-        return make_fixed_prior(self.w, self.r, self.v, self.noise)
+    def theta(self):
+        """The fixed operating point, for `TogetherFlowSimulator.simulate`.
+
+        Scenarios demonstrate behaviour at a known operating point, so the
+        generative model is run at fixed theta rather than at prior draws.
+        """
+        return np.array([self.w, self.r, self.v, self.noise], dtype=np.float32)
 
     @property
     def num_beacons(self):
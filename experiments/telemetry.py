@@ -0,0 +1,166 @@
+"""Per-arm resource telemetry: where an arm's wall-clock and memory went.
+
+Nothing polls in the background. Each phase is bracketed with wall-clock and
+process CPU time, peak RSS is the kernel's own high-water mark (reset as each
+phase starts, so a phase is charged only for its own peak and an arm on a warm
+pool worker not for the arms before it; the arm's peak is the largest phase's),
+and throughput comes from counting simulator calls and train steps as they
+happen. That is enough to tell a simulation-bound arm from a training-bound
+one: for an online arm, the simulator's busy time inside the training phase
+is recorded separately.
+
+    tel = Telemetry()
+    tel.watch_simulator(sim)
+    with tel.phase("simulate"):
+        ...
+    tel.save(results_dir / "telemetry.json")
+"""
+
+import json
+import resource
+import sys
+import time
+from contextlib import contextmanager
+
+from threads import available_cores
+
+PHASES = ("simulate", "train", "diagnostics", "plotting")
+FILENAME = "telemetry.json"
+
+
+def reset_peak_rss():
+    """Restart this process's RSS high-water mark. Linux only; False elsewhere."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_gb():
+    """This process's peak resident set since the last reset, in GB."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024 / 1e9
+    except OSError:
+        pass
+    # No procfs: the lifetime peak, which getrusage cannot reset.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak / 1e9 if sys.platform == "darwin" else peak * 1024 / 1e9
+
+
+class Telemetry:
+    def __init__(self):
+        self.cores = available_cores()
+        self.phases = {}
+        self._current = None
+
+    @contextmanager
+    def phase(self, name):
+        """Time a phase. Simulator calls and train steps inside it are credited to it."""
+        record = {"sims": 0, "sim_seconds": 0.0, "steps": 0}
+        self._current = record
+        reset_peak_rss()
+        t0, c0 = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            wall = time.perf_counter() - t0
+            cpu = time.process_time() - c0
+            record["seconds"] = wall
+            record["cpu_util"] = cpu / (wall * self.cores) if wall > 0 else 0.0
+            record["peak_rss_gb"] = peak_rss_gb()
+            self.phases[name] = record
+            self._current = None
+
+    def watch_simulator(self, sim):
+        """Count `sim`'s simulations and the time spent producing them.
+
+        Wraps the instance's `sample`, `sample_concatenated` and
+        `sample_indices`, which every bank build, online batch and virtual bank
+        chunk goes through.
+        """
+        for method in ("sample", "sample_concatenated", "sample_indices"):
+            original = getattr(sim, method)
+
+            def timed(batch_size, *args, _original=original, **kwargs):
+                t0 = time.perf_counter()
+                out = _original(batch_size, *args, **kwargs)
+                if self._current is not None:
+                    if isinstance(batch_size, tuple):
+                        n = batch_size[0]
+                    else:
+                        n = len(batch_size) if hasattr(batch_size, "__len__") else batch_size
+                    self._current["sims"] += int(n)
+                    self._current["sim_seconds"] += time.perf_counter() - t0
+                return out
+
+            setattr(sim, method, timed)
+
+    def step_callback(self):
+        """A Keras callback that credits each train step to the current phase."""
+        import keras
+
+        telemetry = self
+
+        class StepCounter(keras.callbacks.Callback):
+            def on_train_batch_end(self, batch, logs=None):
+                if telemetry._current is not None:
+                    telemetry._current["steps"] += 1
+
+        return StepCounter()
+
+    def summary(self):
+        """Per-phase records with derived rates, in PHASES order."""
+        out = {}
+        for name in PHASES + tuple(p for p in self.phases if p not in PHASES):
+            r = self.phases.get(name)
+            if r is None:
+                continue
+            r = dict(r)
+            r["sims_per_s"] = r["sims"] / r["sim_seconds"] if r["sim_seconds"] else None
+            r["steps_per_s"] = r["steps"] / r["seconds"] if r["steps"] and r["seconds"] else None
+            out[name] = r
+        return out
+
+    def to_dict(self):
+        phases = self.summary()
+        return {
+            "cores": self.cores,
+            "peak_rss_gb": max((r["peak_rss_gb"] for r in phases.values()), default=0.0),
+            "bound": bound(phases),
+            "phases": phases,
+        }
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+def bound(phases):
+    """Whether simulation or training took more of the arm's time.
+
+    Simulation counts the bank build plus, for online arms, the simulator's
+    busy time inside training; training is the rest of the training phase.
+    """
+    sim = phases.get("simulate", {}).get("seconds", 0.0)
+    train = phases.get("train", {})
+    sim += train.get("sim_seconds", 0.0)
+    fit = train.get("seconds", 0.0) - train.get("sim_seconds", 0.0)
+    if not sim and not fit:
+        return None
+    return "simulation" if sim > fit else "training"
+
+
+def load(results_dir):
+    """An arm's saved telemetry, or None."""
+    try:
+        with open(results_dir / FILENAME) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
@@ -0,0 +1,171 @@
+"""Core budget for numba simulation alongside XLA training.
+
+During online training the simulator's `prange` pool and XLA's intra-op pool
+run at the same time — JAX dispatches a train step asynchronously and the next
+batch is simulated while it executes — and both default to every core, so the
+two oversubscribe the machine exactly when they overlap. This module sizes the
+simulator's side and tunes it.
+
+Only numba's pool can be sized here. XLA's CPU client takes its pool size from
+the cores the process may run on and exposes no flag for it (XLA_FLAGS rejects
+`--intra_op_parallelism_threads`), and an affinity mask would confine numba's
+threads along with it. So XLA keeps every core the process has — which
+run_pipeline --jobs N bounds per arm by pinning each arm to its own cores —
+and the coordinator:
+
+1. when an arm starts, gives numba `sim_threads` of them, taking the count last
+   tuned for the same networks when there is one;
+2. during the first online batches, tries numba thread counts up to the
+   untuned share (half the cores) and keeps the one with the most training
+   steps per second, which is the count that contends least with XLA;
+3. caches that count, per network configuration, for the next such arm.
+
+TOGETHERFLOW_SIM_THREADS pins the count and turns steps 2 and 3 off.
+
+    from threads import plan_budget, set_sim_threads
+    BUDGET = plan_budget(key="transformer/flow_matching")
+    set_sim_threads(BUDGET.sim_threads)
+"""
+
+import json
+import logging
+import os
+import pathlib
+import time
+from dataclasses import dataclass, field
+
+import numba
+
+CACHE_PATH = pathlib.Path(__file__).parent.parent / "outputs" / "variants" / "thread_budget.json"
+# Batches excluded from timing: the first steps pay for XLA compilation and
+# numba dispatch, and would make whichever candidate runs first look slowest.
+WARMUP_STEPS = 10
+STEPS_PER_TRIAL = 20
+
+
+def available_cores():
+    """Cores this process may run on, respecting affinity masks and cgroups."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+@dataclass
+class ThreadBudget:
+    cores: int
+    sim_threads: int
+    source: str = "default"                       # "default" | "cached" | "env"
+    trials: dict = field(default_factory=dict)    # numba threads -> steps/s
+    tuned: int | None = None                      # autotuned numba threads
+    key: str | None = None                        # network configuration tuned for
+    arm: str | None = None                        # the arm that tuned it
+
+    def describe(self):
+        text = f"{self.sim_threads} numba of {self.cores} cores ({self.source})"
+        if self.trials:
+            rates = ", ".join(f"{k}: {v:.2f}" for k, v in sorted(self.trials.items()))
+            text += f"; autotuned numba threads -> {self.tuned} (steps/s {rates})"
+        return text
+
+    @property
+    def ceiling(self):
+        """The untuned share: the most numba threads autotuning will try."""
+        return default_sim_threads(self.cores)
+
+    def to_dict(self):
+        return {"cores": self.cores, "sim_threads": self.sim_threads, "source": self.source,
+                "tuned": self.tuned, "trials": self.trials, "key": self.key, "arm": self.arm}
+
+
+def default_sim_threads(cores):
+    return _clip(cores // 2, cores)
+
+
+def plan_budget(key=None, arm=None, cache_path=CACHE_PATH):
+    """The simulator's share of this process's cores for one arm.
+
+    TOGETHERFLOW_SIM_THREADS pins it; otherwise the value last autotuned for
+    this core count and network configuration `key` is reused, and failing
+    that it is half the cores.
+    """
+    cores = available_cores()
+    env = os.environ.get("TOGETHERFLOW_SIM_THREADS")
+    if env:
+        return ThreadBudget(cores, _clip(int(env), cores), source="env")
+    cached = _read_cache(cache_path).get(key) if key else None
+    if cached and cached.get("cores") == cores and cached.get("tuned"):
+        return ThreadBudget(cores, _clip(cached["tuned"], cores), source="cached",
+                            key=key, arm=arm)
+    return ThreadBudget(cores, default_sim_threads(cores), key=key, arm=arm)
+
+
+def _read_cache(cache_path):
+    """{key: budget dict} from the cache file; empty if missing or unreadable."""
+    try:
+        cached = json.loads(pathlib.Path(cache_path).read_text())
+    except (OSError, ValueError):
+        return {}
+    return {k: v for k, v in cached.items() if isinstance(v, dict)}
+
+
+def _clip(n, cores):
+    return max(1, min(n, cores - 1 if cores > 1 else 1))
+
+
+def set_sim_threads(n):
+    numba.set_num_threads(max(1, min(n, numba.config.NUMBA_NUM_THREADS)))
+
+
+def autotune_callback(budget, cache_path=CACHE_PATH):
+    """A Keras callback that tunes numba's thread count on live training steps.
+
+    Candidates are the powers of two below the untuned share, plus that share
+    itself, so a low cached count can still be tuned back up; each runs for
+    STEPS_PER_TRIAL batches after WARMUP_STEPS. Not for a budget pinned by
+    TOGETHERFLOW_SIM_THREADS, which is left as pinned.
+    """
+    import keras
+
+    ceiling = budget.ceiling
+    candidates = sorted({1 << i for i in range(ceiling.bit_length()) if 1 << i < ceiling}
+                        | {ceiling})
+
+    class ThreadAutotune(keras.callbacks.Callback):
+        def __init__(self):
+            super().__init__()
+            self.step = 0
+            self.trial = -1
+            self.t0 = None
+
+        def on_train_batch_end(self, batch, logs=None):
+            self.step += 1
+            if self.trial >= len(candidates) or self.step < WARMUP_STEPS:
+                return
+            since = self.step - WARMUP_STEPS
+            if since % STEPS_PER_TRIAL:
+                return
+            now = time.perf_counter()
+            if self.trial >= 0:
+                budget.trials[candidates[self.trial]] = STEPS_PER_TRIAL / (now - self.t0)
+            self.trial += 1
+            if self.trial < len(candidates):
+                set_sim_threads(candidates[self.trial])
+                self.t0 = time.perf_counter()
+            else:
+                self._finish()
+
+        def _finish(self):
+            budget.tuned = max(budget.trials, key=budget.trials.get)
+            set_sim_threads(budget.tuned)
+            logging.info("thread budget: %s", budget.describe())
+            if budget.source == "env" or budget.key is None:
+                return
+            try:
+                path = pathlib.Path(cache_path)
+                cache = _read_cache(path) | {budget.key: budget.to_dict()}
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_text(json.dumps(cache, indent=2))
+            except OSError as e:
+                logging.warning("could not cache thread budget: %s", e)
+
+    return ThreadAutotune()
@@ -150,6 +150,28 @@ class Variant:
     # (approximators/helpers/compositional.py), and .constrain() has one.
     constrain_parameters: bool = True
 
+    # "legacy" — the published stateful seeding; every completed arm used it
+    # "philox" — counter-based, so simulation i depends on (seed, i) alone and a
+    #            bank can be read back by index (banks.VirtualBank)
+    rng: str = "legacy"
+
+    # Offline only. Hold the training bank as trajectories (positions,
+    # rotations, sensing radius) and rebuild the derived channels per batch —
+    # about 3A stored values per step instead of 7A + A*R, both float32. What
+    # reaches the adapter is unchanged but for the rare neighbour count that
+    # flips where a rounded distance meets the sensing radius.
+    compact_bank: bool = False
+    # Offline only. Store positions as int16 fixed point and headings as uint16
+    # (togetherflow.codec), decoded per batch. Alone it halves those two
+    # channels; with compact_bank it halves the compact bank again.
+    quantize_bank: bool = False
+    # Offline only, rng="philox". Read the training split by index from a
+    # banks.VirtualBank, simulated chunk by chunk as batches ask for it, rather
+    # than holding it; only validation and test are simulated up front. The
+    # rows are the ones the materialised bank would hold, so n_train is bounded
+    # by compute instead of memory.
+    virtual_bank: bool = False
+
     n_train: int = 5000
     n_val: int = 300
     n_test: int = 300
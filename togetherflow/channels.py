@@ -0,0 +1,82 @@
+import numpy as np
+from numba import njit, prange
+
+# Channels that are functions of the stored trajectory.
+#
+# Of everything the kernel emits, only positions and rotations carry state.
+# `angular_velocities` and `neighbor_fluctuations` are first differences, and
+# `neighbors`, `distances` and `radii_counts` are neighbour scans of the
+# previous step's positions at the step's sensing radius. A compact bank
+# therefore keeps the trajectory plus that radius and rebuilds the rest per
+# batch, in the same arithmetic the kernel uses, so the rebuilt channels are
+# identical to the ones it would have emitted.
+
+COMPACT_KEYS = ("positions", "rotations", "sensing_radius")
+# Every per-agent observable the kernel emits, in its flat-mode key names.
+AGENT_CHANNELS = (
+    "positions", "rotations", "neighbors", "distances",
+    "angular_velocities", "neighbor_fluctuations", "radii_counts",
+)
+
+
+@njit(parallel=True)
+def derive_channels(positions, rotations, sensing_radius, reference_radii):
+    """
+    Rebuild the derived channels of a batch of full-resolution trajectories.
+
+    Parameters
+    ----------
+    positions       : np.ndarray of shape (B, T, A, 2)
+    rotations       : np.ndarray of shape (B, T, A)
+    sensing_radius  : np.ndarray of shape (B, T) — the radius the kernel read
+                      at each step
+    reference_radii : np.ndarray of shape (R,)
+
+    Returns
+    -------
+    neighbors, distances, angular_velocities, neighbor_fluctuations
+                    : np.ndarray of shape (B, T, A)
+    radii_counts    : np.ndarray of shape (B, T, A, R)
+    """
+    batch_size, num_timesteps, num_agents, _ = positions.shape
+    num_radii = reference_radii.shape[0]
+
+    neighbors  = np.zeros((batch_size, num_timesteps, num_agents))
+    distances  = np.zeros((batch_size, num_timesteps, num_agents))
+    ang_vels   = np.zeros((batch_size, num_timesteps, num_agents))
+    nbr_flucts = np.zeros((batch_size, num_timesteps, num_agents))
+    ms_counts  = np.zeros((batch_size, num_timesteps, num_agents, num_radii))
+
+    for b in prange(batch_size):
+        for t in range(1, num_timesteps):
+            # Step t's statistics are taken on the positions the step started
+            # from, as in `combined_influences`.
+            radius = sensing_radius[b, t]
+            for i in range(num_agents):
+                count = 0
+                total = 0.0
+                for j in range(num_agents):
+                    dx = positions[b, t - 1, j, 0] - positions[b, t - 1, i, 0]
+                    dy = positions[b, t - 1, j, 1] - positions[b, t - 1, i, 1]
+                    d = (dx ** 2 + dy ** 2) ** 0.5
+                    if d > 0.0:
+                        for k in range(num_radii):
+                            if d <= reference_radii[k]:
+                                ms_counts[b, t, i, k] += 1.0
+                    if 0.0 < d <= radius:
+                        count += 1
+                        total += d
+                neighbors[b, t, i] = float(count)
+                if count > 0:
+                    distances[b, t, i] = total / count
+                ang_vels[b, t, i] = rotations[b, t, i] - rotations[b, t - 1, i]
+                nbr_flucts[b, t, i] = neighbors[b, t, i] - neighbors[b, t - 1, i]
+
+        # The kernel's t=0 backfill: no previous state to diff against.
+        # distances[0] and angular_velocities[0] stay zero, as there.
+        if num_timesteps > 1:
+            neighbors[b, 0]  = neighbors[b, 1]
+            nbr_flucts[b, 0] = nbr_flucts[b, 1]
+            ms_counts[b, 0]  = ms_counts[b, 1]
+
+    return neighbors, distances, ang_vels, nbr_flucts, ms_counts
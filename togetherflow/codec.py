@@ -0,0 +1,93 @@
+import numpy as np
+
+# Fixed-point storage for trajectories.
+#
+# Positions live in a room centred at the origin, and headings in [0, 2*pi), so
+# float64 — or even float32 — spends most of its bits on range nobody uses.
+# Positions are stored as int16 over a symmetric extent of `margin` half-rooms
+# per axis, which leaves room outside the walls for agents that leave by a
+# door; headings as uint16 turns of 2*pi / 65536. For the default 8 x 10 m room
+# that is a resolution of about 0.6 mm in position and 1e-4 rad in heading,
+# for a 2-4x saving over float32/float64 storage.
+#
+# Only positions and rotations are encoded. Everything else in a batch is
+# either derived from them (see `togetherflow.channels`) or small.
+
+POSITION_DTYPE = np.int16
+HEADING_DTYPE = np.uint16
+DEFAULT_MARGIN = 4.0
+
+_POSITION_LEVELS = 32767
+_HEADING_LEVELS = 65536
+_TWO_PI = 2.0 * np.pi
+
+
+def position_step(room_size, margin=DEFAULT_MARGIN):
+    """Metres per int16 level along (x, y)."""
+    half = 0.5 * np.asarray(room_size, dtype=np.float64)
+    return margin * half / _POSITION_LEVELS
+
+
+def encode_positions(positions, room_size, margin=DEFAULT_MARGIN):
+    """
+    Quantise positions to int16.
+
+    Parameters
+    ----------
+    positions : np.ndarray of shape (..., 2) or (..., 2A) — (x, y) pairs,
+                interleaved along the last axis as in "flat" output
+    room_size : (width, height)
+    margin    : float — encodable extent per axis, in half-rooms
+
+    Returns
+    -------
+    np.ndarray of int16, same shape as `positions`
+    """
+    positions = np.asarray(positions)
+    step = position_step(room_size, margin)
+    pairs = positions.reshape(positions.shape[:-1] + (-1, 2))
+    q = np.rint(pairs / step)
+    if q.size and np.abs(q).max() > _POSITION_LEVELS:
+        raise ValueError(
+            f"positions exceed the encodable extent of +/-{margin} half-rooms; "
+            f"max |x|, |y| = {np.abs(pairs).max(axis=tuple(range(pairs.ndim - 1)))}. "
+            f"Raise margin."
+        )
+    return q.astype(POSITION_DTYPE).reshape(positions.shape)
+
+
+def decode_positions(q, room_size, margin=DEFAULT_MARGIN, dtype=np.float64):
+    """Inverse of `encode_positions`, to within half a step per axis."""
+    q = np.asarray(q)
+    step = position_step(room_size, margin).astype(dtype)
+    pairs = q.reshape(q.shape[:-1] + (-1, 2)).astype(dtype) * step
+    return pairs.reshape(q.shape)
+
+
+def encode_rotations(rotations):
+    """Quantise headings in radians to uint16 fractions of a turn."""
+    turns = np.mod(np.asarray(rotations, dtype=np.float64), _TWO_PI) / _TWO_PI
+    return np.mod(np.rint(turns * _HEADING_LEVELS), _HEADING_LEVELS).astype(HEADING_DTYPE)
+
+
+def decode_rotations(q, dtype=np.float64):
+    """Inverse of `encode_rotations`, in [0, 2*pi)."""
+    return np.asarray(q).astype(dtype) * dtype(_TWO_PI / _HEADING_LEVELS)
+
+
+def encode_bank(data, room_size, margin=DEFAULT_MARGIN):
+    """Encode the `positions` and `rotations` of a batch dict; pass the rest."""
+    out = dict(data)
+    out["positions"] = encode_positions(data["positions"], room_size, margin)
+    out["rotations"] = encode_rotations(data["rotations"])
+    return out
+
+
+def decode_bank(data, room_size, margin=DEFAULT_MARGIN, dtype=np.float64):
+    """Inverse of `encode_bank`. A batch that is not encoded passes unchanged."""
+    if data["positions"].dtype != POSITION_DTYPE:
+        return data
+    out = dict(data)
+    out["positions"] = decode_positions(data["positions"], room_size, margin, dtype)
+    out["rotations"] = decode_rotations(data["rotations"], dtype)
+    return out
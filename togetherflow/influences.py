@@ -1,7 +1,7 @@
 import numpy as np
 from numba import njit
 
-from .utils import bound_agent_state
+from .utils import bound_agent_heading, bound_agent_state
 
 
 @njit
@@ -10,6 +10,22 @@ def wrap_angle(angle):
     return (angle + np.pi) % (2.0 * np.pi) - np.pi
 
 
+@njit
+def wrap_angle_near(angle):
+    """`wrap_angle` by whole-turn steps instead of a modulo.
+
+    Same [-pi, pi) result, but a compare-and-add rather than a division, which
+    is what the step kernel wants for differences that are already within a
+    turn or two of the target interval.
+    """
+    two_pi = 2.0 * np.pi
+    while angle >= np.pi:
+        angle -= two_pi
+    while angle < -np.pi:
+        angle += two_pi
+    return angle
+
+
 @njit
 def external_influence(agent_position, beacon_position):
     """
@@ -32,7 +48,7 @@ def external_influence(agent_position, beacon_position):
 
 
 @njit
-def internal_influence(neighbor_rotations, focus):
+def internal_influence(neighbor_rotations, focus, z=np.nan):
     """
     Vicsek alignment vector from pre-collected neighbor rotations.
 
@@ -42,6 +58,9 @@ def internal_influence(neighbor_rotations, focus):
         Rotations of neighbors already within the sensing radius.
     focus : float
         Standard deviation of Gaussian rotational noise.
+    z : float
+        A pre-drawn standard normal for that noise, from a block-generated
+        buffer. NaN (the default) draws it here.
 
     Returns
     -------
@@ -50,10 +69,113 @@ def internal_influence(neighbor_rotations, focus):
     if len(neighbor_rotations) == 0:
         return np.array([0.0, 0.0], dtype=np.float32)
     avg = np.sum(neighbor_rotations) / len(neighbor_rotations)
-    direction = avg + np.random.normal(0.0, focus)
+    if np.isnan(z):
+        direction = avg + np.random.normal(0.0, focus)
+    else:
+        direction = avg + focus * z
     return np.array([np.cos(direction), np.sin(direction)], dtype=np.float32)
 
 
+@njit
+def select_beacon(x, y, beacon_positions, beacon_strengths, salience_sensitivity):
+    """
+    Index of the beacon maximising s_b^salience_sensitivity / d_ib for a point.
+
+    Parameters
+    ----------
+    x, y                 : float — the agent's position
+    beacon_positions     : np.ndarray of shape (B, 2)
+    beacon_strengths     : np.ndarray of shape (B,)
+    salience_sensitivity : float
+
+    Returns
+    -------
+    int — ties go to the lowest index, as in a plain argmax.
+    """
+    beacon_id = 0
+    best_score = -np.inf
+    for b in range(beacon_positions.shape[0]):
+        bx = beacon_positions[b, 0] - x
+        by = beacon_positions[b, 1] - y
+        d_b = (bx * bx + by * by) ** 0.5 + 1e-8
+        score = beacon_strengths[b] ** salience_sensitivity / d_b
+        if score > best_score:
+            best_score = score
+            beacon_id = b
+    return beacon_id
+
+
+@njit
+def build_beacon_grid(beacon_positions, beacon_strengths, salience_sensitivity,
+                      room_size, cell):
+    """
+    Tabulate the beacon-selection rule over the room for a static salience field.
+
+    With fixed beacons and fixed strengths the rule s_b^alpha / d_ib partitions
+    the room into (multiplicatively weighted) Voronoi cells that do not change
+    for the whole trial, so the per-agent argmax over beacons can be replaced by
+    a table lookup. A grid cell records a beacon only when that beacon provably
+    wins everywhere in the cell: its worst score, at its centre distance plus the
+    cell's half-diagonal, must beat every rival's best score, at its centre
+    distance minus the half-diagonal. Cells a partition boundary passes through
+    hold -1 and fall back to the exact rule, so the lookup never changes which
+    beacon an agent selects.
+
+    Parameters
+    ----------
+    beacon_positions     : np.ndarray of shape (B, 2)
+    beacon_strengths     : np.ndarray of shape (B,)
+    salience_sensitivity : float
+    room_size            : tuple (width, height) — the grid covers the room only;
+        agents that have left through a door use the exact rule.
+    cell                 : float — grid spacing in room units
+
+    Returns
+    -------
+    np.ndarray of shape (ceil(width / cell), ceil(height / cell)), int64 — beacon
+        index per cell, or -1 where the exact rule must be consulted.
+    """
+    num_beacons = beacon_positions.shape[0]
+    half_x = room_size[0] * 0.5
+    half_y = room_size[1] * 0.5
+    nx = int(np.ceil(room_size[0] / cell))
+    ny = int(np.ceil(room_size[1] / cell))
+    half_diag = cell * 0.5 * 2.0 ** 0.5
+
+    weights = np.zeros(num_beacons)
+    for b in range(num_beacons):
+        weights[b] = beacon_strengths[b] ** salience_sensitivity
+
+    grid = np.full((nx, ny), -1, dtype=np.int64)
+    centre_d = np.zeros(num_beacons)
+    for gx in range(nx):
+        cx = -half_x + (gx + 0.5) * cell
+        for gy in range(ny):
+            cy = -half_y + (gy + 0.5) * cell
+            for b in range(num_beacons):
+                bx = beacon_positions[b, 0] - cx
+                by = beacon_positions[b, 1] - cy
+                centre_d[b] = (bx * bx + by * by) ** 0.5
+            winner = select_beacon(cx, cy, beacon_positions, beacon_strengths,
+                                   salience_sensitivity)
+            worst_win = weights[winner] / (centre_d[winner] + half_diag + 1e-8)
+            safe = True
+            for b in range(num_beacons):
+                if b == winner:
+                    continue
+                near = centre_d[b] - half_diag
+                if near < 0.0:
+                    near = 0.0
+                # The relative slack absorbs rounding in the exact rule, which
+                # sees float32 beacons and float64 agents.
+                if weights[b] / (near + 1e-8) * (1.0 + 1e-6) >= worst_win:
+                    safe = False
+                    break
+            if safe:
+                grid[gx, gy] = winner
+    return grid
+
+
 @njit
 def combined_influences(
     agent_positions,
@@ -78,6 +200,11 @@ def combined_influences(
     door_half_width=0.0,
     beacon_assignment=None,
     diffusive_heading=False,
+    beacon_grid=None,
+    beacon_grid_cell=0.0,
+    unit_heading=False,
+    agent_headings=None,
+    noise_row=None,
 ):
     """
     Advance all agents by one time step under beacon attraction and Vicsek alignment.
@@ -153,6 +280,28 @@ def combined_influences(
         channel is stochastic too, as a drift-diffusion process requires. The
         alignment target is left unperturbed in this mode so eta is not counted
         twice.
+    beacon_grid      : np.ndarray of shape (nx, ny), int64 — precomputed beacon
+        selection over the room from `build_beacon_grid`, valid only while the
+        salience field is static. -1 cells, and agents outside the room, use the
+        exact rule. Pass an empty (0, 0) array to always use the exact rule.
+    beacon_grid_cell : float  — the grid spacing the table was built with.
+    unit_heading     : bool   — carry each heading as its unit vector alongside
+        the angle. Signed bearing differences then come from the cross and dot
+        products with that vector rather than from arctan2/cos/sin round trips
+        and a modulo per term, and wall reflections negate vector components
+        instead of going back through arctan2. Requires `relative_heading`: the
+        legacy update is defined on absolute angles. Draws from the RNG in the
+        same order as the angle form, so both modes see the same noise and
+        differ only by rounding.
+    agent_headings   : np.ndarray of shape (A, 2) — (cos, sin) of
+        `agent_rotations`; read only when `unit_heading` is set, else pass an
+        empty (0, 2) array.
+    noise_row        : np.ndarray of shape (A,) — this step's pre-drawn
+        standard normals, one per agent, from the simulation's noise block.
+        Entry i is agent i's only draw this step: the heading increment in
+        diffusive mode, the alignment perturbation otherwise (unused when the
+        agent has no neighbours). Pass an empty (0,) array to draw from the
+        RNG on the fly, which is the published behaviour.
 
     Returns
     -------
@@ -162,18 +311,28 @@ def combined_influences(
     average_dists  : np.ndarray of shape (A,)
     radii_counts   : np.ndarray of shape (A, R) — neighbour counts at each fixed
         reference radius; independent of `sensing_radius`.
+    new_headings   : np.ndarray of shape (A, 2) — (cos, sin) of `new_rotations`
+        when `unit_heading` is set; empty (0, 2) otherwise.
     """
     num_agents = agent_positions.shape[0]
-    num_beacons = beacon_positions.shape[0]
     num_radii = reference_radii.shape[0]
     num_obstacles = obstacles.shape[0]
     separating = repulsion_gain > 0.0 and repulsion_radius > 0.0
+    block_noise = noise_row.shape[0] > 0
+    grid_nx = beacon_grid.shape[0]
+    grid_ny = beacon_grid.shape[1]
+    half_x = room_size[0] * 0.5
+    half_y = room_size[1] * 0.5
 
     new_positions = np.zeros((num_agents, 2))
     new_rotations = np.zeros((num_agents,))
     num_neighbors = np.zeros((num_agents,))
     average_dists = np.zeros((num_agents,))
     radii_counts = np.zeros((num_agents, num_radii))
+    if unit_heading:
+        new_headings = np.zeros((num_agents, 2))
+    else:
+        new_headings = np.zeros((0, 2))
 
     for i in range(num_agents):
 
@@ -233,64 +392,106 @@ def combined_influences(
         # cannot intersect. Two groups with opposing goals are therefore not
         # expressible by the selection rule at all, and scripting the goal is the
         # only way to stage the crossing the reviewers asked to see.
+        #
+        # Under a static field the rule is a fixed partition of the room, so a
+        # precomputed table answers it in O(1) instead of O(num_beacons); cells
+        # on a partition boundary defer to the exact rule.
+        beacon_id = -1
         if beacon_assignment.shape[0] > 0 and beacon_assignment[i] >= 0:
             beacon_id = beacon_assignment[i]
-        else:
-            beacon_id = 0
-            best_score = -np.inf
-            for b in range(num_beacons):
-                bx = beacon_positions[b, 0] - agent_positions[i, 0]
-                by = beacon_positions[b, 1] - agent_positions[i, 1]
-                d_b = (bx * bx + by * by) ** 0.5 + 1e-8
-                score = beacon_strengths[b] ** salience_sensitivity / d_b
-                if score > best_score:
-                    best_score = score
-                    beacon_id = b
-
-        ddm_vec = external_influence(agent_positions[i], beacon_positions[beacon_id])
-
-        if len(nbr_rots) > 0:
-            # In diffusive mode the alignment target is clean and eta is applied
-            # once, to the heading state below; otherwise eta perturbs the target
-            # here, which is the published behaviour.
-            align_noise = 0.0 if diffusive_heading else internal_focus
-            vicsek_vec = internal_influence(np.array(nbr_rots), align_noise)
-        else:
-            vicsek_vec = np.array([0.0, 0.0], dtype=np.float32)
-
-        ddm_angle = np.arctan2(ddm_vec[1], ddm_vec[0])
-        vicsek_angle = np.arctan2(vicsek_vec[1], vicsek_vec[0])
-
-        if relative_heading:
-            # Steer by the wrapped difference between target bearing and current
-            # heading. This is rotationally invariant: rotating the whole scene
-            # rotates the trajectories and changes nothing else.
-            d_beacon = wrap_angle(ddm_angle - agent_rotations[i])
+        elif grid_nx > 0:
+            gx = int(np.floor((agent_positions[i, 0] + half_x) / beacon_grid_cell))
+            gy = int(np.floor((agent_positions[i, 1] + half_y) / beacon_grid_cell))
+            if 0 <= gx < grid_nx and 0 <= gy < grid_ny:
+                beacon_id = beacon_grid[gx, gy]
+        if beacon_id < 0:
+            beacon_id = select_beacon(
+                agent_positions[i, 0], agent_positions[i, 1],
+                beacon_positions, beacon_strengths, salience_sensitivity,
+            )
+
+        if unit_heading:
+            # Relative steering on the unit heading vector h: the signed angle
+            # from h to a direction u is atan2(h x u, h . u), one call in place
+            # of arctan2 -> cos/sin -> arctan2 -> modulo.
+            hx = agent_headings[i, 0]
+            hy = agent_headings[i, 1]
+            ux = beacon_positions[beacon_id, 0] - agent_positions[i, 0]
+            uy = beacon_positions[beacon_id, 1] - agent_positions[i, 1]
+            if ux == 0.0 and uy == 0.0:
+                # external_influence points east from zero range.
+                ux = 1.0
+            d_beacon = np.arctan2(hx * uy - hy * ux, hx * ux + hy * uy)
             if len(nbr_rots) > 0:
-                d_vicsek = wrap_angle(vicsek_angle - agent_rotations[i])
+                # The neighbour mean is already an angle, so its offset from
+                # the heading needs only a whole-turn wrap. The draw is made
+                # even at zero scale, as internal_influence makes it.
+                align_noise = 0.0 if diffusive_heading else internal_focus
+                avg = np.sum(np.array(nbr_rots)) / len(nbr_rots)
+                if block_noise:
+                    avg += align_noise * noise_row[i]
+                else:
+                    avg += np.random.normal(0.0, align_noise)
+                d_vicsek = wrap_angle_near(avg - agent_rotations[i])
             else:
-                # No neighbours means no alignment torque. Leaving this at
-                # wrap(0 - theta) would instead steer the agent toward world-east,
-                # reintroducing exactly the bias this mode exists to remove.
                 d_vicsek = 0.0
             w_i = influence_weights[i]
             delta = w_i * d_beacon + (1.0 - w_i) * d_vicsek
 
-            # Separation rides on top of the convex combination rather than
-            # inside it. The magnitude of the accumulated vector carries how
-            # crowded the agent is, so one neighbour at the edge of personal
-            # space barely deflects it while a wall of neighbours dominates.
             rep_mag = (rep_x * rep_x + rep_y * rep_y) ** 0.5
             if rep_mag > 0.0:
-                rep_angle = np.arctan2(rep_y, rep_x)
-                d_rep = wrap_angle(rep_angle - agent_rotations[i])
+                d_rep = np.arctan2(hx * rep_y - hy * rep_x, hx * rep_x + hy * rep_y)
                 delta += repulsion_gain * rep_mag * d_rep
         else:
-            # Legacy behaviour: absolute world-frame bearings used directly as a
-            # turn rate. Retained so published results remain reproducible, but
-            # note it is not rotationally invariant — an agent whose beacon lies
-            # due east receives no steering at all.
-            delta = influence_weights[i] * ddm_angle + (1.0 - influence_weights[i]) * vicsek_angle
+            ddm_vec = external_influence(agent_positions[i], beacon_positions[beacon_id])
+
+            if len(nbr_rots) > 0:
+                # In diffusive mode the alignment target is clean and eta is applied
+                # once, to the heading state below; otherwise eta perturbs the target
+                # here, which is the published behaviour.
+                align_noise = 0.0 if diffusive_heading else internal_focus
+                if block_noise:
+                    vicsek_vec = internal_influence(
+                        np.array(nbr_rots), align_noise, noise_row[i]
+                    )
+                else:
+                    vicsek_vec = internal_influence(np.array(nbr_rots), align_noise)
+            else:
+                vicsek_vec = np.array([0.0, 0.0], dtype=np.float32)
+
+            ddm_angle = np.arctan2(ddm_vec[1], ddm_vec[0])
+            vicsek_angle = np.arctan2(vicsek_vec[1], vicsek_vec[0])
+
+            if relative_heading:
+                # Steer by the wrapped difference between target bearing and current
+                # heading. This is rotationally invariant: rotating the whole scene
+                # rotates the trajectories and changes nothing else.
+                d_beacon = wrap_angle(ddm_angle - agent_rotations[i])
+                if len(nbr_rots) > 0:
+                    d_vicsek = wrap_angle(vicsek_angle - agent_rotations[i])
+                else:
+                    # No neighbours means no alignment torque. Leaving this at
+                    # wrap(0 - theta) would instead steer the agent toward world-east,
+                    # reintroducing exactly the bias this mode exists to remove.
+                    d_vicsek = 0.0
+                w_i = influence_weights[i]
+                delta = w_i * d_beacon + (1.0 - w_i) * d_vicsek
+
+                # Separation rides on top of the convex combination rather than
+                # inside it. The magnitude of the accumulated vector carries how
+                # crowded the agent is, so one neighbour at the edge of personal
+                # space barely deflects it while a wall of neighbours dominates.
+                rep_mag = (rep_x * rep_x + rep_y * rep_y) ** 0.5
+                if rep_mag > 0.0:
+                    rep_angle = np.arctan2(rep_y, rep_x)
+                    d_rep = wrap_angle(rep_angle - agent_rotations[i])
+                    delta += repulsion_gain * rep_mag * d_rep
+            else:
+                # Legacy behaviour: absolute world-frame bearings used directly as a
+                # turn rate. Retained so published results remain reproducible, but
+                # note it is not rotationally invariant — an agent whose beacon lies
+                # due east receives no steering at all.
+                delta = influence_weights[i] * ddm_angle + (1.0 - influence_weights[i]) * vicsek_angle
 
         # Agents cannot pivot arbitrarily fast. This does not bind for the
         # published dynamics (|delta| <= pi there) but keeps the unbounded
@@ -305,11 +506,28 @@ def combined_influences(
         # clipping the diffusion as well would truncate the noise distribution.
         heading = agent_rotations[i] + delta * dt
         if diffusive_heading:
-            heading += internal_focus * np.sqrt(dt) * np.random.normal(0.0, 1.0)
-        rotation = np.mod(heading, 2.0 * np.pi)
+            if block_noise:
+                xi = noise_row[i]
+            else:
+                xi = np.random.normal(0.0, 1.0)
+            heading += internal_focus * np.sqrt(dt) * xi
+        if unit_heading:
+            # The one cos/sin pair per agent-step: it serves the position update
+            # here and is carried into the next step's bearing differences.
+            step_x = np.cos(heading)
+            step_y = np.sin(heading)
+            rotation = heading
+            while rotation >= 2.0 * np.pi:
+                rotation -= 2.0 * np.pi
+            while rotation < 0.0:
+                rotation += 2.0 * np.pi
+        else:
+            rotation = np.mod(heading, 2.0 * np.pi)
+            step_x = np.cos(rotation)
+            step_y = np.sin(rotation)
 
-        px = agent_positions[i, 0] + velocity * np.cos(rotation) * dt
-        py = agent_positions[i, 1] + velocity * np.sin(rotation) * dt
+        px = agent_positions[i, 0] + velocity * step_x * dt
+        py = agent_positions[i, 1] + velocity * step_y * dt
 
         # Obstacles block regardless of whether separation is switched on:
         # solidity is geometry, not a behavioural parameter. A step that ends
@@ -327,14 +545,29 @@ def combined_influences(
 
         new_positions[i, 0] = px
         new_positions[i, 1] = py
-        new_positions[i], new_rotations[i] = bound_agent_state(
-            agent_positions[i],
-            new_positions[i],
-            rotation,
-            room_size=room_size,
-            door_wall=door_wall,
-            door_center=door_center,
-            door_half_width=door_half_width,
-        )
-
-    return new_positions, new_rotations, num_neighbors, average_dists, radii_counts
+        if unit_heading:
+            (new_positions[i], new_rotations[i],
+             new_headings[i, 0], new_headings[i, 1]) = bound_agent_heading(
+                agent_positions[i],
+                new_positions[i],
+                rotation,
+                step_x,
+                step_y,
+                room_size=room_size,
+                door_wall=door_wall,
+                door_center=door_center,
+                door_half_width=door_half_width,
+            )
+        else:
+            new_positions[i], new_rotations[i] = bound_agent_state(
+                agent_positions[i],
+                new_positions[i],
+                rotation,
+                room_size=room_size,
+                door_wall=door_wall,
+                door_center=door_center,
+                door_half_width=door_half_width,
+            )
+
+    return (new_positions, new_rotations, num_neighbors, average_dists, radii_counts,
+            new_headings)
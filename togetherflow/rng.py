@@ -0,0 +1,113 @@
+import numpy as np
+from numba import njit
+
+# Counter-based random numbers for order-independent reproducibility.
+#
+# The legacy path seeds stateful generators once per sample() call, so
+# simulation b of a bank is only reachable by replaying every draw before it.
+# Philox-4x32-10 (Salmon et al. 2011, "Parallel random numbers: as easy as
+# 1, 2, 3") is instead a keyed bijection on a 128-bit counter: the output at a
+# counter depends on nothing but (key, counter). Every random quantity a
+# simulation needs is addressed by
+#
+#     key     = seed                         (two 32-bit words)
+#     counter = (step, lane, index, stream)
+#
+# so any simulation of any bank can be regenerated alone, in any order, in any
+# process. Streams keep the consumers of one simulation's randomness disjoint.
+
+STREAM_PRIOR    = 0    # the prior draw theta
+STREAM_EXPANDER = 1    # the per-timestep parameter path
+STREAM_SALIENCE = 2    # the beacon salience paths
+STREAM_INIT     = 3    # initial agent layout and beacon placement
+STREAM_NOISE    = 4    # the kernel's per-step noise block
+
+_MASK32 = np.uint64(0xFFFFFFFF)
+_SHIFT32 = np.uint64(32)
+_PHILOX_M0 = np.uint64(0xD2511F53)
+_PHILOX_M1 = np.uint64(0xCD9E8D57)
+_PHILOX_W0 = np.uint64(0x9E3779B9)
+_PHILOX_W1 = np.uint64(0xBB67AE85)
+_TWO_POW_M32 = 2.0 ** -32
+
+
+@njit
+def philox4x32(c0, c1, c2, c3, k0, k1):
+    """
+    Philox-4x32-10 block function.
+
+    Parameters
+    ----------
+    c0, c1, c2, c3 : np.uint64 — counter words, each holding a 32-bit value
+    k0, k1         : np.uint64 — key words, each holding a 32-bit value
+
+    Returns
+    -------
+    tuple of four np.uint64, each holding a 32-bit output word. Matches the
+    Random123 known-answer vectors.
+    """
+    for _ in range(10):
+        p0 = _PHILOX_M0 * c0
+        p1 = _PHILOX_M1 * c2
+        c0, c1, c2, c3 = (
+            ((p1 >> _SHIFT32) ^ c1 ^ k0) & _MASK32,
+            p1 & _MASK32,
+            ((p0 >> _SHIFT32) ^ c3 ^ k1) & _MASK32,
+            p0 & _MASK32,
+        )
+        k0 = (k0 + _PHILOX_W0) & _MASK32
+        k1 = (k1 + _PHILOX_W1) & _MASK32
+    return c0, c1, c2, c3
+
+
+@njit
+def _philox_at(seed, index, stream, step, lane):
+    s = np.uint64(seed)
+    i = np.uint64(index)
+    return philox4x32(
+        np.uint64(step) & _MASK32, np.uint64(lane) & _MASK32,
+        i & _MASK32, np.uint64(stream) & _MASK32,
+        s & _MASK32, (s >> _SHIFT32) & _MASK32,
+    )
+
+
+@njit
+def derive_seed(seed, index, stream):
+    """
+    A 32-bit seed for a stateful generator, addressed by (seed, index, stream).
+
+    For consumers that need a conventional RNG — the njit priors draw from
+    numba's Mersenne Twister, the expanders from NumPy's — seeding that RNG
+    with this value per simulation makes their output a function of the
+    simulation's index rather than of its position in a batch.
+    """
+    w0, _, _, _ = _philox_at(seed, index, stream, 0, 0)
+    return np.int64(w0)
+
+
+@njit
+def fill_philox_normals(block, seed, index):
+    """
+    Fill a (T, A) buffer with standard normals for simulation `index`.
+
+    Entry [t, i] comes from counter (t, i // 4, index, STREAM_NOISE): each
+    Philox call yields four 32-bit words, mapped to (0, 1) uniforms and paired
+    through Box-Muller into four normals. Rows are therefore independent of one
+    another, and of every other simulation, by construction.
+    """
+    num_steps, num_agents = block.shape
+    for t in range(num_steps):
+        for lane in range((num_agents + 3) // 4):
+            w0, w1, w2, w3 = _philox_at(seed, index, STREAM_NOISE, t, lane)
+            u0 = (np.float64(w0) + 0.5) * _TWO_POW_M32
+            u1 = (np.float64(w1) + 0.5) * _TWO_POW_M32
+            u2 = (np.float64(w2) + 0.5) * _TWO_POW_M32
+            u3 = (np.float64(w3) + 0.5) * _TWO_POW_M32
+            r0 = np.sqrt(-2.0 * np.log(u0))
+            r1 = np.sqrt(-2.0 * np.log(u2))
+            z = (r0 * np.cos(2.0 * np.pi * u1), r0 * np.sin(2.0 * np.pi * u1),
+                 r1 * np.cos(2.0 * np.pi * u3), r1 * np.sin(2.0 * np.pi * u3))
+            for k in range(4):
+                i = lane * 4 + k
+                if i < num_agents:
+                    block[t, i] = z[k]
@@ -1,9 +1,25 @@
 import numpy as np
-from numba import njit, prange
+from numba import get_num_threads, njit, prange
 
 from .initialization import initialize_agents, initialize_beacons
-from .influences import combined_influences
+from .channels import AGENT_CHANNELS, COMPACT_KEYS, derive_channels
+from .influences import build_beacon_grid, combined_influences
 from .priors import complete_pooling_prior
+from .statistics import (
+    NUM_DIAGNOSTIC_SERIES,
+    NUM_DIAGNOSTICS,
+    NUM_STATISTICS,
+    trajectory_diagnostics,
+    trajectory_statistics,
+)
+from .rng import (
+    STREAM_EXPANDER,
+    STREAM_INIT,
+    STREAM_PRIOR,
+    STREAM_SALIENCE,
+    derive_seed,
+    fill_philox_normals,
+)
 
 
 @njit
@@ -40,6 +56,9 @@ def simulator_fun(
     alpha_slot: int = -1,
     kappa_slot: int = -1,
     sigma_slot: int = -1,
+    beacon_grid_cell: float = 0.0,
+    unit_heading: bool = False,
+    noise_block=None,
 ):
     """
     Run one simulation trajectory and return per-channel time series.
@@ -62,6 +81,18 @@ def simulator_fun(
     sensing_radius  : float  (fallback if theta has < 2 elements)
     internal_focus  : float  (fallback if theta has < 4 elements)
     time_horizon    : float
+    beacon_grid_cell: float  — spacing of the precomputed beacon-selection table;
+                      0 selects by the exact rule throughout. Only used when the
+                      salience field is static for the trial.
+    unit_heading    : bool   — carry headings as unit vectors in the step kernel
+                      (see `combined_influences`); relative heading only.
+    noise_block     : np.ndarray of shape (T, A) — pre-drawn standard normals for
+                      the whole trial, or an empty (0, 0) array to draw on the
+                      fly. Row 0 holds the per-agent partial-pooling draws z_i
+                      (the dynamics start at t=1, so it is otherwise unused);
+                      row t >= 1 holds each agent's single noise draw for step t.
+                      See `fill_noise_block` and `rng.fill_philox_normals`
+                      for how it is generated.
 
     Returns
     -------
@@ -109,7 +140,10 @@ def simulator_fun(
         logit_mu = np.log(mu / (1.0 - mu))
         sigma = theta[0, sigma_slot]
         for i in range(num_agents):
-            z = logit_mu + sigma * np.random.normal(0.0, 1.0)
+            if noise_block.shape[0] > 0:
+                z = logit_mu + sigma * noise_block[0, i]
+            else:
+                z = logit_mu + sigma * np.random.normal(0.0, 1.0)
             agent_weights[i] = 1.0 / (1.0 + np.exp(-z))
 
     # Scenarios specify their own layout; everything else samples one. An empty
@@ -120,6 +154,16 @@ def simulator_fun(
     else:
         positions[0], rotations[0] = initialize_agents(num_agents, room_size=room_size)
 
+    # The unit-vector form of the heading, carried between steps so that only
+    # the heading update itself pays for a cos/sin pair.
+    if unit_heading:
+        headings = np.zeros((num_agents, 2))
+        for i in range(num_agents):
+            headings[i, 0] = np.cos(rotations[0, i])
+            headings[i, 1] = np.sin(rotations[0, i])
+    else:
+        headings = np.zeros((0, 2))
+
     if fixed_beacons.shape[0] > 0:
         beacon_positions = fixed_beacons
     else:
@@ -127,6 +171,26 @@ def simulator_fun(
             num_beacons, room_sensing_range=beacon_spread, room_size=room_size
         )
 
+    # With the beacons placed and no salience path, selection is a fixed
+    # partition of the room for the whole trial, so tabulate it once instead of
+    # scanning every beacon for every agent at every step. alpha read from theta
+    # only qualifies if the expander held it constant.
+    static_field = beacon_grid_cell > 0.0 and beacon_strength_path.shape[0] == 0
+    grid_sensitivity = salience_sensitivity
+    if static_field and alpha_slot >= 0:
+        grid_sensitivity = theta[0, alpha_slot]
+        for t in range(1, num_timesteps):
+            if theta[t, alpha_slot] != grid_sensitivity:
+                static_field = False
+                break
+    if static_field:
+        beacon_grid = build_beacon_grid(
+            beacon_positions, current_strengths, grid_sensitivity, room_size,
+            beacon_grid_cell,
+        )
+    else:
+        beacon_grid = np.zeros((0, 0), dtype=np.int64)
+
     # Which beacon each agent is currently committed to. Only consulted when a
     # salience path and a margin are supplied; seeded from the plain rule at t=0
     # so the first step is unaffected by hysteresis.
@@ -143,6 +207,7 @@ def simulator_fun(
                     best = sc
                     agent_targets[i] = b
 
+    no_noise = np.zeros(0)
     for t in range(1, num_timesteps):
         # Parameters are read per timestep. For a static model every row is
         # identical and this is equivalent to the previous behaviour.
@@ -206,7 +271,15 @@ def simulator_fun(
         else:
             active_assignment = beacon_assignment
 
-        ps, rs, nn, ad, rc = combined_influences(
+        # This step's row of the pre-drawn noise, or an empty row to draw on
+        # the fly. Chosen outside the call: numba cannot compile a conditional
+        # expression in a keyword argument list this long.
+        if noise_block.shape[0] > 0:
+            noise_row = noise_block[t]
+        else:
+            noise_row = no_noise
+
+        ps, rs, nn, ad, rc, hs = combined_influences(
             agent_positions=positions[t - 1],
             agent_rotations=rotations[t - 1],
             beacon_positions=beacon_positions,
@@ -229,7 +302,13 @@ def simulator_fun(
             door_half_width=door_half_width,
             beacon_assignment=active_assignment,
             diffusive_heading=diffusive_heading,
+            beacon_grid=beacon_grid,
+            beacon_grid_cell=beacon_grid_cell,
+            unit_heading=unit_heading,
+            agent_headings=headings,
+            noise_row=noise_row,
         )
+        headings = hs
         positions[t]  = ps
         rotations[t]  = rs
         neighbors[t]  = nn
@@ -439,61 +518,244 @@ def _seed_numba_rng(seed):
     np.random.seed(seed)
 
 
+@njit
+def fill_noise_block(block):
+    """Fill a (T, A) buffer with standard normals from numba's RNG, row-major.
+
+    Called immediately after a simulation seeds the RNG with `base_seed + b`,
+    so the block for simulation b is exactly
+
+        np.random.RandomState(base_seed + b).standard_normal((T, A))
+
+    — numba's Mersenne Twister and Gaussian sampler reproduce NumPy's legacy
+    ones bit for bit — and can be regenerated outside the kernel from the seed
+    alone. Agent and beacon initialisation draw from the same stream afterwards.
+    """
+    for t in range(block.shape[0]):
+        for i in range(block.shape[1]):
+            block[t, i] = np.random.normal(0.0, 1.0)
+
+
 @njit(parallel=True)
 def _batch_simulator(thetas, num_agents, num_beacons, room_size, dt, time_horizon,
                      beacon_strengths, beacon_strength_paths, switch_margin,
                      salience_sensitivity, reference_radii,
-                     beacon_spread, relative_heading, base_seed,
+                     beacon_spread, relative_heading, sim_seeds,
                      repulsion_radius, repulsion_gain, obstacles, max_turn_rate,
                      door_wall, door_center, door_half_width,
                      init_positions, init_rotations, fixed_beacons, beacon_assignment,
-                     diffusive_heading, alpha_slot, kappa_slot, sigma_slot):
+                     diffusive_heading, alpha_slot, kappa_slot, sigma_slot,
+                     beacon_grid_cell, unit_heading, block_noise,
+                     philox_seed, sim_indices, statistics_stride=0, diagnostics=0,
+                     diagnostic_window=0):
+    """Run a batch of simulations. With `statistics_stride` >= 1 each one is
+    reduced on the spot and the trajectory arrays come back empty, so memory
+    holds one trajectory per thread rather than one per simulation. The
+    reduction is `trajectory_statistics`, or with `diagnostics` >= 1
+    `trajectory_diagnostics` over the first `diagnostic_window` steps, plus its
+    per-step series when `diagnostics` is 2."""
     batch_size    = thetas.shape[0]
     num_timesteps = int(time_horizon / dt)
     num_radii     = reference_radii.shape[0]
+    reduce        = statistics_stride > 0
+    num_kept      = 0 if reduce else batch_size
+
+    all_pos = np.zeros((num_kept, num_timesteps, num_agents, 2))
+    all_rot = np.zeros((num_kept, num_timesteps, num_agents))
+    all_nbr = np.zeros((num_kept, num_timesteps, num_agents))
+    all_dst = np.zeros((num_kept, num_timesteps, num_agents))
+    all_av  = np.zeros((num_kept, num_timesteps, num_agents))
+    all_nf  = np.zeros((num_kept, num_timesteps, num_agents))
+    all_ms  = np.zeros((num_kept, num_timesteps, num_agents, num_radii))
+    all_stats = np.zeros((batch_size if reduce and diagnostics == 0 else 0, NUM_STATISTICS))
+    all_diag  = np.zeros((batch_size if reduce and diagnostics > 0 else 0, NUM_DIAGNOSTICS))
+    num_emitted = (num_timesteps + statistics_stride - 1) // statistics_stride if reduce else 0
+    all_series = np.zeros((batch_size if reduce and diagnostics > 1 else 0, num_emitted,
+                           NUM_DIAGNOSTIC_SERIES))
+
+    # Contiguous chunks of the batch, one per thread, so each worker can reuse
+    # a single noise buffer across all of its simulations instead of
+    # allocating one per simulation.
+    num_chunks = min(batch_size, get_num_threads())
+    for c in prange(num_chunks):
+        if block_noise:
+            noise_block = np.zeros((num_timesteps, num_agents))
+        else:
+            noise_block = np.zeros((0, 0))
+
+        for b in range(c * batch_size // num_chunks, (c + 1) * batch_size // num_chunks):
+            # Seed per simulation, not per thread: numba gives each worker thread
+            # its own RNG state, so a thread-level seed would make results depend
+            # on how the scheduler happened to distribute iterations. Seeding by
+            # index makes simulation b reproducible regardless of thread count or
+            # ordering. sim_seeds[b] is base_seed + b on the legacy path and a
+            # Philox-derived seed on the counter-based one; -1 leaves it unseeded.
+            if sim_seeds[b] >= 0:
+                np.random.seed(sim_seeds[b])
+            if block_noise:
+                if philox_seed >= 0:
+                    fill_philox_normals(noise_block, philox_seed, sim_indices[b])
+                else:
+                    fill_noise_block(noise_block)
+
+            if beacon_strength_paths.shape[0] > 0:
+                strength_path = beacon_strength_paths[b]
+            else:
+                strength_path = beacon_strength_paths[:, 0, :]   # empty (0, N) slice
+
+            pos, rot, nbr, dst, av, nf, ms = simulator_fun(
+                thetas[b], num_agents, num_beacons, room_size, 1.0, dt, 0.7, 2.5, 0.1,
+                time_horizon,
+                beacon_strengths, strength_path, switch_margin,
+                salience_sensitivity, reference_radii, beacon_spread,
+                relative_heading,
+                repulsion_radius, repulsion_gain, obstacles, max_turn_rate,
+                door_wall, door_center, door_half_width,
+                init_positions, init_rotations, fixed_beacons, beacon_assignment,
+                diffusive_heading, alpha_slot, kappa_slot, sigma_slot,
+                beacon_grid_cell, unit_heading, noise_block,
+            )
+            if reduce and diagnostics > 0:
+                if diagnostics > 1:
+                    series = all_series[b]
+                else:
+                    series = all_series[:, 0, :]                # empty (0, S) slice
+                trajectory_diagnostics(pos, rot, 0.5 * room_size[0], 0.5 * room_size[1],
+                                       statistics_stride, diagnostic_window,
+                                       all_diag[b], series)
+                continue
+            if reduce:
+                trajectory_statistics(pos, rot, nbr, dst, av, nf, statistics_stride,
+                                      all_stats[b])
+                continue
+            all_pos[b] = pos
+            all_rot[b] = rot
+            all_nbr[b] = nbr
+            all_dst[b] = dst
+            all_av[b]  = av
+            all_nf[b]  = nf
+            all_ms[b]  = ms
+
+    return (all_pos, all_rot, all_nbr, all_dst, all_av, all_nf, all_ms, all_stats,
+            all_diag, all_series)
+
+
+@njit(parallel=True)
+def _config_batch_simulator(thetas, num_agents, num_beacons, time_horizons, room_size, dt,
+                            beacon_strengths, switch_margin, salience_sensitivity,
+                            reference_radii, beacon_spread, relative_heading, sim_seeds,
+                            repulsion_radius, repulsion_gain, obstacles, num_obstacles,
+                            max_turn_rate, door_wall, door_center, door_half_width,
+                            init_positions, init_rotations, has_layout,
+                            fixed_beacons, has_beacons, beacon_assignment, has_assignment,
+                            diffusive_heading, alpha_slot, kappa_slot, sigma_slot,
+                            beacon_grid_cell, unit_heading, block_noise,
+                            philox_seed, sim_indices):
+    """`_batch_simulator` for a batch whose simulations differ in structure.
+
+    Every per-simulation argument carries a leading batch axis, padded to the
+    largest simulation; simulation b reads the first num_agents[b] agents,
+    num_beacons[b] beacons, num_obstacles[b] obstacles and int(time_horizons[b]
+    / dt) steps of it, and an empty layout, beacon set or assignment (has_* is
+    False) falls back to the drawn one as in `simulator_fun`. Outputs are
+    padded the same way, with NaN outside each simulation's own extent.
+    """
+    batch_size    = thetas.shape[0]
+    max_steps     = thetas.shape[1]
+    max_agents    = init_positions.shape[1]
+    num_radii     = reference_radii.shape[0]
 
-    all_pos = np.zeros((batch_size, num_timesteps, num_agents, 2))
-    all_rot = np.zeros((batch_size, num_timesteps, num_agents))
-    all_nbr = np.zeros((batch_size, num_timesteps, num_agents))
-    all_dst = np.zeros((batch_size, num_timesteps, num_agents))
-    all_av  = np.zeros((batch_size, num_timesteps, num_agents))
-    all_nf  = np.zeros((batch_size, num_timesteps, num_agents))
-    all_ms  = np.zeros((batch_size, num_timesteps, num_agents, num_radii))
-
-    for b in prange(batch_size):
-        # Seed per simulation, not per thread: numba gives each worker thread its
-        # own RNG state, so a thread-level seed would make results depend on how
-        # the scheduler happened to distribute iterations. Seeding by index makes
-        # simulation b reproducible regardless of thread count or ordering.
-        if base_seed >= 0:
-            np.random.seed(base_seed + b)
-
-        if beacon_strength_paths.shape[0] > 0:
-            strength_path = beacon_strength_paths[b]
+    all_pos = np.full((batch_size, max_steps, max_agents, 2), np.nan)
+    all_rot = np.full((batch_size, max_steps, max_agents), np.nan)
+    all_nbr = np.full((batch_size, max_steps, max_agents), np.nan)
+    all_dst = np.full((batch_size, max_steps, max_agents), np.nan)
+    all_av  = np.full((batch_size, max_steps, max_agents), np.nan)
+    all_nf  = np.full((batch_size, max_steps, max_agents), np.nan)
+    all_ms  = np.full((batch_size, max_steps, max_agents, num_radii), np.nan)
+
+    # Static salience only, in the empty-path form `_batch_simulator` passes.
+    no_paths = np.zeros((0, 1, beacon_strengths.shape[1]), dtype=np.float32)
+
+    num_chunks = min(batch_size, get_num_threads())
+    for c in prange(num_chunks):
+        if block_noise:
+            noise_block = np.zeros((max_steps, max_agents))
         else:
-            strength_path = beacon_strength_paths[:, 0, :]   # empty (0, N) slice
-
-        pos, rot, nbr, dst, av, nf, ms = simulator_fun(
-            thetas[b], num_agents, num_beacons, room_size, 1.0, dt, 0.7, 2.5, 0.1, time_horizon,
-            beacon_strengths, strength_path, switch_margin,
-            salience_sensitivity, reference_radii, beacon_spread,
-            relative_heading,
-            repulsion_radius, repulsion_gain, obstacles, max_turn_rate,
-            door_wall, door_center, door_half_width,
-            init_positions, init_rotations, fixed_beacons, beacon_assignment,
-            diffusive_heading, alpha_slot, kappa_slot, sigma_slot,
-        )
-        all_pos[b] = pos
-        all_rot[b] = rot
-        all_nbr[b] = nbr
-        all_dst[b] = dst
-        all_av[b]  = av
-        all_nf[b]  = nf
-        all_ms[b]  = ms
+            noise_block = np.zeros((0, 0))
+
+        for b in range(c * batch_size // num_chunks, (c + 1) * batch_size // num_chunks):
+            A = num_agents[b]
+            nb = num_beacons[b]
+            T = int(time_horizons[b] / dt)
+            if sim_seeds[b] >= 0:
+                np.random.seed(sim_seeds[b])
+            # Only the simulation's own (T, A) corner is filled, in the order
+            # a buffer of exactly that shape would be, so its noise is the
+            # noise it gets in a batch of its own.
+            if block_noise:
+                if philox_seed >= 0:
+                    fill_philox_normals(noise_block[:T, :A], philox_seed, sim_indices[b])
+                else:
+                    fill_noise_block(noise_block[:T, :A])
+
+            if has_layout[b]:
+                layout_pos = np.ascontiguousarray(init_positions[b, :A])
+                layout_rot = np.ascontiguousarray(init_rotations[b, :A])
+            else:
+                layout_pos = np.zeros((0, 2))
+                layout_rot = np.zeros(0)
+            if has_beacons[b]:
+                beacons = np.ascontiguousarray(fixed_beacons[b, :nb])
+            else:
+                beacons = np.zeros((0, 2), dtype=np.float32)
+            if has_assignment[b]:
+                assignment = np.ascontiguousarray(beacon_assignment[b, :A])
+            else:
+                assignment = np.zeros(0, dtype=np.int64)
+
+            pos, rot, nbr, dst, av, nf, ms = simulator_fun(
+                thetas[b], A, nb, room_size, 1.0, dt, 0.7, 2.5, 0.1,
+                time_horizons[b],
+                np.ascontiguousarray(beacon_strengths[b, :nb]), no_paths[:, 0, :nb],
+                switch_margin, salience_sensitivity, reference_radii, beacon_spread,
+                relative_heading,
+                repulsion_radius[b], repulsion_gain[b],
+                np.ascontiguousarray(obstacles[b, :num_obstacles[b]]), max_turn_rate,
+                door_wall[b], door_center[b], door_half_width[b],
+                layout_pos, layout_rot, beacons, assignment,
+                diffusive_heading, alpha_slot, kappa_slot, sigma_slot,
+                beacon_grid_cell, unit_heading, noise_block,
+            )
+            all_pos[b, :T, :A] = pos
+            all_rot[b, :T, :A] = rot
+            all_nbr[b, :T, :A] = nbr
+            all_dst[b, :T, :A] = dst
+            all_av[b, :T, :A]  = av
+            all_nf[b, :T, :A]  = nf
+            all_ms[b, :T, :A]  = ms
 
     return all_pos, all_rot, all_nbr, all_dst, all_av, all_nf, all_ms
 
 
+# What `simulate_configs` lets each simulation of a batch set for itself.
+CONFIG_KEYS = (
+    "num_agents", "num_beacons", "time_horizon", "repulsion_radius", "repulsion_gain",
+    "obstacles", "door_wall", "door_center", "door_half_width", "init_positions",
+    "init_rotations", "fixed_beacons", "beacon_assignment", "beacon_strengths",
+)
+
+OUTPUT_MODES = ("flat", "raw", "summary", "compact", "concatenated", "diagnostics",
+                "statistics")
+
+
+def _check_output_mode(output_mode):
+    if output_mode not in OUTPUT_MODES:
+        raise ValueError(
+            "output_mode must be one of "
+            + ", ".join(f"'{m}'" for m in OUTPUT_MODES) + f"; got '{output_mode}'"
+        )
+
+
 class TogetherFlowSimulator:
     """
     BayesFlow-compatible simulator for multi-agent motion dynamics.
@@ -509,6 +771,20 @@ class TogetherFlowSimulator:
                    "raw"     — per-agent arrays: positions (B,T,A,2), others (B,T,A,1)
                    "summary" — mean/std collapsed over T and A:
                                positions (B,4), others (B,2)
+                   "compact" — positions (B,T,A,2) and rotations (B,T,A) at full
+                               resolution plus sensing_radius (B,T); every other
+                               per-agent channel is rebuilt by `expand_compact`
+                   "concatenated" — the flat `summary_channels` as one float32
+                               summary_variables (B,T,F), laid out per
+                               `channel_offsets`; other per-agent channels dropped
+                   "diagnostics" — no trajectories: each simulation reduced in
+                               the kernel to its `DIAGNOSTIC_NAMES` (B,D), plus
+                               per-step `DIAGNOSTIC_SERIES_NAMES` (B,T,S) as
+                               diagnostic_series if `diagnostic_series`
+                   "statistics" — no trajectories: each simulation reduced in
+                               the kernel to its `STATISTIC_NAMES` (B, 14)
+    diagnostic_window : float, optional — seconds from the start over which
+                   "diagnostics" measures tortuosity; the whole run if None
     """
 
     def __init__(
@@ -546,8 +822,43 @@ class TogetherFlowSimulator:
         salience_process=None,
         include_salience_paths: bool = False,
         switch_margin: float = 1.0,
+        beacon_grid_cell: float = 0.0,
+        unit_heading: bool = False,
+        block_noise: bool = False,
+        rng: str = "legacy",
+        summary_channels=None,
+        diagnostic_window=None,
+        diagnostic_series: bool = False,
     ):
         self.relative_heading = bool(relative_heading)
+        # Step-kernel representation of the heading: an angle (False, the
+        # published code path) or an angle plus its unit vector, which removes
+        # most transcendental calls from the inner loop. The two agree to
+        # rounding; the vector form exists for speed only.
+        self.unit_heading = bool(unit_heading)
+        if self.unit_heading and not self.relative_heading:
+            raise ValueError("unit_heading requires relative_heading=True")
+        # Pre-draw each simulation's noise as one (T, A) block into a per-thread
+        # buffer instead of one RNG call per agent-step. Simulation b's block is
+        # a documented function of base_seed + b (see `fill_noise_block`). The
+        # noise is consumed in a different order from the on-the-fly draws, so
+        # trajectories differ from the default mode draw for draw while being
+        # identically distributed.
+        self.block_noise = bool(block_noise)
+        # Where the randomness comes from. "legacy" seeds the global generators
+        # once per sample() call, so a simulation is only reproducible by
+        # replaying the whole call. "philox" addresses every draw by (seed,
+        # simulation index, stream, step) through the counter-based generator
+        # in `togetherflow.rng`, so `sample_indices` can regenerate any single
+        # simulation alone, in any order, in any process. The kernel's noise
+        # must then come from the counter too, so it implies block_noise.
+        if rng not in ("legacy", "philox"):
+            raise ValueError(f"rng must be 'legacy' or 'philox'; got '{rng}'")
+        self.rng = rng
+        if self.rng == "philox":
+            if seed is None:
+                raise ValueError("rng='philox' needs an integer seed to key the generator")
+            self.block_noise = True
         # Whether eta is a diffusion coefficient on the heading (True) or a
         # perturbation of the alignment target (False, the published behaviour).
         self.diffusive_heading = bool(diffusive_heading)
@@ -572,6 +883,14 @@ class TogetherFlowSimulator:
         # salience field is not a switching model but a flicker (see the
         # hysteresis note in simulator_fun).
         self.switch_margin = float(switch_margin)
+        # Spacing of the per-trial beacon-selection table (see
+        # `influences.build_beacon_grid`). 0 keeps the exact per-agent scan. The
+        # table is exact by construction, so this trades a one-off tabulation
+        # per trial for O(1) selection — worth it once beacons number in the
+        # dozens. Ignored whenever a salience process makes the field move.
+        self.beacon_grid_cell = float(beacon_grid_cell)
+        if self.beacon_grid_cell < 0.0:
+            raise ValueError(f"beacon_grid_cell must be >= 0; got {beacon_grid_cell}")
         # Derived from param_names so a variant declares its parameters once and
         # the kernel is told explicitly where to find them.
         self.alpha_slot = self.param_names.index("alpha") if "alpha" in self.param_names else -1
@@ -676,8 +995,17 @@ class TogetherFlowSimulator:
 
         self.salience_sensitivity = float(salience_sensitivity)
 
-        if output_mode not in ("flat", "raw", "summary"):
-            raise ValueError(f"output_mode must be 'flat', 'raw', or 'summary'; got '{output_mode}'")
+        _check_output_mode(output_mode)
+        # Only read by output_mode="diagnostics".
+        self.diagnostic_window = None if diagnostic_window is None else float(diagnostic_window)
+        self.diagnostic_series = bool(diagnostic_series)
+        # The flat channels the "concatenated" mode packs into summary_variables,
+        # in feature order — the order an adapter's concatenate would use.
+        self.summary_channels = None if summary_channels is None else list(summary_channels)
+        if output_mode == "concatenated":
+            if not self.summary_channels:
+                raise ValueError("output_mode='concatenated' requires summary_channels")
+            self.channel_offsets()
 
     def sample(self, batch_size: int | tuple = 1) -> dict[str, np.ndarray]:
         if isinstance(batch_size, tuple):
@@ -686,10 +1014,291 @@ class TogetherFlowSimulator:
             batch_size = batch_size[0]
         elif not isinstance(batch_size, int):
             raise ValueError(f"batch_size must be int or (int,), got {type(batch_size)}")
+        if self.output_mode == "concatenated":
+            return self._concatenated(self._draw(batch_size), self.summary_channels)
+        return self._simulate(*self._draw(batch_size))
+
+    def simulate(self, thetas, indices=None, output_mode=None) -> dict[str, np.ndarray]:
+        """Simulate the given parameters instead of prior draws.
+
+        Row b of `thetas` takes the place of the b-th prior draw; everything
+        else — parameter paths, salience, initial layouts, noise — is drawn as
+        `sample` would, so `simulate(thetas)` is the `sample(len(thetas))` of a
+        prior that returns those rows. Parameters are plain data here, so a
+        sweep over any number of values is one kernel call and compiles nothing.
+
+        Parameters
+        ----------
+        thetas  : np.ndarray of shape (B, P) or (P,) — columns in `param_names`
+                  order
+        indices : sequence of int, optional — rng="philox" only: the positions
+                  in the seed's sequence whose randomness row b uses, as in
+                  `sample_indices`, instead of the next B. Repeating indices
+                  across rows gives them common random numbers. The sequence
+                  cursor is left where it was.
+        output_mode : str, optional — any of the constructor's modes, for this
+                  call only; e.g. "statistics" to reduce replicates in the
+                  kernel. The simulator's own mode if None.
+
+        Returns
+        -------
+        dict[str, np.ndarray] — as `sample` in `output_mode`
+        """
+        output_mode = self.output_mode if output_mode is None else output_mode
+        _check_output_mode(output_mode)
+        if output_mode == "concatenated" and not self.summary_channels:
+            raise ValueError("output_mode='concatenated' requires summary_channels")
+        thetas = np.asarray(thetas, dtype=np.float32)
+        if thetas.ndim == 1:
+            thetas = thetas[None]
+        if thetas.ndim != 2 or thetas.shape[1] != len(self.param_names):
+            raise ValueError(
+                f"thetas must have shape (B, {len(self.param_names)}); got {thetas.shape}"
+            )
+        thetas = np.ascontiguousarray(thetas)
+        if indices is None:
+            draw = self._draw(thetas.shape[0], thetas)
+        else:
+            if self.rng != "philox":
+                raise ValueError("simulate(indices=...) requires rng='philox'")
+            indices = np.asarray(indices, dtype=np.int64).reshape(-1)
+            if indices.shape[0] != thetas.shape[0]:
+                raise ValueError(f"{indices.shape[0]} indices for {thetas.shape[0]} thetas")
+            draw = self._draw_indices(indices, thetas)
+        if output_mode == "concatenated":
+            return self._concatenated(draw, self.summary_channels)
+        return self._simulate(*draw, output_mode=output_mode)
+
+    def simulate_configs(self, thetas, configs) -> dict[str, np.ndarray]:
+        """Simulate a batch in which every simulation has its own structure.
+
+        Simulation b runs `thetas[b]` under this simulator's settings with
+        `configs[b]` overriding any of CONFIG_KEYS — agent and beacon counts,
+        horizon, separation, obstacles, door, initial layout, fixed beacons and
+        assignment — and, on the legacy RNG, "seed" fixing its kernel seed, so
+        it reproduces `simulate` on a simulator built with those settings and
+        that seed. A grid of scenarios x conditions x replicates is then one
+        parallel kernel call.
+
+        Parameters are time-invariant here and salience static: the expander
+        and salience process are per-simulator, and neither knows the
+        per-simulation horizon or beacon count.
+
+        Parameters
+        ----------
+        thetas  : np.ndarray of shape (B, P) or (P,) — one row, or one per
+                  simulation
+        configs : sequence of B dicts
+
+        Returns
+        -------
+        dict[str, np.ndarray] — parameters (B, 1) each; per-agent channels in
+        "raw" layout without the trailing axis, (B, T, A[, 2 | R]), padded to
+        the largest simulation with NaN; "num_agents" and "num_timesteps" (B,)
+        """
+        if self.expander is not expand_static or self.salience_process is not None:
+            raise ValueError("simulate_configs needs a static expander and static salience")
+        configs = list(configs)
+        batch_size = len(configs)
+        for cfg in configs:
+            unknown = set(cfg) - set(CONFIG_KEYS) - {"seed"}
+            if unknown:
+                raise ValueError(f"unknown config keys {sorted(unknown)}; choose from {CONFIG_KEYS}")
+        thetas = np.asarray(thetas, dtype=np.float32)
+        thetas = np.ascontiguousarray(np.broadcast_to(
+            thetas if thetas.ndim == 2 else thetas[None], (batch_size, len(self.param_names))
+        ))
+
+        def field(cfg, key):
+            return cfg.get(key, getattr(self, key))
+
+        num_agents = np.array([field(c, "num_agents") for c in configs], dtype=np.int64)
+        num_beacons = np.array([field(c, "num_beacons") for c in configs], dtype=np.int64)
+        horizons = np.array([field(c, "time_horizon") for c in configs], dtype=np.float64)
+        num_steps = np.array([int(h / self.dt) for h in horizons], dtype=np.int64)
+        max_agents, max_beacons = int(num_agents.max()), int(num_beacons.max())
+
+        def padded(key, shape, dtype, width=None):
+            """Per-simulation arrays stacked into (B, width, ...), with row counts."""
+            values = [field(c, key) for c in configs]
+            values = [np.zeros((0,) + shape) if v is None else np.asarray(v) for v in values]
+            counts = np.array([len(v) for v in values], dtype=np.int64)
+            width = max(int(counts.max()), 1) if width is None else width
+            out = np.zeros((batch_size, width) + shape, dtype=dtype)
+            for b, v in enumerate(values):
+                out[b, :len(v)] = v
+            return out, counts
+
+        init_positions, n_layout = padded("init_positions", (2,), np.float64, max_agents)
+        init_rotations, _ = padded("init_rotations", (), np.float64, max_agents)
+        fixed_beacons, n_beacons = padded("fixed_beacons", (2,), np.float32, max_beacons)
+        assignment, n_assign = padded("beacon_assignment", (), np.int64, max_agents)
+        obstacles, num_obstacles = padded("obstacles", (3,), np.float64)
+        has_layout, has_beacons, has_assignment = n_layout > 0, n_beacons > 0, n_assign > 0
+        strengths = np.ones((batch_size, max_beacons), dtype=np.float32)
+        for b, cfg in enumerate(configs):
+            if "beacon_strengths" in cfg or num_beacons[b] == self.num_beacons:
+                strengths[b, :num_beacons[b]] = field(cfg, "beacon_strengths")
+        for b in range(batch_size):
+            for name, n, present in (("init_positions", n_layout[b], has_layout[b]),
+                                     ("beacon_assignment", n_assign[b], has_assignment[b])):
+                if present and n != num_agents[b]:
+                    raise ValueError(f"config {b}: {name} has {n} rows for "
+                                     f"{num_agents[b]} agents")
+            if has_beacons[b] and n_beacons[b] != num_beacons[b]:
+                raise ValueError(f"config {b}: fixed_beacons has {n_beacons[b]} rows for "
+                                 f"{num_beacons[b]} beacons")
+
+        # Seeds and sequence positions as the next B simulations would get
+        # them; a config's own seed replaces its kernel seed.
+        _, _, _, sim_seeds, sim_indices = self._draw(batch_size, thetas)
+        for b, cfg in enumerate(configs):
+            if "seed" in cfg:
+                if self.rng == "philox":
+                    raise ValueError("per-config seeds apply to rng='legacy' only; "
+                                     "philox simulations are keyed by sequence position")
+                sim_seeds[b] = int(cfg["seed"])
+
+        scalars = {key: np.array([field(c, key) for c in configs], dtype=dtype)
+                   for key, dtype in (("repulsion_radius", np.float64),
+                                      ("repulsion_gain", np.float64),
+                                      ("door_wall", np.int64),
+                                      ("door_center", np.float64),
+                                      ("door_half_width", np.float64))}
+        philox_seed = int(self.seed) if self.rng == "philox" else -1
+        all_pos, all_rot, all_nbr, all_dst, all_av, all_nf, all_ms = _config_batch_simulator(
+            np.ascontiguousarray(expand_static(thetas, int(num_steps.max())), dtype=np.float64),
+            num_agents, num_beacons, horizons,
+            self.room_size, self.dt, strengths, self.switch_margin,
+            self.salience_sensitivity, self.reference_radii, self.beacon_spread,
+            self.relative_heading, sim_seeds,
+            scalars["repulsion_radius"], scalars["repulsion_gain"], obstacles, num_obstacles,
+            self.max_turn_rate, scalars["door_wall"], scalars["door_center"],
+            scalars["door_half_width"],
+            init_positions, init_rotations, has_layout, fixed_beacons, has_beacons,
+            assignment, has_assignment, self.diffusive_heading,
+            self.alpha_slot, self.kappa_slot, self.sigma_slot,
+            self.beacon_grid_cell, self.unit_heading, self.block_noise,
+            philox_seed, sim_indices,
+        )
+
+        out = {name: thetas[:, i:i + 1] for i, name in enumerate(self.param_names)}
+        out |= {
+            "positions":             all_pos,
+            "rotations":             all_rot,
+            "neighbors":             all_nbr,
+            "distances":             all_dst,
+            "angular_velocities":    all_av,
+            "neighbor_fluctuations": all_nf,
+            "num_agents":            num_agents,
+            "num_timesteps":         num_steps,
+        }
+        if self.reference_radii.shape[0] > 0:
+            out["radii_counts"] = all_ms
+        return out
 
+    def channel_offsets(self, channels=None) -> dict[str, tuple[int, int]]:
+        """Where each flat channel sits on the feature axis of summary_variables.
+
+        Parameters
+        ----------
+        channels : sequence of str, optional — defaults to `summary_channels`
+
+        Returns
+        -------
+        dict[str, tuple[int, int]] — channel -> (start, stop) feature columns
+        """
+        channels = self.summary_channels if channels is None else channels
+        A = self.num_agents
+        widths = {
+            "positions": 2 * A,
+            "radii_counts": A * self.reference_radii.shape[0],
+        }
+        if self.include_salience_paths and self.salience_process is not None:
+            widths["salience"] = self.num_beacons
+        if self.include_parameter_paths:
+            widths |= {f"{name}_path": 1 for name in self.param_names}
+        offsets = {}
+        col = 0
+        for c in channels:
+            if c in widths:
+                width = widths[c]
+            elif c in AGENT_CHANNELS:
+                width = A
+            else:
+                raise ValueError(f"'{c}' is not a flat channel of this simulator")
+            offsets[c] = (col, col + width)
+            col += width
+        return offsets
+
+    def sample_concatenated(self, batch_size: int, channels, chunk_size: int = 256,
+                            out=None) -> dict[str, np.ndarray]:
+        """`sample` in flat mode, with `channels` written into one float32 tensor.
+
+        The bank-building counterpart of `sample(batch_size)` followed by a cast
+        to float32 and a concatenation of `channels` along the feature axis —
+        the result is identical to that, but the kernel runs `chunk_size`
+        simulations at a time and each chunk is written straight into its rows
+        of a single preallocated (B, T, F) buffer, so the full float64 output
+        never exists at once. Per-agent channels not listed are dropped.
+
+        Parameters
+        ----------
+        batch_size : int
+        channels   : sequence of str — flat-mode keys, in feature order
+        chunk_size : int — simulations per kernel call
+        out        : np.ndarray of shape (B, T, F), float32, optional — buffer
+                     to fill; allocated if omitted
+
+        Returns
+        -------
+        dict[str, np.ndarray] — "summary_variables" (the buffer) plus every
+        non-channel key of `sample` (parameters, paths, unlisted salience)
+        """
+        return self._concatenated(self._draw(batch_size), channels, chunk_size, out)
+
+    def _concatenated(self, draw, channels, chunk_size=None, out=None):
+        """Simulate prepared inputs in chunks into one summary_variables buffer."""
+        thetas, thetas_t, strength_paths, sim_seeds, sim_indices = draw
+        batch_size = thetas.shape[0]
+        chunk_size = max(batch_size, 1) if chunk_size is None else chunk_size
+        offsets = self.channel_offsets(channels)
+        num_features = max([stop for _, stop in offsets.values()], default=0)
+        if out is None:
+            # Sized up front so an empty batch still returns its (0, T, F) tensor.
+            num_timesteps = int(self.time_horizon / self.dt)
+            if self.downsample:
+                num_timesteps = -(-num_timesteps // self.downsample_factor)
+            out = np.empty((batch_size, num_timesteps, num_features), dtype=np.float32)
+        rest = {}
+        for start in range(0, batch_size, chunk_size):
+            rows = slice(start, min(start + chunk_size, batch_size))
+            paths = strength_paths[rows] if strength_paths.shape[0] > 0 else strength_paths
+            chunk = self._simulate(thetas[rows], thetas_t[rows], paths,
+                                   sim_seeds[rows], sim_indices[rows], output_mode="flat")
+            for c, (a, b) in offsets.items():
+                out[rows, :, a:b] = chunk[c]
+            for k, v in chunk.items():
+                if k not in offsets and k not in AGENT_CHANNELS:
+                    rest.setdefault(k, []).append(v)
+        data = {k: np.concatenate(v, axis=0) for k, v in rest.items()}
+        data["summary_variables"] = out
+        return data
+
+    def _draw(self, batch_size, thetas=None):
+        """Kernel inputs for the next `batch_size` simulations of the sequence.
+
+        `thetas` (B, P), when given, replace the prior draws; everything else —
+        parameter paths, salience, initial layouts, noise — is drawn as usual.
+        """
         # Advance the seed cursor so repeated sample() calls (as in online
         # training) draw *different* batches while the whole sequence stays
         # reproducible for a given seed.
+        if self.rng == "philox":
+            start = self._call_count
+            self._call_count += batch_size
+            return self._draw_indices(np.arange(start, start + batch_size), thetas)
+
         if self.seed is None:
             base_seed = -1
         else:
@@ -699,69 +1308,220 @@ class TogetherFlowSimulator:
             np.random.seed(base_seed)
         self._call_count += batch_size
 
-        thetas = np.stack([self.prior() for _ in range(batch_size)])  # (B, P)
+        if thetas is None:
+            thetas = np.stack([self.prior() for _ in range(batch_size)])  # (B, P)
+        thetas_t = self._expand(thetas)
+        strength_paths = self._salience_paths(thetas)
 
-        # Prior draws remain the inference targets; the expander turns them into
-        # the per-timestep parameter array the kernel consumes.
+        if base_seed < 0:
+            sim_seeds = np.full(batch_size, -1, dtype=np.int64)
+        else:
+            sim_seeds = base_seed + np.arange(batch_size, dtype=np.int64)
+        return (thetas, thetas_t, strength_paths, sim_seeds,
+                np.zeros(batch_size, dtype=np.int64))
+
+    def advance(self, batch_size: int) -> None:
+        """Move the sequence on by `batch_size` simulations without running them.
+
+        Leaves the simulator, and numpy's global RNG, in the state a
+        `sample(batch_size)` call would have — for when that batch was
+        simulated elsewhere, e.g. a bank built by another process.
+        """
+        if self.rng == "philox":
+            # Each row reseeds the global RNGs from its own index, so the last
+            # row alone decides the state the whole draw would leave them in.
+            if batch_size > 0:
+                self._draw_indices(np.array([self._call_count + batch_size - 1]))
+            self._call_count += batch_size
+            return
+        self._draw(batch_size)
+
+    def sample_indices(self, indices) -> dict[str, np.ndarray]:
+        """Regenerate simulations by their index in the seed's sequence.
+
+        Only available with rng="philox". Simulation i of the sequence that
+        successive sample() calls walk through is a function of (seed, i) alone,
+        so the rows returned here are identical to the ones sample() produced
+        or will produce at those positions — regardless of batch boundaries,
+        call order, or which process asks.
+
+        Parameters
+        ----------
+        indices : sequence of int — positions in the sequence, in any order
+
+        Returns
+        -------
+        dict[str, np.ndarray] — as `sample`, one row per index
+        """
+        if self.rng != "philox":
+            raise ValueError("sample_indices requires rng='philox'")
+        if self.output_mode == "concatenated":
+            return self._concatenated(self._draw_indices(indices), self.summary_channels)
+        return self._simulate(*self._draw_indices(indices))
+
+    def _draw_indices(self, indices, thetas=None):
+        """Kernel inputs for simulations `indices` of the philox sequence."""
+        indices = np.asarray(indices, dtype=np.int64).reshape(-1)
+        seed = int(self.seed)
+
+        # Stateful consumers — the njit prior, the numpy expander and salience
+        # process, the kernel's initial layout — are reseeded per simulation
+        # from a Philox-derived seed, one stream each, so what they draw for
+        # simulation i never depends on what they drew for anything else.
+        if thetas is None:
+            rows = []
+            for i in indices:
+                _seed_numba_rng(derive_seed(seed, i, STREAM_PRIOR))
+                rows.append(self.prior())
+            thetas = np.stack(rows)
+        thetas_t = self._expand(thetas, indices)
+        strength_paths = self._salience_paths(thetas, indices)
+
+        sim_seeds = np.array([derive_seed(seed, i, STREAM_INIT) for i in indices],
+                             dtype=np.int64)
+        return thetas, thetas_t, strength_paths, sim_seeds, indices
+
+    def _per_index(self, fn, thetas, indices, stream):
+        """Call a batched numpy generator one row at a time, reseeding NumPy per
+        simulation index, so each row depends on its index alone."""
         num_timesteps = int(self.time_horizon / self.dt)
-        thetas_t = np.ascontiguousarray(
-            self.expander(thetas, num_timesteps), dtype=np.float64
-        )
+        seed = int(self.seed)
+        rows = []
+        for b, i in enumerate(indices):
+            np.random.seed(int(derive_seed(seed, i, stream)))
+            rows.append(np.asarray(fn(thetas[b:b + 1], num_timesteps)))
+        return np.concatenate(rows, axis=0)
+
+    def _expand(self, thetas, indices=None):
+        """Prior draws (B, P) -> per-timestep parameters (B, T, P)."""
+        batch_size = thetas.shape[0]
+        num_timesteps = int(self.time_horizon / self.dt)
+        # Prior draws remain the inference targets; the expander turns them into
+        # the per-timestep parameter array the kernel consumes. The static
+        # broadcast draws nothing, so it never needs per-index seeding.
+        if indices is None or self.expander is expand_static:
+            expanded = self.expander(thetas, num_timesteps)
+        else:
+            expanded = self._per_index(self.expander, thetas, indices, STREAM_EXPANDER)
+        thetas_t = np.ascontiguousarray(expanded, dtype=np.float64)
         if thetas_t.shape[:2] != (batch_size, num_timesteps):
             raise ValueError(
                 f"expander must return shape ({batch_size}, {num_timesteps}, P); "
                 f"got {thetas_t.shape}"
             )
+        return thetas_t
 
+    def _salience_paths(self, thetas, indices=None):
+        """Prior draws (B, P) -> salience paths (B, T, num_beacons), or an empty
+        (0, 0, num_beacons) array when salience is static."""
+        batch_size = thetas.shape[0]
+        num_timesteps = int(self.time_horizon / self.dt)
         # float32 throughout: it must unify with self.beacon_strengths inside the
         # kernel, and numba will not join a float32 and a float64 array.
         if self.salience_process is None:
-            strength_paths = np.zeros((0, 0, self.num_beacons), dtype=np.float32)
+            return np.zeros((0, 0, self.num_beacons), dtype=np.float32)
+        if indices is None:
+            paths = self.salience_process(thetas, num_timesteps)
         else:
-            strength_paths = np.ascontiguousarray(
-                self.salience_process(thetas, num_timesteps), dtype=np.float32
+            paths = self._per_index(self.salience_process, thetas, indices, STREAM_SALIENCE)
+        strength_paths = np.ascontiguousarray(paths, dtype=np.float32)
+        if strength_paths.shape != (batch_size, num_timesteps, self.num_beacons):
+            raise ValueError(
+                f"salience_process must return shape ({batch_size}, "
+                f"{num_timesteps}, {self.num_beacons}); got {strength_paths.shape}"
             )
-            if strength_paths.shape != (batch_size, num_timesteps, self.num_beacons):
-                raise ValueError(
-                    f"salience_process must return shape ({batch_size}, "
-                    f"{num_timesteps}, {self.num_beacons}); got {strength_paths.shape}"
-                )
-
-        all_pos, all_rot, all_nbr, all_dst, all_av, all_nf, all_ms = _batch_simulator(
+        return strength_paths
+
+    def _simulate(self, thetas, thetas_t, strength_paths, sim_seeds, sim_indices,
+                  output_mode=None):
+        """Run the kernel on prepared inputs and shape its output per output_mode
+        (the simulator's own unless given)."""
+        output_mode = self.output_mode if output_mode is None else output_mode
+        philox_seed = int(self.seed) if self.rng == "philox" else -1
+        # "statistics" and "diagnostics" are reduced in the kernel, at the
+        # resolution the simulator emits, and never hold a batch of trajectories.
+        stride, diagnostics, window = 0, 0, 0
+        if output_mode in ("statistics", "diagnostics"):
+            stride = self.downsample_factor if self.downsample else 1
+        if output_mode == "diagnostics":
+            diagnostics = 2 if self.diagnostic_series else 1
+            if self.diagnostic_window is not None:
+                window = max(int(self.diagnostic_window / (self.dt * stride)), 1)
+        (all_pos, all_rot, all_nbr, all_dst, all_av, all_nf, all_ms, all_stats,
+         all_diag, all_series) = _batch_simulator(
             thetas_t, self.num_agents, self.num_beacons, self.room_size, self.dt, self.time_horizon,
             self.beacon_strengths, strength_paths, self.switch_margin,
             self.salience_sensitivity, self.reference_radii,
-            self.beacon_spread, self.relative_heading, base_seed,
+            self.beacon_spread, self.relative_heading, sim_seeds,
             self.repulsion_radius, self.repulsion_gain, self.obstacles, self.max_turn_rate,
             self.door_wall, self.door_center, self.door_half_width,
             self.init_positions, self.init_rotations, self.fixed_beacons,
             self.beacon_assignment, self.diffusive_heading,
             self.alpha_slot, self.kappa_slot, self.sigma_slot,
+            self.beacon_grid_cell, self.unit_heading, self.block_noise,
+            philox_seed, sim_indices, stride, diagnostics, window,
         )
 
-        positions  = all_pos   # (B, T, A, 2)
-        rotations  = all_rot   # (B, T, A)
-        neighbors  = all_nbr   # (B, T, A)
-        distances  = all_dst   # (B, T, A)
-        ang_vels   = all_av    # (B, T, A)
-        nbr_flucts = all_nf    # (B, T, A)
-        ms_counts  = all_ms    # (B, T, A, R)
-
-        if self.downsample:
-            s = self.downsample_factor
-            # ascontiguousarray: strided views make every downstream batch slice a
-            # strided copy, which dominates training time for the smaller array.
-            positions  = np.ascontiguousarray(positions[:, ::s, :, :])
-            rotations  = np.ascontiguousarray(rotations[:, ::s, :])
-            neighbors  = np.ascontiguousarray(neighbors[:, ::s, :])
-            distances  = np.ascontiguousarray(distances[:, ::s, :])
-            ang_vels   = np.ascontiguousarray(ang_vels[:, ::s, :])
-            nbr_flucts = np.ascontiguousarray(nbr_flucts[:, ::s, :])
-            ms_counts  = np.ascontiguousarray(ms_counts[:, ::s, :, :])
+        if output_mode == "statistics":
+            out = {name: thetas[:, i:i + 1] for i, name in enumerate(self.param_names)}
+            return out | {"statistics": all_stats}
+        if output_mode == "diagnostics":
+            out = {name: thetas[:, i:i + 1] for i, name in enumerate(self.param_names)}
+            out["diagnostics"] = all_diag
+            if self.diagnostic_series:
+                out["diagnostic_series"] = all_series
+            return out
+        out = self._parameter_channels(thetas, thetas_t, strength_paths, output_mode)
+        if output_mode == "compact":
+            # Full resolution regardless of downsampling: the derived channels
+            # are scans of the previous step's positions, so the steps that
+            # downsampling drops are the ones they need. float64 so the
+            # rebuilt neighbour counts meet the radius exactly where the
+            # kernel's did.
+            return out | {
+                "positions":      all_pos,
+                "rotations":      all_rot,
+                "sensing_radius": np.ascontiguousarray(thetas_t[:, :, 1]),
+            }
+        return out | self._agent_channels(
+            output_mode, all_pos, all_rot, all_nbr, all_dst, all_av, all_nf, all_ms
+        )
 
-        B, T, A, _ = positions.shape
-        R = self.reference_radii.shape[0]
+    def expand_compact(self, data, output_mode="flat"):
+        """Rebuild a compact batch into the channels `output_mode` would emit.
+
+        The inverse of output_mode="compact" for a batch drawn from this
+        simulator: neighbour statistics and first differences are recomputed
+        from the stored trajectory by `derive_channels`, so the result is
+        identical to sampling in `output_mode` directly — given the trajectory
+        at full precision; a float32 copy can flip a neighbour count where a
+        distance meets the sensing radius. Meant to run per batch
+        inside the data pipeline, so a bank only ever holds the trajectories.
+
+        Parameters
+        ----------
+        data        : dict[str, np.ndarray] — compact-mode output, or a batch of it
+        output_mode : "flat" | "raw"
+
+        Returns
+        -------
+        dict[str, np.ndarray] — as `sample` in `output_mode`
+        """
+        if output_mode not in ("flat", "raw"):
+            raise ValueError(f"expand_compact supports 'flat' or 'raw'; got '{output_mode}'")
+        positions = np.ascontiguousarray(data["positions"], dtype=np.float64)
+        rotations = np.ascontiguousarray(data["rotations"], dtype=np.float64)
+        sensing_radius = np.ascontiguousarray(data["sensing_radius"], dtype=np.float64)
+        nbr, dst, av, nf, ms = derive_channels(
+            positions, rotations, sensing_radius, self.reference_radii
+        )
+        out = {k: v for k, v in data.items() if k not in COMPACT_KEYS}
+        return out | self._agent_channels(
+            output_mode, positions, rotations, nbr, dst, av, nf, ms
+        )
 
+    def _parameter_channels(self, thetas, thetas_t, strength_paths, output_mode):
+        """Inference targets, parameter paths and the salience observable."""
         out = {name: thetas[:, i:i + 1] for i, name in enumerate(self.param_names)}
         if self.include_parameter_paths:
             # (B, T, 1) per parameter — the values the kernel actually used at
@@ -779,7 +1539,7 @@ class TogetherFlowSimulator:
             sal = strength_paths
             if self.downsample:
                 sal = np.ascontiguousarray(sal[:, ::self.downsample_factor, :])
-            if self.output_mode == "summary":
+            if output_mode == "summary":
                 out["salience"] = np.concatenate(
                     [sal.mean(axis=1), sal.std(axis=1)], axis=-1
                 ).astype(np.float32)
@@ -788,7 +1548,28 @@ class TogetherFlowSimulator:
                 # is per-beacon rather than per-agent in every mode.
                 out["salience"] = sal.astype(np.float32)
 
-        if self.output_mode == "flat":
+        return out
+
+    def _agent_channels(self, output_mode, positions, rotations, neighbors, distances,
+                        ang_vels, nbr_flucts, ms_counts):
+        """Kernel output (B, T, A[, ...]) -> the per-agent channels of output_mode."""
+        if self.downsample:
+            s = self.downsample_factor
+            # ascontiguousarray: strided views make every downstream batch slice a
+            # strided copy, which dominates training time for the smaller array.
+            positions  = np.ascontiguousarray(positions[:, ::s, :, :])
+            rotations  = np.ascontiguousarray(rotations[:, ::s, :])
+            neighbors  = np.ascontiguousarray(neighbors[:, ::s, :])
+            distances  = np.ascontiguousarray(distances[:, ::s, :])
+            ang_vels   = np.ascontiguousarray(ang_vels[:, ::s, :])
+            nbr_flucts = np.ascontiguousarray(nbr_flucts[:, ::s, :])
+            ms_counts  = np.ascontiguousarray(ms_counts[:, ::s, :, :])
+
+        B, T, A, _ = positions.shape
+        R = self.reference_radii.shape[0]
+
+        out = {}
+        if output_mode == "flat":
             out |= {
                 "positions":             positions.reshape(B, T, A * 2),
                 "rotations":             rotations,
@@ -800,7 +1581,7 @@ class TogetherFlowSimulator:
             if R > 0:
                 out["radii_counts"] = ms_counts.reshape(B, T, A * R)
 
-        elif self.output_mode == "raw":
+        elif output_mode == "raw":
             out |= {
                 "positions":             positions,
                 "rotations":             rotations[..., None],
@@ -812,7 +1593,7 @@ class TogetherFlowSimulator:
             if R > 0:
                 out["radii_counts"] = ms_counts
 
-        elif self.output_mode == "summary":
+        elif output_mode == "summary":
             def _summarize(arr):
                 return np.stack([arr.mean(axis=(1, 2)), arr.std(axis=(1, 2))], axis=-1)
 
@@ -0,0 +1,203 @@
+import numpy as np
+from numba import njit
+
+# Per-simulation summary statistics, reduced inside the kernel.
+#
+# The vector is the simulator's output_mode="summary" without radii_counts: the
+# mean and standard deviation over time and agents of each per-agent channel,
+# in the order that mode emits them. A simulation reduced here and a batch
+# sampled in "summary" mode therefore describe data the same way, and
+# `flat_statistics` applies the same reduction to recorded sessions, so
+# replicated and observed data meet on one scale.
+
+STATISTIC_NAMES = (
+    "positions_x_mean", "positions_x_std", "positions_y_mean", "positions_y_std",
+    "rotations_mean", "rotations_std",
+    "neighbors_mean", "neighbors_std",
+    "distances_mean", "distances_std",
+    "angular_velocities_mean", "angular_velocities_std",
+    "neighbor_fluctuations_mean", "neighbor_fluctuations_std",
+)
+NUM_STATISTICS = len(STATISTIC_NAMES)
+
+# Behavioural diagnostics, reduced inside the kernel the same way.
+#
+# order_parameter  Vicsek's |mean heading vector|, averaged over steps: 1 is a
+#                  perfectly aligned group, 0 is disorder
+# mean_turn        per-step heading change in radians, averaged over agents
+# tortuosity       path length / net displacement over the first `window`
+#                  steps, averaged over agents
+# min_clearance    smallest pairwise distance at any step
+# mean_clearance   nearest-neighbour distance, averaged over steps and agents
+#
+# Clearance is measured among the agents inside the room: one that has walked
+# out is no longer part of the crowd. A step with fewer than two agents inside
+# has no clearance, and is NaN in the series and left out of the averages; a
+# run with no such step at all is NaN.
+#
+# DIAGNOSTIC_SERIES_NAMES are the per-step values behind the order parameter
+# and the clearances, for when their time course matters.
+DIAGNOSTIC_NAMES = (
+    "order_parameter", "mean_turn", "tortuosity", "min_clearance", "mean_clearance",
+)
+NUM_DIAGNOSTICS = len(DIAGNOSTIC_NAMES)
+DIAGNOSTIC_SERIES_NAMES = ("order_parameter", "min_clearance", "mean_clearance")
+NUM_DIAGNOSTIC_SERIES = len(DIAGNOSTIC_SERIES_NAMES)
+
+
+@njit
+def _moments(x, stride, out, k):
+    """Mean and population std of x[::stride] (T, A) into out[k], out[k + 1]."""
+    total = 0.0
+    count = 0
+    for t in range(0, x.shape[0], stride):
+        for i in range(x.shape[1]):
+            total += x[t, i]
+            count += 1
+    mean = total / count
+    sq = 0.0
+    for t in range(0, x.shape[0], stride):
+        for i in range(x.shape[1]):
+            sq += (x[t, i] - mean) ** 2
+    out[k] = mean
+    out[k + 1] = (sq / count) ** 0.5
+
+
+@njit
+def trajectory_statistics(positions, rotations, neighbors, distances, ang_vels, nbr_flucts,
+                          stride, out):
+    """
+    Reduce one simulation to its STATISTIC_NAMES vector.
+
+    Parameters
+    ----------
+    positions  : np.ndarray of shape (T, A, 2)
+    rotations, neighbors, distances, ang_vels, nbr_flucts
+               : np.ndarray of shape (T, A)
+    stride     : int — every stride-th step, as the simulator's downsampling
+    out        : np.ndarray of shape (NUM_STATISTICS,) — written in place
+    """
+    _moments(positions[:, :, 0], stride, out, 0)
+    _moments(positions[:, :, 1], stride, out, 2)
+    _moments(rotations, stride, out, 4)
+    _moments(neighbors, stride, out, 6)
+    _moments(distances, stride, out, 8)
+    _moments(ang_vels, stride, out, 10)
+    _moments(nbr_flucts, stride, out, 12)
+
+
+@njit
+def trajectory_diagnostics(positions, rotations, half_x, half_y, stride, window, out, series):
+    """
+    Reduce one simulation to its DIAGNOSTIC_NAMES vector.
+
+    Parameters
+    ----------
+    positions : np.ndarray of shape (T, A, 2)
+    rotations : np.ndarray of shape (T, A)
+    half_x, half_y : float — half the room's width and height; the room is
+                centred on the origin
+    stride    : int — every stride-th step, as the simulator's downsampling
+    window    : int — steps, after striding, that tortuosity is measured over;
+                0 for all of them
+    out       : np.ndarray of shape (NUM_DIAGNOSTICS,) — written in place
+    series    : np.ndarray of shape (T // stride rounded up, NUM_DIAGNOSTIC_SERIES),
+                or with a leading 0 to skip the per-step values — written in place
+    """
+    T, A = rotations.shape
+    order = 0.0
+    turn = 0.0
+    min_clear = np.inf
+    clear = 0.0
+    clear_steps = 0
+    steps = 0
+    for e, t in enumerate(range(0, T, stride)):
+        cx = 0.0
+        cy = 0.0
+        for i in range(A):
+            cx += np.cos(rotations[t, i])
+            cy += np.sin(rotations[t, i])
+        step_order = (cx * cx + cy * cy) ** 0.5 / A
+
+        step_min = np.inf
+        step_clear = 0.0
+        inside = 0
+        for i in range(A):
+            if abs(positions[t, i, 0]) > half_x or abs(positions[t, i, 1]) > half_y:
+                continue
+            inside += 1
+            nearest = np.inf
+            for j in range(A):
+                if j == i or abs(positions[t, j, 0]) > half_x or abs(positions[t, j, 1]) > half_y:
+                    continue
+                dx = positions[t, i, 0] - positions[t, j, 0]
+                dy = positions[t, i, 1] - positions[t, j, 1]
+                nearest = min(nearest, (dx * dx + dy * dy) ** 0.5)
+            step_min = min(step_min, nearest)
+            step_clear += nearest
+        if inside < 2:
+            step_min = np.nan
+            step_clear = np.nan
+        else:
+            step_clear /= inside
+            min_clear = min(min_clear, step_min)
+            clear += step_clear
+            clear_steps += 1
+
+        if e > 0:
+            for i in range(A):
+                d = rotations[t, i] - rotations[t - stride, i]
+                turn += abs((d + np.pi) % (2 * np.pi) - np.pi)
+        if series.shape[0] > 0:
+            series[e, 0] = step_order
+            series[e, 1] = step_min
+            series[e, 2] = step_clear
+        order += step_order
+        steps += 1
+
+    k = steps if window <= 0 else min(window, steps)
+    tort = 0.0
+    for i in range(A):
+        path = 0.0
+        for e in range(1, k):
+            dx = positions[e * stride, i, 0] - positions[(e - 1) * stride, i, 0]
+            dy = positions[e * stride, i, 1] - positions[(e - 1) * stride, i, 1]
+            path += (dx * dx + dy * dy) ** 0.5
+        dx = positions[(k - 1) * stride, i, 0] - positions[0, i, 0]
+        dy = positions[(k - 1) * stride, i, 1] - positions[0, i, 1]
+        tort += path / max((dx * dx + dy * dy) ** 0.5, 1e-6)
+
+    out[0] = order / steps
+    out[1] = turn / (max(steps - 1, 1) * A)
+    out[2] = tort / A
+    out[3] = min_clear if clear_steps > 0 else np.nan
+    out[4] = clear / clear_steps if clear_steps > 0 else np.nan
+
+
+def flat_statistics(data):
+    """
+    The STATISTIC_NAMES vector of each dataset in a "flat" or "raw" batch.
+
+    Parameters
+    ----------
+    data : dict[str, np.ndarray] — at least positions, rotations, neighbors,
+           distances, angular_velocities and neighbor_fluctuations, at the
+           resolution they were recorded (or emitted) at
+
+    Returns
+    -------
+    np.ndarray of shape (N, NUM_STATISTICS)
+    """
+    positions = np.asarray(data["positions"], dtype=np.float64)
+    n, t = positions.shape[:2]
+    positions = positions.reshape(n, t, -1, 2)
+    channels = [positions[..., 0], positions[..., 1]] + [
+        np.asarray(data[k], dtype=np.float64).reshape(n, t, -1)
+        for k in ("rotations", "neighbors", "distances", "angular_velocities",
+                  "neighbor_fluctuations")
+    ]
+    out = np.empty((n, NUM_STATISTICS))
+    for j, x in enumerate(channels):
+        out[:, 2 * j] = x.mean(axis=(1, 2))
+        out[:, 2 * j + 1] = x.std(axis=(1, 2))
+    return out
@@ -37,6 +37,77 @@ def count_neighbors(self_position, other_positions, sensing_radius):
     return num_neighbors, average_distance
 
 
+@njit
+def reflect_off_walls(
+    previous_position,
+    new_position,
+    room_size=(8., 10.),
+    boundary_noise=0.01,
+    door_wall=-1,
+    door_center=0.0,
+    door_half_width=0.0,
+):
+    """
+    Mirror a proposed position back inside the room and report which velocity
+    components the reflection negates.
+
+    This is the geometry shared by `bound_agent_state` and `bound_agent_heading`,
+    which differ only in how they carry the heading; see the former for the
+    boundary semantics.
+
+    Returns
+    -------
+    bounded_position : np.ndarray of shape (2,)
+    flip_x           : bool — the x velocity component is negated
+    flip_y           : bool — the y velocity component is negated
+    """
+    half_x = room_size[0] * 0.5
+    half_y = room_size[1] * 0.5
+
+    bounded = new_position.copy()
+    flip_x = False
+    flip_y = False
+
+    if bounded[0] > half_x:
+        if not (door_wall == 0 and np.abs(bounded[1] - door_center) <= door_half_width):
+            bounded[0] = 2.0 * half_x - bounded[0]
+            flip_x = True
+    elif bounded[0] < -half_x:
+        if not (door_wall == 1 and np.abs(bounded[1] - door_center) <= door_half_width):
+            bounded[0] = -2.0 * half_x - bounded[0]
+            flip_x = True
+
+    if bounded[1] > half_y:
+        if not (door_wall == 2 and np.abs(bounded[0] - door_center) <= door_half_width):
+            bounded[1] = 2.0 * half_y - bounded[1]
+            flip_y = True
+    elif bounded[1] < -half_y:
+        if not (door_wall == 3 and np.abs(bounded[0] - door_center) <= door_half_width):
+            bounded[1] = -2.0 * half_y - bounded[1]
+            flip_y = True
+
+    # Reflection alone can still leave an agent on the wrong side if a single
+    # step somehow exceeded the room, so clamp whatever remains inside — unless
+    # it left through the door, in which case it is meant to be outside.
+    left_by_door = (
+        (door_wall == 0 and bounded[0] > half_x)
+        or (door_wall == 1 and bounded[0] < -half_x)
+        or (door_wall == 2 and bounded[1] > half_y)
+        or (door_wall == 3 and bounded[1] < -half_y)
+    )
+    if not left_by_door:
+        if bounded[0] > half_x - boundary_noise:
+            bounded[0] = half_x - boundary_noise
+        elif bounded[0] < -half_x + boundary_noise:
+            bounded[0] = -half_x + boundary_noise
+        if bounded[1] > half_y - boundary_noise:
+            bounded[1] = half_y - boundary_noise
+        elif bounded[1] < -half_y + boundary_noise:
+            bounded[1] = -half_y + boundary_noise
+
+    return bounded, flip_x, flip_y
+
+
 @njit
 def bound_agent_state(
     previous_position,
@@ -93,8 +164,6 @@ def bound_agent_state(
     half_x = room_size[0] * 0.5
     half_y = room_size[1] * 0.5
 
-    bounded = new_position.copy()
-
     # An agent that was already outside is not behind any wall, so there is
     # nothing to reflect it off. Without this an escaped agent would be bounced
     # around the *outside* of the room by the same tests that contain the others.
@@ -102,47 +171,84 @@ def bound_agent_state(
         np.abs(previous_position[0]) > half_x or np.abs(previous_position[1]) > half_y
     )
     if was_outside:
-        return bounded, new_rotation
+        return new_position.copy(), new_rotation
+
+    bounded, flip_x, flip_y = reflect_off_walls(
+        previous_position, new_position, room_size, boundary_noise,
+        door_wall, door_center, door_half_width,
+    )
 
     # Work on the velocity vector so the heading reflects with the position.
     cos_r = np.cos(new_rotation)
     sin_r = np.sin(new_rotation)
+    if flip_x:
+        cos_r = -cos_r
+    if flip_y:
+        sin_r = -sin_r
 
-    if bounded[0] > half_x:
-        if not (door_wall == 0 and np.abs(bounded[1] - door_center) <= door_half_width):
-            bounded[0] = 2.0 * half_x - bounded[0]
-            cos_r = -cos_r
-    elif bounded[0] < -half_x:
-        if not (door_wall == 1 and np.abs(bounded[1] - door_center) <= door_half_width):
-            bounded[0] = -2.0 * half_x - bounded[0]
-            cos_r = -cos_r
+    return bounded, np.mod(np.arctan2(sin_r, cos_r), 2.0 * np.pi)
 
-    if bounded[1] > half_y:
-        if not (door_wall == 2 and np.abs(bounded[0] - door_center) <= door_half_width):
-            bounded[1] = 2.0 * half_y - bounded[1]
-            sin_r = -sin_r
-    elif bounded[1] < -half_y:
-        if not (door_wall == 3 and np.abs(bounded[0] - door_center) <= door_half_width):
-            bounded[1] = -2.0 * half_y - bounded[1]
-            sin_r = -sin_r
 
-    # Reflection alone can still leave an agent on the wrong side if a single
-    # step somehow exceeded the room, so clamp whatever remains inside — unless
-    # it left through the door, in which case it is meant to be outside.
-    left_by_door = (
-        (door_wall == 0 and bounded[0] > half_x)
-        or (door_wall == 1 and bounded[0] < -half_x)
-        or (door_wall == 2 and bounded[1] > half_y)
-        or (door_wall == 3 and bounded[1] < -half_y)
+@njit
+def bound_agent_heading(
+    previous_position,
+    new_position,
+    new_rotation,
+    new_heading_x,
+    new_heading_y,
+    room_size=(8., 10.),
+    boundary_noise=0.01,
+    door_wall=-1,
+    door_center=0.0,
+    door_half_width=0.0,
+):
+    """
+    `bound_agent_state` for a heading carried as an angle plus its unit vector.
+
+    Negating a velocity component is exact on the unit vector, and on the angle
+    it is pi - theta (x) or -theta (y), so the reflection needs no trigonometry
+    at all. The angle is returned in [0, 2*pi), as `bound_agent_state` returns it.
+
+    Parameters
+    ----------
+    previous_position : np.ndarray of shape (2,)
+    new_position      : np.ndarray of shape (2,)
+    new_rotation      : float — proposed heading angle, in [0, 2*pi)
+    new_heading_x     : float — cos(new_rotation)
+    new_heading_y     : float — sin(new_rotation)
+    room_size, boundary_noise, door_wall, door_center, door_half_width
+                      : as for `bound_agent_state`
+
+    Returns
+    -------
+    bounded_position : np.ndarray of shape (2,)
+    bounded_rotation : float
+    heading_x        : float
+    heading_y        : float
+    """
+    half_x = room_size[0] * 0.5
+    half_y = room_size[1] * 0.5
+    was_outside = (
+        np.abs(previous_position[0]) > half_x or np.abs(previous_position[1]) > half_y
     )
-    if not left_by_door:
-        if bounded[0] > half_x - boundary_noise:
-            bounded[0] = half_x - boundary_noise
-        elif bounded[0] < -half_x + boundary_noise:
-            bounded[0] = -half_x + boundary_noise
-        if bounded[1] > half_y - boundary_noise:
-            bounded[1] = half_y - boundary_noise
-        elif bounded[1] < -half_y + boundary_noise:
-            bounded[1] = -half_y + boundary_noise
+    if was_outside:
+        return new_position.copy(), new_rotation, new_heading_x, new_heading_y
 
-    return bounded, np.mod(np.arctan2(sin_r, cos_r), 2.0 * np.pi)
+    bounded, flip_x, flip_y = reflect_off_walls(
+        previous_position, new_position, room_size, boundary_noise,
+        door_wall, door_center, door_half_width,
+    )
+
+    rotation = new_rotation
+    if flip_x:
+        new_heading_x = -new_heading_x
+        rotation = np.pi - rotation
+    if flip_y:
+        new_heading_y = -new_heading_y
+        rotation = -rotation
+    if rotation < 0.0:
+        rotation += 2.0 * np.pi
+    elif rotation >= 2.0 * np.pi:
+        rotation -= 2.0 * np.pi
+
+    return bounded, rotation, new_heading_x, new_heading_y